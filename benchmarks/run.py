@@ -0,0 +1,359 @@
+"""Time and memory-profile each export stage on a synthetic model.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.run --objects 5000 --baseline benchmarks/baselines/local.json
+
+Every stage is timed `--repeat` times, keeping the fastest run, and then run
+once more under tracemalloc for its peak memory. Results are printed and,
+with `--save`, written to the baseline file. When the baseline already exists
+each stage is compared with it and the run fails if any stage got slower or
+larger than `--tolerance` allows.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, fields
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from pygltflib import GLTF2
+
+from benchmarks.synthetic import SyntheticModelConfig, generate_model
+from src.gltf.buffer import BufferBuilder
+from src.gltf.create import (
+    create_gltf,
+    create_gltf_from_instances,
+    get_display_meshes,
+)
+from src.gltf.lod import simplify_levels
+from src.gltf.material import MaterialRegistry
+from src.gltf.mesh import process_speckle_mesh
+from src.gltf.normals import crease_normals
+from src.gltf.metadata import extract_metadata
+from src.gltf.primitive import create_primitive
+from src.gltf.structural import PropertyTableBuilder
+from src.gltf.trimesh_export import create_gltf_from_trimesh
+from src.inputs import FunctionInputs
+from src.utils.flatten import extract_base_and_transform, flatten_base_thorough
+from src.utils.store import GlbWriter
+
+# Wall time differences below this are timer noise, not regressions.
+MIN_WALL_DIFFERENCE = 0.001
+
+# A stage prepares its input untimed and returns the function to measure.
+Stage = Callable[[SyntheticModelConfig], Callable[[], int]]
+
+
+def measure(prepare: Callable[[], Callable[[], int]], repeat: int) -> Dict:
+    """
+    Measure one stage.
+
+    Args:
+        prepare: Builds fresh input for the stage and returns a function that
+            runs it and returns the number of items it handled.
+        repeat: How many timed runs to keep the fastest of.
+
+    Returns:
+        Dict: Wall and CPU seconds, peak traced bytes and the item count.
+    """
+    wall, cpu = float("inf"), float("inf")
+    for _ in range(repeat):
+        run = prepare()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        items = run()
+        wall = min(wall, time.perf_counter() - wall_start)
+        cpu = min(cpu, time.process_time() - cpu_start)
+
+    run = prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"wall_s": wall, "cpu_s": cpu, "peak_bytes": peak, "items": items}
+
+
+def _display_meshes(model) -> List:
+    return [
+        mesh
+        for base, _, _ in extract_base_and_transform(model)
+        for mesh in get_display_meshes(base)
+    ]
+
+
+def traversal_flatten(config):
+    model = generate_model(config)
+    return lambda: sum(1 for _ in flatten_base_thorough(model))
+
+
+def traversal_instances(config):
+    model = generate_model(config)
+    return lambda: sum(1 for _ in extract_base_and_transform(model))
+
+
+def mesh_processing(config):
+    meshes = _display_meshes(generate_model(config))
+
+    def run():
+        for mesh in meshes:
+            process_speckle_mesh(mesh)
+        return len(meshes)
+
+    return run
+
+
+def primitive_creation(config):
+    converted = [
+        process_speckle_mesh(mesh) for mesh in _display_meshes(generate_model(config))
+    ]
+
+    def run():
+        gltf = GLTF2()
+        buffer_data = BufferBuilder(gltf)
+        for vertices, faces in converted:
+            create_primitive(vertices, faces, gltf, buffer_data)
+        return len(converted)
+
+    return run
+
+
+def lod_simplification(config):
+    converted = [
+        process_speckle_mesh(mesh) for mesh in _display_meshes(generate_model(config))
+    ]
+
+    def run():
+        for vertices, faces in converted:
+            simplify_levels(vertices, faces, levels=3, ratio=0.25)
+        return len(converted)
+
+    return run
+
+
+def normal_generation(config):
+    converted = [
+        process_speckle_mesh(mesh) for mesh in _display_meshes(generate_model(config))
+    ]
+
+    def run():
+        for vertices, faces in converted:
+            crease_normals(vertices, faces, crease_angle=30.0)
+        return len(converted)
+
+    return run
+
+
+def material_lookup(config):
+    meshes = _display_meshes(generate_model(config))
+
+    def run():
+        registry = MaterialRegistry(GLTF2())
+        for mesh in meshes:
+            registry.get_or_add(getattr(mesh, "renderMaterial", None))
+        return len(meshes)
+
+    return run
+
+
+def metadata_extras(config):
+    objects = [
+        base for base, _, _ in extract_base_and_transform(generate_model(config))
+    ]
+
+    def run():
+        for obj in objects:
+            extract_metadata(obj)
+        return len(objects)
+
+    return run
+
+
+def metadata_structural(config):
+    objects = [
+        base for base, _, _ in extract_base_and_transform(generate_model(config))
+    ]
+
+    def run():
+        table = PropertyTableBuilder()
+        for obj in objects:
+            table.add(extract_metadata(obj))
+        gltf = GLTF2()
+        table.write(gltf, BufferBuilder(gltf))
+        return len(objects)
+
+    return run
+
+
+def glb_write(config):
+    model = generate_model(config)
+    writer = GlbWriter(Path(tempfile.gettempdir(), "benchmark.glb"))
+    gltf = create_gltf(model, include_metadata=True, buffer_data=writer)
+
+    def run():
+        writer.finalize(gltf).unlink()
+        return len(gltf.meshes)
+
+    return run
+
+
+def builder(create: Callable) -> Stage:
+    def stage(config):
+        model = generate_model(config)
+        return lambda: len(create(model, include_metadata=True).nodes)
+
+    return stage
+
+
+def trimesh_builder(config):
+    model = generate_model(config)
+    inputs = FunctionInputs(include_metadata=True)
+
+    def run():
+        path = Path(create_gltf_from_trimesh(model, "benchmark", inputs))
+        path.unlink()
+        return config.objects
+
+    return run
+
+
+def cold_start(config):
+    """Import the function's entry point in a fresh interpreter, as a run does."""
+    command = [sys.executable, "-c", "import src.function"]
+    root = Path(__file__).resolve().parents[1]
+
+    def run():
+        subprocess.run(command, cwd=root, check=True)
+        return 1
+
+    return run
+
+
+STAGES: Dict[str, Stage] = {
+    "cold_start": cold_start,
+    "traversal.flatten_base_thorough": traversal_flatten,
+    "traversal.extract_base_and_transform": traversal_instances,
+    "process_speckle_mesh": mesh_processing,
+    "create_primitive": primitive_creation,
+    "lod_simplification": lod_simplification,
+    "normal_generation": normal_generation,
+    "material_lookup": material_lookup,
+    "metadata.extras": metadata_extras,
+    "metadata.structural": metadata_structural,
+    "glb_write": glb_write,
+    "builder.create_gltf": builder(create_gltf),
+    "builder.create_gltf_from_instances": builder(create_gltf_from_instances),
+    "builder.create_gltf_from_trimesh": trimesh_builder,
+}
+
+
+def run_suite(
+    config: SyntheticModelConfig,
+    repeat: int = 3,
+    stages: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Run the benchmark stages on the model generated from `config`.
+
+    Args:
+        config (SyntheticModelConfig): The synthetic model to export.
+        repeat (int): Timed runs per stage, keeping the fastest.
+        stages (Optional[List[str]]): Names from `STAGES` to run, by default all.
+
+    Returns:
+        Dict: The config, the platform and the measurements of each stage.
+    """
+    results = {}
+    for name in stages or STAGES:
+        results[name] = measure(lambda: STAGES[name](config), repeat)
+    return {
+        "config": asdict(config),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "stages": results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    List the stages that regressed against a baseline.
+
+    A stage regresses when its wall time or peak memory exceeds the baseline's
+    by more than the `tolerance` fraction. Results of another model are not
+    comparable and are reported as a single difference.
+    """
+    if results["config"] != baseline["config"]:
+        return ["the baseline was recorded for a different synthetic model"]
+
+    regressions = []
+    for name, stage in results["stages"].items():
+        previous = baseline["stages"].get(name)
+        if previous is None:
+            continue
+        if stage["wall_s"] - previous["wall_s"] < MIN_WALL_DIFFERENCE:
+            stage = {**stage, "wall_s": previous["wall_s"]}
+        for metric in ("wall_s", "peak_bytes"):
+            if stage[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {previous[metric]:.6g} -> {stage[metric]:.6g}"
+                )
+    return regressions
+
+
+def format_results(results: Dict) -> str:
+    """Render the measurements as a table."""
+    lines = [f"{'stage':40} {'wall s':>10} {'cpu s':>10} {'peak MB':>10} {'items':>8}"]
+    for name, stage in results["stages"].items():
+        lines.append(
+            f"{name:40} {stage['wall_s']:10.4f} {stage['cpu_s']:10.4f} "
+            f"{stage['peak_bytes'] / 2**20:10.2f} {stage['items']:8d}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    for field in fields(SyntheticModelConfig):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}",
+            type=type(field.default),
+            default=field.default,
+        )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stage", action="append", choices=list(STAGES))
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--save", action="store_true", help="write the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    config = SyntheticModelConfig(
+        **{
+            field.name: getattr(args, field.name)
+            for field in fields(SyntheticModelConfig)
+        }
+    )
+    results = run_suite(config, args.repeat, args.stage)
+    print(format_results(results))
+
+    regressions = []
+    if args.baseline is not None and args.baseline.is_file():
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+    if args.baseline is not None and args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
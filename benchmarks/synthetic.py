@@ -0,0 +1,142 @@
+"""Deterministic synthetic Speckle models for benchmarking the exporter."""
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+from specklepy.objects import Base
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+from specklepy.objects.other import Instance, RenderMaterial, Transform
+
+CATEGORIES = ["Walls", "Floors", "Columns", "Beams", "Doors", "Windows"]
+
+
+@dataclass
+class SyntheticModelConfig:
+    """The shape of a generated model."""
+
+    # Top-level objects, each drawing one display mesh or placing one instance.
+    objects: int = 1000
+    # Vertices per display mesh; faces are added until it is reached.
+    vertices_per_mesh: int = 96
+    # Share of faces with 5 to 8 sides; the rest are triangles and quads.
+    ngon_fraction: float = 0.2
+    # Distinct render materials shared by the meshes; 0 leaves meshes without one.
+    materials: int = 8
+    # Levels of nested instance definitions; 0 places no instances.
+    instance_depth: int = 0
+    # Share of objects placed as instances when `instance_depth` is set.
+    instance_fraction: float = 0.5
+    # Distinct definitions at each level of instancing.
+    definitions: int = 16
+    # Extra properties per object, mixing strings, integers, floats and booleans.
+    metadata_width: int = 8
+    seed: int = 0
+
+
+def _translation(x: float, y: float, z: float) -> List[float]:
+    return [1, 0, 0, x, 0, 1, 0, y, 0, 0, 1, z, 0, 0, 0, 1]
+
+
+def synthetic_mesh(
+    rng: np.random.Generator, config: SyntheticModelConfig, origin: np.ndarray
+) -> SpeckleMesh:
+    """Build a mesh of convex polygons scattered around `origin`."""
+    vertices, faces, vertex_count = [], [], 0
+    while vertex_count < config.vertices_per_mesh:
+        if rng.random() < config.ngon_fraction:
+            sides = int(rng.integers(5, 9))
+        else:
+            sides = int(rng.integers(3, 5))
+        angles = np.sort(rng.uniform(0, 2 * np.pi, sides))
+        centre = origin + rng.uniform(-1, 1, 3)
+        polygon = (
+            np.column_stack([np.cos(angles), np.sin(angles), np.zeros(sides)])
+            * rng.uniform(0.1, 0.5)
+            + centre
+        )
+        vertices.append(polygon.ravel())
+        faces += [sides, *range(vertex_count, vertex_count + sides)]
+        vertex_count += sides
+    return SpeckleMesh(
+        vertices=np.concatenate(vertices).tolist(), faces=faces, units="m"
+    )
+
+
+def _add_properties(obj: Base, rng: np.random.Generator, config, index: int) -> None:
+    obj.name = f"Object {index}"
+    obj.category = CATEGORIES[index % len(CATEGORIES)]
+    for column in range(config.metadata_width):
+        kind = column % 4
+        if kind == 0:
+            value = f"value {int(rng.integers(0, 50))}"
+        elif kind == 1:
+            value = int(rng.integers(0, 1000))
+        elif kind == 2:
+            value = float(rng.uniform(0, 100))
+        else:
+            value = bool(rng.random() < 0.5)
+        obj[f"property_{column}"] = value
+
+
+def generate_model(config: SyntheticModelConfig) -> Base:
+    """
+    Generate a Speckle version root with the shape described by `config`.
+
+    The same config always generates the same model, so timings of one build
+    can be compared with another.
+
+    Args:
+        config (SyntheticModelConfig): The shape of the model.
+
+    Returns:
+        Base: The root object, with the objects in its `elements`.
+    """
+    rng = np.random.default_rng(config.seed)
+    materials = [
+        RenderMaterial(name=f"Material {index}", diffuse=int(rng.integers(0, 1 << 24)))
+        for index in range(config.materials)
+    ]
+
+    def display_mesh(origin: np.ndarray) -> SpeckleMesh:
+        mesh = synthetic_mesh(rng, config, origin)
+        if materials:
+            mesh.renderMaterial = materials[int(rng.integers(0, len(materials)))]
+        return mesh
+
+    # Each level's definitions draw a mesh and place one definition of the level below.
+    levels: List[List[Base]] = []
+    for depth in range(config.instance_depth):
+        definitions = []
+        for index in range(config.definitions):
+            definition = Base()
+            definition.name = f"Definition {depth}.{index}"
+            definition.displayValue = [display_mesh(np.zeros(3))]
+            if levels:
+                nested = levels[-1][index % len(levels[-1])]
+                definition.elements = [
+                    Instance(
+                        definition=nested,
+                        transform=Transform(value=_translation(0, 0, 3)),
+                    )
+                ]
+            definitions.append(definition)
+        levels.append(definitions)
+
+    root = Base()
+    root.name = "Synthetic model"
+    root.elements = []
+    side = max(1, int(np.ceil(np.sqrt(config.objects))))
+    for index in range(config.objects):
+        origin = np.array([index % side, index // side, 0], dtype=float) * 4
+        if levels and rng.random() < config.instance_fraction:
+            definition = levels[-1][index % len(levels[-1])]
+            obj = Instance(
+                definition=definition, transform=Transform(value=_translation(*origin))
+            )
+        else:
+            obj = Base()
+            obj.displayValue = [display_mesh(origin)]
+        _add_properties(obj, rng, config, index)
+        root.elements.append(obj)
+    return root
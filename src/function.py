@@ -1,14 +1,30 @@
+import json
+import tempfile
+from pathlib import Path
+
 from speckle_automate import AutomationContext
 from specklepy.objects import Base
+from specklepy.transports.sqlite import SQLiteTransport
 
-from src.gltf.create import (
-    create_gltf,
-    create_gltf_from_instances,
-    create_gltf_from_trimesh,
-)
-from src.inputs import FunctionInputs
+from src.gltf.backends import BACKENDS
+from src.gltf.options import ExportOptions
+from src.gltf.tiles import create_tileset
+from src.inputs import ExportFormat, FunctionInputs
+from src.utils.instrument import Instrumentation, active
+from src.utils.lazy import LazyVersion, copy_version_to_transport
 from src.utils.run import get_modelname
-from src.utils.store import safe_store_file_result, write_gltf_to_tmp
+from src.utils.store import (
+    CACHE_DIR_ENV,
+    GlbWriter,
+    archive_directory,
+    archive_files,
+    gltf_writer,
+    incremental_export_path,
+    keep_incremental_export,
+    prep_temp_file,
+    write_gltf_to_tmp,
+)
+from src.utils.upload import ResultUploader, context_store
 
 
 def automate_function(
@@ -18,35 +34,132 @@ def automate_function(
     """
     This function exports the Speckle model to GLTF or GLB format.
 
+    Each phase of the run is timed and a JSON report of the timings and memory
+    use is stored next to the exported file. Results are uploaded in the
+    background, as soon as each file is written.
+
     Args:
         automate_context: The automation context provided by Speckle Automate.
         function_inputs: An instance of FunctionInputs containing export parameters.
     """
+    instrumentation = Instrumentation(trace_memory=function_inputs.trace_memory)
+    uploader = ResultUploader(
+        context_store(automate_context),
+        compression=function_inputs.upload_compression,
+        retries=function_inputs.upload_retries,
+    )
+    with uploader:
+        with instrumentation.activate():
+            file_name = export_version(automate_context, function_inputs, uploader)
+
+            # Only the uploads still running after the export are waited for.
+            with instrumentation.stage("upload") as record:
+                record.add_items(uploader.wait())
+
+        report = instrumentation.write(Path(file_name).with_suffix(".report.json"))
+        print(json.dumps(instrumentation.report()))
+        uploader.upload(report)
+
+    # Mark the run as successful
+    automate_context.mark_run_success(
+        f"{function_inputs.export_format.value.upper()} export completed: {file_name}"
+        f" in {instrumentation.summary()}"
+    )
+
+
+def export_version(
+    automate_context: AutomationContext,
+    function_inputs: FunctionInputs,
+    uploader: ResultUploader,
+) -> str:
+    """
+    Receive the triggering version, export it to a temporary file and start
+    uploading the result.
+
+    Returns:
+        str: The path of the exported file.
+    """
+    tiles = function_inputs.export_format == ExportFormat.TILES
+    backend = BACKENDS[function_inputs.export_backend]
+
     # Receive the version data
-    version_root_object: Base = automate_context.receive_version()
+    with active().stage("receive"):
+        if function_inputs.lazy_receive and (tiles or backend.supports_lazy):
+            transport = SQLiteTransport(base_path=tempfile.mkdtemp(), scope="version")
+            version_root_object = LazyVersion(
+                transport, copy_version_to_transport(automate_context, transport)
+            )
+        else:
+            version_root_object: Base = automate_context.receive_version()
+
+        # Get the model name from the version
+        model_name = get_modelname(automate_context)
 
-    # Get the model name from the version
-    model_name = get_modelname(automate_context)
+    options = ExportOptions.from_inputs(function_inputs)
 
-    gltf_data = create_gltf(version_root_object, function_inputs.include_metadata)
+    # 3D Tiles output is a directory of GLB tiles, uploaded as one zip archive
+    if tiles:
+        directory = prep_temp_file(model_name, "_tiles")
+        create_tileset(
+            version_root_object, function_inputs.include_metadata, directory, options
+        )
+        with active().stage("write", items=1):
+            file_name = str(archive_directory(directory))
+        uploader.upload(file_name)
+        return file_name
 
-    # gltf_data = create_gltf_from_instances(
-    #     version_root_object, function_inputs.include_metadata
-    # )
+    create = backend.load()
 
-    # file_name = create_gltf_from_trimesh(
-    #     version_root_object, model_name, function_inputs
-    # )
+    # The trimesh backend writes the GLB itself
+    if backend.writes_file:
+        file_name = create(version_root_object, model_name, function_inputs)
+        if file_name is None:
+            raise ValueError("The version has no displayable objects to export")
+        uploader.upload(file_name)
+        return file_name
 
-    file_name: str = write_gltf_to_tmp(
-        gltf_data, model_name, function_inputs.export_format
+    # GLB output streams geometry to disk as it is converted; GLTF output maps
+    # it into a .bin next to the JSON, and both are uploaded as one zip archive
+    glb_writer = (
+        GlbWriter(prep_temp_file(model_name, ".glb"))
+        if function_inputs.export_format == ExportFormat.GLB
+        else None
     )
+    writer = glb_writer or gltf_writer(model_name)
 
-    #
-    # automate_context.store_file_result(file_name)
-    safe_store_file_result(automate_context, file_name)
+    # Incremental GLB exports copy unchanged geometry from the model's last export
+    previous_export = None
+    if options.incremental and glb_writer is not None:
+        previous_export = incremental_export_path(
+            automate_context.automation_run_data.project_id, model_name
+        )
+        options.previous_export = previous_export
+        if not previous_export.exists():
+            print(
+                f"No previous export at {previous_export}; converting every object."
+                f" Set {CACHE_DIR_ENV} to a persistent directory to keep exports"
+                " between runs."
+            )
 
-    # Mark the run as successful
-    automate_context.mark_run_success(
-        f"{function_inputs.export_format.value.upper()} export completed: {file_name}"
+    gltf_data = create(
+        version_root_object,
+        function_inputs.include_metadata,
+        buffer_data=writer,
+        options=options,
     )
+
+    with active().stage("write", items=1):
+        file_name: str = write_gltf_to_tmp(
+            gltf_data, model_name, function_inputs.export_format, writer
+        )
+
+        if previous_export is not None:
+            keep_incremental_export(file_name, previous_export)
+
+        # Geometry past the size of one glTF buffer is referenced from external
+        # files by relative URI, so they are uploaded with the GLB as one archive.
+        if glb_writer is not None and glb_writer.external_buffers:
+            file_name = str(archive_files(Path(file_name), glb_writer.external_buffers))
+
+    uploader.upload(file_name)
+    return file_name
@@ -0,0 +1,43 @@
+"""The exporter backends selectable through `FunctionInputs.export_backend`.
+
+Each backend is named by the module and function implementing it rather than
+imported here, so a run only imports the dependencies of the backend it uses.
+The trimesh backend in particular pulls in trimesh and its exporters, which
+would otherwise add to the cold start of every run.
+"""
+
+import importlib
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+from src.inputs import ExportBackend
+from src.utils.instrument import active
+
+
+@dataclass(frozen=True)
+class Backend:
+    """A glTF builder, imported on first use."""
+
+    module: str
+    function: str
+    # Writes the GLB itself and returns its path instead of a glTF document.
+    writes_file: bool = False
+    # Accepts a lazily received version as well as a received one.
+    supports_lazy: bool = False
+
+    def load(self) -> Callable:
+        """Import the backend's module and return its builder."""
+        with active().stage("import", items=1):
+            return getattr(importlib.import_module(self.module), self.function)
+
+
+BACKENDS: Dict[ExportBackend, Backend] = {
+    ExportBackend.DIRECT: Backend("src.gltf.create", "create_gltf", supports_lazy=True),
+    ExportBackend.INSTANCED: Backend("src.gltf.create", "create_gltf_from_instances"),
+    ExportBackend.MERGED: Backend(
+        "src.gltf.create", "create_gltf_merged", supports_lazy=True
+    ),
+    ExportBackend.TRIMESH: Backend(
+        "src.gltf.trimesh_export", "create_gltf_from_trimesh", writes_file=True
+    ),
+}
@@ -0,0 +1,192 @@
+"""Binary buffer layout for the glTF builders.
+
+Every bufferView is written through `BufferBuilder.add_view`, which takes any
+C-contiguous buffer, e.g. a NumPy array, through a memoryview so no temporary
+`bytes` copy is made, and starts each view on an aligned offset.
+
+The first buffer goes to the session's sink: a `MemoryBuffer` embedded as a
+data URI, or a `GlbWriter` streaming the BIN chunk. glTF loaders commonly
+cannot address buffers past 2 GiB, so a view that would push the current
+buffer over `max_length` starts a new one. Next to a GLB, the new buffers are
+written as external `.bin` files; otherwise they are embedded as well.
+"""
+
+import base64
+from typing import List, Optional
+
+import numpy as np
+from pygltflib import GLTF2, Buffer, BufferView
+
+# Largest buffer most loaders accept, e.g. a JavaScript ArrayBuffer.
+MAX_BUFFER_LENGTH = (1 << 31) - 1
+# Vertex attributes must start on 4-byte boundaries.
+VIEW_ALIGNMENT = 4
+
+
+class MemoryBuffer:
+    """
+    A growable in-memory buffer.
+
+    Like a bytearray, but `reserve` can preallocate the room for data that
+    is about to be written, and growth at least doubles the capacity so
+    appending is amortized constant time.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self._data = np.empty(capacity, dtype=np.uint8)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def reserve(self, nbytes: int) -> None:
+        """Make room for `nbytes` more bytes without further reallocation."""
+        needed = self._length + nbytes
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=np.uint8)
+            grown[: self._length] = self._data[: self._length]
+            self._data = grown
+
+    def extend(self, data) -> None:
+        """Append bytes, or any C-contiguous buffer such as a NumPy array."""
+        view = memoryview(data).cast("B")
+        self.reserve(view.nbytes)
+        end = self._length + view.nbytes
+        self._data[self._length : end] = np.frombuffer(view, dtype=np.uint8)
+        self._length = end
+
+    def getbuffer(self) -> memoryview:
+        """Return a view of the written bytes, valid until the next write."""
+        return memoryview(self._data[: self._length])
+
+    def rewrite(self, rewriter) -> None:
+        """
+        Replace the contents, e.g. with a compressed encoding of them.
+
+        Mirrors `GlbWriter.rewrite`: the buffer is emptied and `rewriter` is
+        called with a function reading (offset, length) from the old contents.
+        """
+        source = self._data[: self._length]
+        self._data = np.empty(0, dtype=np.uint8)
+        self._length = 0
+        rewriter(lambda offset, length: source[offset : offset + length])
+
+    def data_uri(self) -> str:
+        encoded = base64.b64encode(self.getbuffer()).decode("ascii")
+        return f"data:application/octet-stream;base64,{encoded}"
+
+
+class BufferBuilder:
+    """
+    Lay out the document's bufferViews across one or more buffers.
+
+    `len()`, `extend()` and `rewrite()` act on the first buffer as a whole,
+    which is what re-encoding it with meshopt compression needs.
+    """
+
+    def __init__(
+        self,
+        gltf: GLTF2,
+        sink=None,
+        max_length: int = MAX_BUFFER_LENGTH,
+    ):
+        """
+        Add the first buffer to the document.
+
+        Args:
+            gltf (GLTF2): The document whose buffers and bufferViews are written.
+            sink: Receives the first buffer, e.g. a `GlbWriter`. Defaults to a
+                `MemoryBuffer` embedded as a data URI.
+            max_length (int): Length past which a new buffer is started.
+        """
+        self.gltf = gltf
+        self.max_length = max_length
+        self.sinks: List = [MemoryBuffer() if sink is None else sink]
+        self.buffer_indices: List[int] = [len(gltf.buffers)]
+        gltf.buffers.append(Buffer())
+
+    @property
+    def buffer(self) -> Buffer:
+        """The first buffer, e.g. the BIN chunk of a GLB."""
+        return self.gltf.buffers[self.buffer_indices[0]]
+
+    def __len__(self) -> int:
+        return len(self.sinks[0])
+
+    def extend(self, data) -> None:
+        self.sinks[0].extend(data)
+
+    def rewrite(self, rewriter) -> None:
+        self.sinks[0].rewrite(rewriter)
+
+    def reserve(self, nbytes: int) -> None:
+        """
+        Preallocate room for views about to be written, e.g. a whole primitive.
+
+        Sinks streaming to disk have nothing to preallocate and ignore this.
+        """
+        reserve = getattr(self.sinks[-1], "reserve", None)
+        if reserve is not None:
+            reserve(nbytes + VIEW_ALIGNMENT)
+
+    def _new_buffer(self) -> None:
+        index = len(self.gltf.buffers)
+        external = getattr(self.sinks[0], "external_buffer", None)
+        self.sinks.append(MemoryBuffer() if external is None else external(index))
+        self.buffer_indices.append(index)
+        self.gltf.buffers.append(Buffer())
+
+    def add_view(
+        self,
+        data,
+        target: Optional[int] = None,
+        byte_stride: Optional[int] = None,
+        alignment: int = VIEW_ALIGNMENT,
+    ) -> int:
+        """
+        Write data as a new bufferView.
+
+        A view that does not fit in the current buffer starts a new one; a
+        single view longer than `max_length` gets a buffer of its own.
+
+        Args:
+            data: Bytes, or a C-contiguous array, written without copying.
+            target (Optional[int]): The view's GL buffer target, if any.
+            byte_stride (Optional[int]): The stride of interleaved or padded
+                vertex attributes.
+            alignment (int): Byte boundary the view starts on.
+
+        Returns:
+            int: The index of the new bufferView.
+        """
+        view = memoryview(data).cast("B")
+        sink = self.sinks[-1]
+        padding = -len(sink) % alignment
+        if len(sink) and len(sink) + padding + view.nbytes > self.max_length:
+            self._new_buffer()
+            sink, padding = self.sinks[-1], 0
+
+        sink.extend(bytes(padding))
+        self.gltf.bufferViews.append(
+            BufferView(
+                buffer=self.buffer_indices[len(self.sinks) - 1],
+                byteOffset=len(sink),
+                byteLength=view.nbytes,
+                byteStride=byte_stride,
+                target=target,
+            )
+        )
+        sink.extend(view)
+        return len(self.gltf.bufferViews) - 1
+
+    def finish(self) -> None:
+        """Record the buffer lengths and embed or close the buffers."""
+        for position, (index, sink) in enumerate(zip(self.buffer_indices, self.sinks)):
+            buffer = self.gltf.buffers[index]
+            buffer.byteLength = len(sink)
+            if isinstance(sink, MemoryBuffer):
+                buffer.uri = sink.data_uri()
+            elif position:
+                # An external file next to the first buffer's.
+                sink.close()
+                buffer.uri = sink.path.name
@@ -0,0 +1,171 @@
+import sqlite3
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.gltf.parallel import ConvertedMesh
+
+# Bump whenever the conversion changes so stale entries are never read back.
+CACHE_VERSION = 1
+
+
+class ConversionCache:
+    """
+    Converted display meshes kept on disk between runs, keyed by Speckle id.
+
+    Speckle ids are content hashes, so a mesh converted for one version can be
+    reused by every later version that still contains it. Entries hold the
+    Y-up float32 positions, uint32 triangles and the pre-cleanup counts in a
+    SQLite file. Once the stored arrays exceed `max_bytes` the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        """
+        Args:
+            path (Path): The SQLite file, created if missing.
+            max_bytes (int): Total size of the stored arrays to evict down to.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS meshes ("
+            " key TEXT PRIMARY KEY,"
+            " vertex_count INTEGER, face_count INTEGER,"
+            " before_vertices INTEGER, before_faces INTEGER,"
+            " data BLOB, size INTEGER, last_used INTEGER)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS meshes_last_used ON meshes (last_used)"
+        )
+        self._clock, self._size = self._connection.execute(
+            "SELECT COALESCE(MAX(last_used), 0), COALESCE(SUM(size), 0) FROM meshes"
+        ).fetchone()
+
+    @staticmethod
+    def key(display_mesh, tolerance: Optional[float]) -> Optional[str]:
+        """
+        Build the cache key for a display mesh, or None if it cannot be cached.
+
+        Meshes without a Speckle id, e.g. built locally rather than received,
+        are not cached. The weld tolerance is part of the key because it
+        changes the stored arrays.
+        """
+        speckle_id = getattr(display_mesh, "id", None)
+        if not speckle_id:
+            return None
+        return f"{CACHE_VERSION}:{speckle_id}:{tolerance!r}"
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        row = self._connection.execute(
+            "SELECT 1 FROM meshes WHERE key = ?", (key,)
+        ).fetchone()
+        return row is not None
+
+    def get(self, key: Optional[str]) -> Optional[ConvertedMesh]:
+        """
+        Return the converted mesh stored for `key`, counting hits and misses.
+
+        Returns:
+            Optional[ConvertedMesh]: The positions, faces and pre-cleanup
+                counts, or None if the mesh is not cached.
+        """
+        if key is None:
+            return None
+
+        row = self._connection.execute(
+            "SELECT vertex_count, face_count, before_vertices, before_faces, data"
+            " FROM meshes WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._connection.execute(
+            "UPDATE meshes SET last_used = ? WHERE key = ?", (self._tick(), key)
+        )
+        vertex_count, face_count, before_vertices, before_faces, data = row
+        vertices = np.frombuffer(data, np.float32, vertex_count * 3)
+        faces = np.frombuffer(data, np.uint32, face_count * 3, vertices.nbytes)
+        return (
+            vertices.reshape(-1, 3).copy(),
+            faces.reshape(-1, 3).copy(),
+            (before_vertices, before_faces),
+        )
+
+    def put(
+        self,
+        key: Optional[str],
+        vertices: np.ndarray,
+        faces: np.ndarray,
+        before: Tuple[int, int],
+    ) -> None:
+        """Store a converted mesh under `key`, evicting old entries if needed."""
+        if key is None:
+            return
+
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        faces = np.ascontiguousarray(faces, dtype=np.uint32)
+        size = vertices.nbytes + faces.nbytes
+        if size > self.max_bytes:
+            return
+
+        previous = self._connection.execute(
+            "SELECT size FROM meshes WHERE key = ?", (key,)
+        ).fetchone()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO meshes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                len(vertices),
+                len(faces),
+                before[0],
+                before[1],
+                vertices.tobytes() + faces.tobytes(),
+                size,
+                self._tick(),
+            ),
+        )
+        self._size += size - (previous[0] if previous else 0)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Drop the least recently used entries until the cache fits `max_bytes`."""
+        while self._size > self.max_bytes:
+            rows = self._connection.execute(
+                "SELECT key, size FROM meshes ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._connection.execute("DELETE FROM meshes WHERE key = ?", (key,))
+                self._size -= size
+
+    def close(self) -> None:
+        """Write pending changes to disk and close the file."""
+        self._connection.commit()
+        self._connection.close()
+
+    def summary(self) -> str:
+        """Describe how many conversions were read back from disk."""
+        return (
+            f"Conversion cache: {self.hits} hits, {self.misses} misses "
+            f"({self._size} bytes stored)"
+        )
@@ -1,185 +1,292 @@
-import base64
-from typing import cast, Optional
-
-import trimesh
-from pygltflib import (
-    GLTF2,
-    Scene,
-    Mesh,
-    Buffer,
-    Asset,
-)
+from dataclasses import replace
+from typing import cast, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
 from specklepy.objects import Base
 from specklepy.objects.geometry import Mesh as SpeckleMesh
-from specklepy.objects.other import Transform
-from trimesh.exchange.export import export_scene
-
-from src.gltf.element import speckle_to_element
-from src.gltf.helpers import add_nodes_and_meshes
-from src.gltf.material import speckle_to_gltf_pbr
-from src.gltf.mesh import process_speckle_mesh, is_speckle_mesh
-from src.gltf.metadata import add_metadata_to_node
-from src.gltf.primitive import create_primitive
-from src.inputs import FunctionInputs, ExportFormat
-from src.utils.checks import ElementCheckRules
+
+from src.gltf.instances import speckle_to_gltf_matrix
+from src.gltf.merge import MergedMeshBuilder
+from src.gltf.mesh import is_speckle_mesh
+from src.gltf.metadata import extract_metadata
+from src.gltf.options import ExportOptions
+from src.gltf.session import ExportSession
 from src.utils.flatten import (
-    flatten_base_thorough,
     extract_base_and_transform,
+    traverse_base,
 )
-from src.utils.store import prep_temp_file
-
-
-def create_gltf(speckle_data: Base, include_metadata: bool):
-    gltf = GLTF2()
-    gltf.asset = Asset(version="2.0", generator="Speckle to GLTF Converter")
-    main_scene = Scene(nodes=[])
-    gltf.scenes.append(main_scene)
-    gltf.scene = 0
-    buffer = Buffer()
-    gltf.buffers.append(buffer)
-    buffer_data = bytearray()
-
-    flattened = list(flatten_base_thorough(speckle_data))
-
-    for obj_index, obj in enumerate(flattened):
-
-        display_value: Base = getattr(obj, "displayValue", None) or getattr(
-            obj, "@displayValue", None
-        )  # old conversions may have used the @displayValue
-
-        if isinstance(display_value, list):
-            display_meshes = display_value
-        else: 
-            display_meshes = [display_value]
-
-        mesh_indices = []
-        for display in display_meshes:
-            if is_speckle_mesh(display):
-                display_mesh = cast(SpeckleMesh, display)
-                vertices, faces = process_speckle_mesh(display_mesh)
-
-                # Create material (if available)
-                material_index = (
-                    speckle_to_gltf_pbr(display_mesh.renderMaterial, gltf)
-                    if hasattr(display_mesh, "renderMaterial")
-                    else None
-                )
-
-                primitive = create_primitive(
-                    vertices, faces, gltf, buffer_data, material_index
-                )
-                mesh = Mesh(primitives=[primitive])
-                mesh_index = len(gltf.meshes)
-                gltf.meshes.append(mesh)
-                mesh_indices.append(mesh_index)
+from src.utils.instrument import active
+from src.utils.lazy import LazyVersion
+from src.utils.store import GlbWriter
+
+
+def convert_display_meshes(
+    display_meshes: List[Base], session: ExportSession
+) -> List[int]:
+    """
+    Convert the display meshes of one object into glTF meshes.
+
+    Geometry already written for an earlier object is looked up in the cache and
+    referenced again instead of being converted and stored a second time.
+    Geometry found in the previous export is copied from it. Converted meshes
+    get their simplified levels of detail when those are enabled.
+
+    Args:
+        display_meshes (List[Base]): The object's display values.
+        session (ExportSession): The export the meshes are added to.
+
+    Returns:
+        List[int]: The glTF mesh indices for the object.
+    """
+    mesh_indices = []
+    for display in display_meshes:
+        if not is_speckle_mesh(display):
+            continue
+        display_mesh = cast(SpeckleMesh, display)
+
+        # Create material (if available)
+        material_index = session.material_index(display_mesh)
+
+        key = session.geometry_cache.key(display_mesh, material_index)
+        mesh_index = session.geometry_cache.get(key)
+        if mesh_index is None:
+            mesh_index = session.reuse_mesh(display_mesh, material_index)
+        if mesh_index is None:
+            units = getattr(display_mesh, "units", None)
+            vertices, faces = session.process_mesh(display_mesh)
+            # Welding can collapse every triangle; there is nothing to draw.
+            if len(faces) == 0:
+                continue
+            primitive, matrix = session.create_primitive(
+                vertices, faces, material_index, units
+            )
+            mesh_index = session.add_mesh([primitive], matrix)
+            session.add_lods(mesh_index, vertices, faces, material_index, units)
+        session.geometry_cache.add(key, mesh_index)
+        session.record_mesh(display_mesh, mesh_index)
 
-        if mesh_indices:
-            node = add_nodes_and_meshes(gltf, main_scene, mesh_indices)
+        mesh_indices.append(mesh_index)
 
-            if include_metadata:
-                add_metadata_to_node(node, obj)
+    return mesh_indices
 
-    buffer.uri = f"data:application/octet-stream;base64,{base64.b64encode(buffer_data).decode('ascii')}"
-    buffer.byteLength = len(buffer_data)
-    return gltf
 
+def get_display_meshes(obj: Base, legacy_display_value: bool = True) -> List[Base]:
+    """
+    Return the Speckle meshes among an object's display values.
 
-def create_gltf_from_instances(speckle_data: Base, include_metadata: bool):
-    gltf = GLTF2()
-    gltf.asset = Asset(version="2.0", generator="Speckle to GLTF Converter")
-    main_scene = Scene(nodes=[])
-    gltf.scenes.append(main_scene)
-    gltf.scene = 0
-    buffer = Buffer()
-    gltf.buffers.append(buffer)
-    buffer_data = bytearray()
+    Args:
+        obj (Base): The Speckle object.
+        legacy_display_value (bool): Also read `@displayValue`, which old
+            conversions may have used.
+
+    Returns:
+        List[Base]: The display values that are Speckle meshes.
+    """
+    display_value = getattr(obj, "displayValue", None)
+    if legacy_display_value and not display_value:
+        display_value = getattr(obj, "@displayValue", None)
+    display_values = (
+        display_value if isinstance(display_value, list) else [display_value]
+    )
+    return [mesh for mesh in display_values if is_speckle_mesh(mesh)]
 
-    for base, obj_id, transforms in extract_base_and_transform(speckle_data):
-        display_value: Base = getattr(base, "displayValue", None)
-        display_meshes = (
-            display_value if isinstance(display_value, list) else [display_value]
-        )
 
-        mesh_indices = []
-        for display in display_meshes:
-            if is_speckle_mesh(display):
-                display_mesh = cast(SpeckleMesh, display)
-                vertices, faces = process_speckle_mesh(display_mesh, transforms)
-
-                # Create material (if available)
-                material_index = (
-                    speckle_to_gltf_pbr(display_mesh.renderMaterial, gltf)
-                    if hasattr(display_mesh, "renderMaterial")
-                    else None
-                )
-
-                primitive = create_primitive(
-                    vertices, faces, gltf, buffer_data, material_index
-                )
-                mesh = Mesh(primitives=[primitive])
-                mesh_index = len(gltf.meshes)
-                gltf.meshes.append(mesh)
-                mesh_indices.append(mesh_index)
+def traverse_version(
+    speckle_data: Union[Base, LazyVersion],
+) -> Iterator[Tuple[Base, Optional[str]]]:
+    """Walk a received version, or deserialize a lazily received one as it is walked."""
+    if isinstance(speckle_data, LazyVersion):
+        return speckle_data.traverse()
+    return traverse_base(speckle_data)
+
+
+def create_gltf(
+    speckle_data: Union[Base, LazyVersion],
+    include_metadata: bool,
+    buffer_data: Optional[GlbWriter] = None,
+    options: Optional[ExportOptions] = None,
+):
+    """
+    Build a glTF document with one node per displayable Speckle object.
+
+    Args:
+        speckle_data (Union[Base, LazyVersion]): The root of the received
+            Speckle version, or a version to deserialize while it is exported.
+        include_metadata (bool): Whether to attach Speckle properties to the nodes.
+        buffer_data (Optional[GlbWriter]): Streams geometry straight to a GLB
+            file; when omitted it is collected in memory and embedded.
+        options (Optional[ExportOptions]): Conversion settings.
+
+    Returns:
+        GLTF2: The glTF document.
+    """
+    session = ExportSession(buffer_data, options)
+
+    objects = session.prefetch(
+        traverse_version(speckle_data), lambda item: get_display_meshes(item[0])
+    )
+
+    for obj, parent_type in objects:
+        mesh_indices = convert_display_meshes(get_display_meshes(obj), session)
 
         if mesh_indices:
-            node = add_nodes_and_meshes(gltf, main_scene, mesh_indices)
+            node = session.add_node(mesh_indices)
 
             if include_metadata:
-                add_metadata_to_node(node, base)
+                session.add_metadata(node, obj, {"parent_type": parent_type})
 
-    buffer.uri = f"data:application/octet-stream;base64,{base64.b64encode(buffer_data).decode('ascii')}"
-    buffer.byteLength = len(buffer_data)
-    return gltf
+    return session.finish()
 
 
-def create_gltf_from_trimesh(
-    speckle_data: Base, model_name: str, function_inputs: FunctionInputs
+def create_gltf_from_instances(
+    speckle_data: Base,
+    include_metadata: bool,
+    gpu_instancing_threshold: Optional[int] = 16,
+    buffer_data: Optional[GlbWriter] = None,
+    options: Optional[ExportOptions] = None,
 ):
+    """
+    Build a glTF document that keeps Speckle instances as instances.
+
+    Each block or family definition is converted once. Every occurrence becomes
+    a node carrying the instance transform, and when a definition occurs at
+    least `gpu_instancing_threshold` times its occurrences are collapsed into a
+    single EXT_mesh_gpu_instancing node instead.
+
+    Args:
+        speckle_data (Base): The root of the received Speckle version.
+        include_metadata (bool): Whether to attach Speckle properties to the nodes.
+        gpu_instancing_threshold (Optional[int]): Occurrence count from which GPU
+            instancing is used, or None to always emit one node per occurrence.
+        buffer_data (Optional[GlbWriter]): Streams geometry straight to a GLB
+            file; when omitted it is collected in memory and embedded.
+        options (Optional[ExportOptions]): Conversion settings.
+
+    Returns:
+        GLTF2: The glTF document.
+    """
+    session = ExportSession(buffer_data, options)
+
+    # Instanced occurrences, grouped by the meshes they draw.
+    occurrences: Dict[Tuple[int, ...], List[Tuple[np.ndarray, Base]]] = {}
+
+    references = session.prefetch(
+        extract_base_and_transform(speckle_data),
+        lambda item: get_display_meshes(item[0], legacy_display_value=False),
+    )
+
+    for base, obj_id, transforms in references:
+        display_value: Base = getattr(base, "displayValue", None)
+        display_meshes = (
+            display_value if isinstance(display_value, list) else [display_value]
+        )
 
-    reference_objects: tuple[
-        Base,
-        str,
-        Optional[Transform],
-    ] = extract_base_and_transform(speckle_data)
+        mesh_indices = convert_display_meshes(display_meshes, session)
+        if not mesh_indices:
+            continue
 
-    element_rules = ElementCheckRules()
+        if transforms:
+            occurrences.setdefault(tuple(mesh_indices), []).append(
+                (speckle_to_gltf_matrix(transforms), base)
+            )
+            continue
+
+        node = session.add_node(mesh_indices)
+        if include_metadata:
+            session.add_metadata(node, base)
+
+    for mesh_indices, group in occurrences.items():
+        node = None
+        if (
+            gpu_instancing_threshold is not None
+            and len(group) >= gpu_instancing_threshold
+        ):
+            node = session.add_instanced_node(
+                list(mesh_indices), np.stack([matrix for matrix, _ in group])
+            )
 
-    visible_objects_rule = element_rules.rule_combiner(
-        element_rules.is_displayable_rule(),
+        if node is None:
+            for matrix, base in group:
+                node = session.add_node(list(mesh_indices), matrix)
+                if include_metadata:
+                    session.add_metadata(node, base)
+            continue
+
+        if include_metadata and session.property_table is not None:
+            node.extras = {
+                "speckle_feature_ids": [session.add_feature(base) for _, base in group]
+            }
+        elif include_metadata:
+            with active().stage("metadata", items=len(group)):
+                node.extras = {
+                    "speckle_metadata": [extract_metadata(base) for _, base in group]
+                }
+
+    return session.finish()
+
+
+def create_gltf_merged(
+    speckle_data: Union[Base, LazyVersion],
+    include_metadata: bool,
+    buffer_data: Optional[GlbWriter] = None,
+    options: Optional[ExportOptions] = None,
+):
+    """
+    Build a glTF document with all geometry merged into per-material primitives.
+
+    The whole model becomes a single node whose mesh has roughly one primitive
+    per material, so viewers issue a handful of draw calls instead of one per
+    element. Each vertex carries an EXT_mesh_features feature id indexing the
+    node's `speckle_feature_ids` extras.
+
+    Args:
+        speckle_data (Union[Base, LazyVersion]): The root of the received
+            Speckle version, or a version to deserialize while it is exported.
+        include_metadata (bool): Whether to attach Speckle properties, per feature.
+        buffer_data (Optional[GlbWriter]): Streams geometry straight to a GLB
+            file; when omitted it is collected in memory and embedded.
+        options (Optional[ExportOptions]): Conversion settings.
+
+    Returns:
+        GLTF2: The glTF document.
+    """
+    # Merged primitives mix many objects, so no earlier byte range can be reused.
+    options = replace(
+        options or ExportOptions(), incremental=False, previous_export=None
     )
+    session = ExportSession(buffer_data, options)
+    merged = MergedMeshBuilder(session)
+    metadata = []
 
-    reference_displayable_objects = [
-        (base_obj, speckle_id, transform)
-        for base_obj, speckle_id, transform in reference_objects
-        if visible_objects_rule(base_obj)
-    ]
-
-    reference_elements = [
-        speckle_to_element(obj) for obj in reference_displayable_objects
-    ]
-
-    if not reference_elements:
-        return None
-
-    # Create a Trimesh scene
-    scene = trimesh.Scene()
-
-    for element in reference_elements:
-        for mesh in element.meshes:
-            # Add each mesh to the scene
-            scene.add_geometry(
-                mesh,
-                node_name=element.id,  # Use the element's ID as the node name
-                metadata=(
-                    {"speckle_id": element.id}
-                    if function_inputs.include_metadata
-                    else None
-                ),
-            )
+    objects = session.prefetch(
+        traverse_version(speckle_data), lambda item: get_display_meshes(item[0])
+    )
 
-    temp_file = prep_temp_file(model_name, ".glb")
+    for obj, parent_type in objects:
+        display_meshes = get_display_meshes(obj)
+        if not display_meshes:
+            continue
+
+        feature_id = merged.add_feature(getattr(obj, "id", None))
+        if include_metadata and session.property_table is not None:
+            # Property table rows are added in feature id order.
+            session.add_feature(obj, {"parent_type": parent_type})
+        elif include_metadata:
+            with active().stage("metadata", items=1):
+                metadata.append(extract_metadata(obj, {"parent_type": parent_type}))
+
+        for display_mesh in display_meshes:
+            vertices, faces = session.process_mesh(display_mesh)
+            merged.add(
+                vertices,
+                faces,
+                session.material_index(display_mesh),
+                feature_id,
+                getattr(display_mesh, "units", None),
+            )
 
-    # Export the scene
-    export_scene(scene, file_obj=temp_file, file_type="glb")
+    node = merged.finish()
+    if node is not None and include_metadata and session.property_table is None:
+        node.extras["speckle_metadata"] = metadata
 
-    return str(temp_file)
+    return session.finish()
@@ -0,0 +1,62 @@
+import hashlib
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+
+
+class GeometryCache:
+    """
+    Map Speckle display meshes to the glTF mesh already written for them.
+
+    Speckle object ids are content hashes, so two display meshes with the same
+    id carry the same geometry and can share one glTF mesh. Meshes without an
+    id (e.g. objects built locally rather than received) fall back to a hash of
+    their vertex and face buffers.
+    """
+
+    def __init__(self):
+        self._meshes: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(display_mesh: SpeckleMesh, material_index: Optional[int]) -> Tuple:
+        """
+        Build the cache key for a display mesh.
+
+        Args:
+            display_mesh (SpeckleMesh): The Speckle mesh.
+            material_index (Optional[int]): The glTF material the mesh will use.
+
+        Returns:
+            Tuple: A hashable key identifying the geometry and its material.
+        """
+        speckle_id = getattr(display_mesh, "id", None)
+        if speckle_id:
+            return "id", speckle_id, material_index
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.asarray(display_mesh.vertices, dtype=np.float64).tobytes())
+        digest.update(np.asarray(display_mesh.faces, dtype=np.int64).tobytes())
+        return "hash", digest.hexdigest(), material_index
+
+    def get(self, key: Hashable) -> Optional[int]:
+        """Return the glTF mesh index stored for `key`, counting hits and misses."""
+        mesh_index = self._meshes.get(key)
+        if mesh_index is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return mesh_index
+
+    def add(self, key: Hashable, mesh_index: int) -> None:
+        """Remember that `key` was written as glTF mesh `mesh_index`."""
+        self._meshes[key] = mesh_index
+
+    def summary(self) -> str:
+        """Describe how much geometry was shared."""
+        return (
+            f"Geometry cache: {len(self._meshes)} unique meshes "
+            f"for {self.hits + self.misses} display meshes ({self.hits} reused)"
+        )
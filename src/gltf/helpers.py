@@ -1,10 +1,18 @@
-from typing import List
+from typing import TYPE_CHECKING, List
 
 import numpy as np
-import trimesh
 from pygltflib import Node
 from specklepy.objects.geometry import Vector, Mesh as SpeckleMesh
 
+from src.gltf.instances import decompose_trs, gltf_node_matrix
+from src.gltf.primitive import create_float_accessor
+from src.gltf.triangulate import triangulate_polygon, triangulate_polygons
+
+if TYPE_CHECKING:
+    import trimesh
+
+GPU_INSTANCING = "EXT_mesh_gpu_instancing"
+
 
 def convert_numpy_types(obj):
     if isinstance(obj, np.integer):
@@ -20,159 +28,216 @@ def convert_numpy_types(obj):
     return obj
 
 
-def add_nodes_and_meshes(gltf, main_scene, mesh_indices):
+def add_nodes_and_meshes(
+    gltf, main_scene, mesh_indices, matrix=None, mesh_matrices=None
+):
+    """
+    Add a scene node drawing the given meshes.
+
+    Args:
+        gltf (GLTF2): The glTF document being built.
+        main_scene (Optional[Scene]): The scene the node is added to, or None
+            for a node only referenced from another, e.g. as an MSFT_lod level.
+        mesh_indices (List[int]): The meshes the node draws.
+        matrix (Optional[np.ndarray]): The node's own 4x4 transform.
+        mesh_matrices (Optional[Dict[int, np.ndarray]]): Transforms specific to
+            a mesh (e.g. dequantization), applied before `matrix`.
+
+    Returns:
+        Node: The node that was added.
+    """
+    mesh_matrices = mesh_matrices or {}
+
     # Create a single node for all meshes of this object
     node = Node(mesh=None)
     node_index = len(gltf.nodes)
     gltf.nodes.append(node)
-    main_scene.nodes.append(node_index)
+    if main_scene is not None:
+        main_scene.nodes.append(node_index)
     # If we have only one mesh, set it directly on the node
     if len(mesh_indices) == 1:
         node.mesh = mesh_indices[0]
+        mesh_matrix = mesh_matrices.get(node.mesh)
+        if mesh_matrix is not None:
+            matrix = mesh_matrix if matrix is None else matrix @ mesh_matrix
     # If we have multiple meshes, create child nodes for each mesh
     elif len(mesh_indices) > 1:
         node.children = []
         for mesh_index in mesh_indices:
             child_node = Node(mesh=mesh_index)
+            if mesh_index in mesh_matrices:
+                child_node.matrix = gltf_node_matrix(mesh_matrices[mesh_index])
             child_node_index = len(gltf.nodes)
             gltf.nodes.append(child_node)
             node.children.append(child_node_index)
+
+    if matrix is not None and not np.allclose(matrix, np.identity(4)):
+        node.matrix = gltf_node_matrix(matrix)
     return node
 
 
-def calculate_polygon_normal(vertices: List[Vector]) -> Vector:
+def add_gpu_instanced_nodes(
+    gltf, main_scene, buffer_data, mesh_indices, matrices, mesh_matrices=None
+):
     """
-    Calculate the normal vector for a polygon represented by a list of vertices.
+    Add one node that draws many occurrences of the same meshes.
+
+    The per-occurrence transforms are written as EXT_mesh_gpu_instancing
+    attributes. Instance transforms are applied before the node's own, so
+    mesh-specific matrices are folded into the instances of that mesh.
 
     Args:
-        vertices (List[Vector]): A list of vertices representing the polygon.
+        gltf (GLTF2): The glTF document being built.
+        main_scene (Optional[Scene]): The scene the node is added to, if any.
+        buffer_data (bytearray): The binary buffer the attributes are written to.
+        mesh_indices (List[int]): The meshes drawn for every occurrence.
+        matrices (np.ndarray): (n, 4, 4) occurrence transforms.
+        mesh_matrices (Optional[Dict[int, np.ndarray]]): Transforms specific to
+            a mesh, applied before the occurrence transform.
 
     Returns:
-        Vector: The normal vector of the polygon.
+        Optional[Node]: The node that was added to the scene, or None if some
+            transform cannot be expressed as translation, rotation and scale.
     """
-    normal = Vector.from_list([0.0, 0.0, 0.0])
-    num_vertices = len(vertices)
-    for i in range(num_vertices):
-        curr, nxt = vertices[i], vertices[(i + 1) % num_vertices]
-        # Cross product components are accumulated to find the normal.
-        normal.x += (curr.y - nxt.y) * (curr.z + nxt.z)
-        normal.y += (curr.z - nxt.z) * (curr.x + nxt.x)
-        normal.z += (curr.x - nxt.x) * (curr.y + nxt.y)
-
-    # Normalize the calculated normal vector.
-    length = np.sqrt(normal.x**2 + normal.y**2 + normal.z**2)
-    normal.x, normal.y, normal.z = (
-        normal.x / length,
-        normal.y / length,
-        normal.z / length,
+    mesh_matrices = mesh_matrices or {}
+
+    decomposed = {}
+    for mesh_index in mesh_indices:
+        mesh_matrix = mesh_matrices.get(mesh_index)
+        key = None if mesh_matrix is None else mesh_index
+        if key not in decomposed:
+            trs = decompose_trs(
+                matrices if mesh_matrix is None else matrices @ mesh_matrix
+            )
+            if trs is None:
+                return None
+            decomposed[key] = trs
+
+    instancing = {}
+    for key, (translations, rotations, scales) in decomposed.items():
+        instancing[key] = {
+            GPU_INSTANCING: {
+                "attributes": {
+                    "TRANSLATION": create_float_accessor(
+                        translations, gltf, buffer_data, "VEC3"
+                    ),
+                    "ROTATION": create_float_accessor(
+                        rotations, gltf, buffer_data, "VEC4"
+                    ),
+                    "SCALE": create_float_accessor(scales, gltf, buffer_data, "VEC3"),
+                }
+            }
+        }
+    for extension_list in (gltf.extensionsUsed, gltf.extensionsRequired):
+        if GPU_INSTANCING not in extension_list:
+            extension_list.append(GPU_INSTANCING)
+
+    node = add_nodes_and_meshes(gltf, main_scene, mesh_indices)
+    mesh_nodes = (
+        [node] if node.mesh is not None else [gltf.nodes[i] for i in node.children]
     )
-    return normal
+    for mesh_node in mesh_nodes:
+        key = mesh_node.mesh if mesh_node.mesh in mesh_matrices else None
+        mesh_node.extensions = instancing[key]
+    return node
 
 
-def is_point_within_triangle(pt: Vector, v1: Vector, v2: Vector, v3: Vector) -> bool:
+def triangulate_face(vertices: List[Vector]) -> List[List[int]]:
     """
-    Check if a point is inside a given triangle.
+    Triangulate a polygon defined by a list of vertices.
 
     Args:
-        pt (Vector): The point to check.
-        v1, v2, v3 (Vector): The vertices of the triangle.
+        vertices (List[Vector]): The vertices of the polygon.
 
     Returns:
-        bool: True if the point is inside the triangle, False otherwise.
+        List[List[int]]: A list of triangles, each represented as a list of vertex indices.
     """
+    points = np.array([[v.x, v.y, v.z] for v in vertices], dtype=np.float64)
+    return triangulate_polygon(points.reshape((-1, 3))).tolist()
 
-    def sign(p1, p2, p3):
-        return (p1.x - p3.x) * (p2.y - p3.y) - (p2.x - p3.x) * (p1.y - p3.y)
-
-    b1 = sign(pt, v1, v2) < 0.0
-    b2 = sign(pt, v2, v3) < 0.0
-    b3 = sign(pt, v3, v1) < 0.0
-
-    return (b1 == b2) and (b2 == b3)
 
-
-def is_convex(a: Vector, b: Vector, c: Vector, normal: Vector) -> bool:
+def find_face_headers(faces: np.ndarray) -> np.ndarray:
     """
-    Check if a triangle formed by three vertices (a, b, c) is convex with respect to a given normal.
+    Locate the header (vertex count) positions of a Speckle run-length face array.
+
+    Runs of equally sized faces are confirmed in bulk: from a header with count n
+    every (n + 1)th slot is speculatively treated as the next header, and the
+    speculation window doubles until a slot disagrees. The number of Python-level
+    iterations is therefore proportional to the number of size changes in the
+    array, not to the number of faces.
 
     Args:
-        a (Vector): The first vertex of the triangle.
-        b (Vector): The second vertex of the triangle.
-        c (Vector): The third vertex of the triangle.
-        normal (Vector): The normal vector with respect to which convexity is checked.
+        faces (np.ndarray): The raw Speckle faces array.
 
     Returns:
-        bool: True if the triangle is convex with respect to the normal, False otherwise.
+        np.ndarray: The indices of every face header in `faces`.
     """
-    ab = Vector.from_list([b.x - a.x, b.y - a.y, b.z - a.z])
-    bc = Vector.from_list([c.x - b.x, c.y - b.y, c.z - b.z])
-    cross = Vector.from_list(
-        [
-            ab.y * bc.z - ab.z * bc.y,
-            ab.z * bc.x - ab.x * bc.z,
-            ab.x * bc.y - ab.y * bc.x,
-        ]
-    )
+    total = len(faces)
+    # Vertex count each slot would describe if it were a header.
+    # Old displayMeshes used 0 to indicate a triangle.
+    counts_at = np.where(faces == 0, 3, faces)
+
+    runs = []
+    position = 0
+    while position < total:
+        count = int(counts_at[position])
+        stride = count + 1
+        if stride <= 0:
+            raise ValueError(f"Invalid face vertex count {count} at {position}")
+
+        run_start = position
+        window = 16
+        while position < total:
+            candidates = np.arange(
+                position, min(total, position + window * stride), stride
+            )
+            mismatched = np.flatnonzero(counts_at[candidates] != count)
+            if mismatched.size:
+                position = int(candidates[mismatched[0]])
+                break
+            position = int(candidates[-1]) + stride
+            window *= 2
 
-    # Dot product to compare with the face normal
-    return cross.x * normal.x + cross.y * normal.y + cross.z * normal.z > 0
+        runs.append(np.arange(run_start, position, stride))
 
+    return np.concatenate(runs) if runs else np.zeros(0, dtype=np.int64)
 
-def triangulate_face(vertices: List[Vector]) -> List[List[int]]:
+
+def decode_speckle_faces(faces, vertices: np.ndarray) -> np.ndarray:
     """
-    Triangulate a polygon defined by a list of vertices.
+    Decode a Speckle run-length face array into a triangle index array.
+
+    Faces are grouped by vertex count and handed to `triangulate_polygons`, so
+    triangles, concave quads and convex polygons of any size are handled with a
+    handful of array operations. Faces with fewer than three vertices are
+    dropped. Triangles are returned in the order of the faces they came from.
 
     Args:
-        vertices (List[Vector]): The vertices of the polygon.
+        faces: The Speckle faces array (count followed by that many indices).
+        vertices (np.ndarray): (n, 3) vertex positions, used to split non-triangles.
 
     Returns:
-        List[List[int]]: A list of triangles, each represented as a list of vertex indices.
+        np.ndarray: (m, 3) uint32 vertex indices of the triangles.
     """
-    triangles = []
-    indices = list(range(len(vertices)))
-    normal = calculate_polygon_normal(vertices)
-
-    # The ear clipping algorithm is used for triangulation.
-    while len(indices) > 2:
-        for i in range(len(indices)):
-            prev, curr, nxt = (
-                indices[i - 1],
-                indices[i],
-                indices[(i + 1) % len(indices)],
-            )
-            if is_convex(vertices[prev], vertices[curr], vertices[nxt], normal):
-                triangles.append([prev, curr, nxt])
-                del indices[i]
-                break
+    faces = np.asarray(faces, dtype=np.int64).ravel()
+    headers = find_face_headers(faces)
+    counts = np.where(faces[headers] == 0, 3, faces[headers])
 
-    return triangles
+    # Drop degenerate faces and a trailing face that runs past the array.
+    valid = (counts >= 3) & (headers + counts < len(faces))
+    headers, counts = headers[valid], counts[valid]
+    starts = headers + 1
 
+    return triangulate_polygons(vertices, faces, starts, counts).astype(np.uint32)
 
-def speckle_mesh_to_trimesh(input_mesh: SpeckleMesh) -> trimesh.Trimesh:
-    vertices = np.array(input_mesh.vertices).reshape((-1, 3))
-    faces = []
-
-    i = 0
-    while i < len(input_mesh.faces):
-        face_vertex_count = input_mesh.faces[i]
-        i += 1  # Skip the vertex count
 
-        face_vertex_indices = input_mesh.faces[i : i + face_vertex_count]
+def speckle_mesh_to_trimesh(input_mesh: SpeckleMesh) -> "trimesh.Trimesh":
+    # Only the trimesh backend needs trimesh, which is slow to import.
+    import trimesh
 
-        face_vertices = [
-            Vector.from_list(vertices[idx].tolist()) for idx in face_vertex_indices
-        ]
-
-        if face_vertex_count == 3:
-            faces.append(face_vertex_indices)
-        else:
-            triangulated = triangulate_face(face_vertices)
-            faces.extend(
-                [[face_vertex_indices[idx] for idx in tri] for tri in triangulated]
-            )
-
-        i += face_vertex_count
+    vertices = np.array(input_mesh.vertices).reshape((-1, 3))
+    faces = decode_speckle_faces(input_mesh.faces, vertices)
 
-    t_mesh = trimesh.Trimesh(vertices=vertices, faces=np.array(faces))
+    t_mesh = trimesh.Trimesh(vertices=vertices, faces=faces)
 
     return t_mesh
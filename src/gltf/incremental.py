@@ -0,0 +1,228 @@
+"""Reuse the geometry of a previous GLB export.
+
+An incremental export records in its `asset.extras` which glTF mesh holds
+each Speckle display mesh. The next export of the model opens that GLB and,
+for every display mesh whose id it already contains, copies the mesh's
+accessors and bufferViews across byte for byte instead of converting it.
+Speckle ids are content hashes, so only added or changed geometry is
+converted, and geometry no longer referenced is simply not copied.
+"""
+
+import copy
+import struct
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+from pygltflib import GLTF2, Attributes, Primitive
+
+from src.gltf.meshopt import MESHOPT_COMPRESSION, decode_meshopt_data
+from src.gltf.quantize import KHR_MESH_QUANTIZATION
+
+MANIFEST_KEY = "speckle_incremental"
+MANIFEST_VERSION = 1
+
+
+def manifest_settings(options) -> Dict:
+    """The conversion settings a previous export must share to be reused."""
+    return {
+        "version": MANIFEST_VERSION,
+        "quantize": options.quantize,
+        "quantization_precision": options.quantization_precision,
+        "weld_tolerance": options.weld_tolerance,
+        "normals": options.normals,
+        "crease_angle": options.crease_angle,
+        "compact_normals": options.compact_normals,
+    }
+
+
+def build_manifest(
+    options, mesh_ids: Dict[str, int], mesh_matrices: Dict[int, np.ndarray]
+) -> Dict:
+    """
+    Describe where each display mesh was written, for the next export to reuse.
+
+    Args:
+        options (ExportOptions): The settings the geometry was converted with.
+        mesh_ids (Dict[str, int]): Speckle display mesh ids and their glTF mesh.
+        mesh_matrices (Dict[int, np.ndarray]): Matrices nodes drawing a mesh apply.
+
+    Returns:
+        Dict: The manifest, stored in the document's `asset.extras`.
+    """
+    meshes = {}
+    for speckle_id, mesh_index in mesh_ids.items():
+        matrix = mesh_matrices.get(mesh_index)
+        meshes[speckle_id] = {
+            "mesh": mesh_index,
+            "matrix": None if matrix is None else matrix.ravel().tolist(),
+        }
+    return {"settings": manifest_settings(options), "meshes": meshes}
+
+
+class PreviousExport:
+    """
+    A GLB written by an earlier incremental export, opened for copying.
+
+    Only the JSON chunk is parsed; geometry is read from the BIN chunk one
+    bufferView at a time as meshes are copied.
+    """
+
+    def __init__(self, file: BinaryIO, gltf: GLTF2, bin_offset: int, meshes: Dict):
+        self._file = file
+        self.gltf = gltf
+        self._bin_offset = bin_offset
+        # Geometry in external buffers, past the BIN chunk, is converted again.
+        self._meshes = {
+            speckle_id: entry
+            for speckle_id, entry in meshes.items()
+            if self._in_bin_chunk(entry["mesh"])
+        }
+        self._views: Dict[int, int] = {}
+        self._accessors: Dict[int, int] = {}
+        self.reused = 0
+
+    @classmethod
+    def open(cls, path: Path, options) -> Optional["PreviousExport"]:
+        """
+        Open a previous export, or return None if it cannot be reused.
+
+        Args:
+            path (Path): The previous GLB.
+            options (ExportOptions): The settings of the new export; geometry
+                converted with other settings is not reused.
+        """
+        path = Path(path)
+        if not path.is_file():
+            return None
+
+        file = open(path, "rb")
+        try:
+            magic, _, _ = struct.unpack("<4sII", file.read(12))
+            json_length, chunk_type = struct.unpack("<I4s", file.read(8))
+            if magic != b"glTF" or chunk_type != b"JSON":
+                raise ValueError("not a GLB file")
+            gltf = GLTF2.from_json(file.read(json_length).decode("utf-8"))
+            manifest = (gltf.asset.extras or {}).get(MANIFEST_KEY)
+            if not manifest or manifest["settings"] != manifest_settings(options):
+                raise ValueError("exported without a matching manifest")
+        except (ValueError, KeyError, struct.error) as e:
+            print(f"Not reusing previous export {path}: {e}")
+            file.close()
+            return None
+
+        # Skip the BIN chunk header.
+        return cls(file, gltf, 12 + 8 + json_length + 8, manifest["meshes"])
+
+    def __contains__(self, speckle_id: Optional[str]) -> bool:
+        return speckle_id in self._meshes
+
+    def _in_bin_chunk(self, mesh_index: int) -> bool:
+        """Whether all of a mesh's data is stored in the GLB's BIN chunk."""
+        for primitive in self.gltf.meshes[mesh_index].primitives:
+            accessors = [primitive.indices, *vars(primitive.attributes).values()]
+            for accessor_index in accessors:
+                if accessor_index is None:
+                    continue
+                view = self.gltf.bufferViews[
+                    self.gltf.accessors[accessor_index].bufferView
+                ]
+                extension = (view.extensions or {}).get(MESHOPT_COMPRESSION)
+                buffer = view.buffer if extension is None else extension["buffer"]
+                if buffer != 0:
+                    return False
+        return True
+
+    def _read_view(self, view_index: int) -> bytes:
+        """Read the uncompressed contents of a bufferView of the previous export."""
+        view = self.gltf.bufferViews[view_index]
+        extension = (view.extensions or {}).get(MESHOPT_COMPRESSION)
+        if extension is not None:
+            self._file.seek(self._bin_offset + extension.get("byteOffset", 0))
+            return decode_meshopt_data(
+                extension, self._file.read(extension["byteLength"])
+            )
+
+        self._file.seek(self._bin_offset + (view.byteOffset or 0))
+        return self._file.read(view.byteLength)
+
+    def _copy_view(self, view_index: int, gltf: GLTF2, buffer_data) -> int:
+        if view_index not in self._views:
+            view = self.gltf.bufferViews[view_index]
+            self._views[view_index] = buffer_data.add_view(
+                self._read_view(view_index),
+                target=view.target,
+                byte_stride=view.byteStride,
+            )
+        return self._views[view_index]
+
+    def _copy_accessor(self, accessor_index: int, gltf: GLTF2, buffer_data) -> int:
+        if accessor_index not in self._accessors:
+            accessor = copy.deepcopy(self.gltf.accessors[accessor_index])
+            if accessor.componentType != 5126:  # GL_FLOAT
+                # pygltflib reads every bound as a float.
+                accessor.min = [int(value) for value in accessor.min or []] or None
+                accessor.max = [int(value) for value in accessor.max or []] or None
+            if accessor.bufferView is not None:
+                accessor.bufferView = self._copy_view(
+                    accessor.bufferView, gltf, buffer_data
+                )
+            gltf.accessors.append(accessor)
+            self._accessors[accessor_index] = len(gltf.accessors) - 1
+        return self._accessors[accessor_index]
+
+    def copy_mesh(
+        self, speckle_id: str, gltf: GLTF2, buffer_data, material_index: Optional[int]
+    ) -> Tuple[List[Primitive], Optional[np.ndarray]]:
+        """
+        Copy the glTF mesh written for a display mesh into a new document.
+
+        Args:
+            speckle_id (str): The display mesh's Speckle id; must be in the export.
+            gltf (GLTF2): The document being built.
+            buffer_data: The sink its geometry is written to.
+            material_index (Optional[int]): The material in the new document.
+
+        Returns:
+            Tuple[List[Primitive], Optional[np.ndarray]]: The copied primitives
+                and the matrix nodes drawing them must apply, if any.
+        """
+        entry = self._meshes[speckle_id]
+        primitives = []
+        for previous in self.gltf.meshes[entry["mesh"]].primitives:
+            attributes = Attributes()
+            for name, accessor_index in vars(previous.attributes).items():
+                if accessor_index is not None:
+                    setattr(
+                        attributes,
+                        name,
+                        self._copy_accessor(accessor_index, gltf, buffer_data),
+                    )
+            primitive = Primitive(attributes=attributes, mode=previous.mode)
+            if previous.indices is not None:
+                primitive.indices = self._copy_accessor(
+                    previous.indices, gltf, buffer_data
+                )
+            if material_index is not None:
+                primitive.material = material_index
+            primitives.append(primitive)
+
+        if KHR_MESH_QUANTIZATION in (self.gltf.extensionsUsed or []):
+            for extension_list in (gltf.extensionsUsed, gltf.extensionsRequired):
+                if KHR_MESH_QUANTIZATION not in extension_list:
+                    extension_list.append(KHR_MESH_QUANTIZATION)
+
+        self.reused += 1
+        matrix = entry.get("matrix")
+        return primitives, None if matrix is None else np.array(matrix).reshape(4, 4)
+
+    def close(self) -> None:
+        """Close the previous GLB."""
+        self._file.close()
+
+    def summary(self) -> str:
+        """Describe how much geometry was copied from the previous export."""
+        return (
+            f"Incremental export: {self.reused} of {len(self._meshes)} "
+            "previously exported meshes reused"
+        )
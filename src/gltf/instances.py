@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Tuple
 
 import numpy as np
 from specklepy.objects.other import Transform as SpeckleTransform
@@ -107,3 +107,134 @@ def safe_apply_transformations(
         print(f"Error during transformation: {str(e)}")
         # Return original vertices if transformation fails
         return vertices
+
+
+# Speckle is Z-up, glTF is Y-up: (x, y, z) -> (x, z, -y), matching process_speckle_mesh.
+Y_UP = np.array(
+    [
+        [1.0, 0.0, 0.0, 0.0],
+        [0.0, 0.0, 1.0, 0.0],
+        [0.0, -1.0, 0.0, 0.0],
+        [0.0, 0.0, 0.0, 1.0],
+    ]
+)
+
+
+def speckle_to_gltf_matrix(transforms: List[SpeckleTransform]) -> np.ndarray:
+    """
+    Combine a Speckle transform chain into a matrix for Y-up glTF geometry.
+
+    Args:
+        transforms (List[SpeckleTransform]): Transforms from the outermost instance inwards.
+
+    Returns:
+        np.ndarray: A 4x4 matrix acting on vertices already swapped to Y-up.
+    """
+    combined = combine_transform_matrices(transforms)
+    if combined[3, 3] not in (0.0, 1.0):
+        combined = combined / combined[3, 3]
+    return Y_UP @ combined @ Y_UP.T
+
+
+def gltf_node_matrix(matrix: np.ndarray) -> List[float]:
+    """Flatten a 4x4 matrix into the column-major list glTF nodes expect."""
+    return matrix.T.ravel().tolist()
+
+
+def rotation_matrices_to_quaternions(rotations: np.ndarray) -> np.ndarray:
+    """
+    Convert rotation matrices to unit quaternions.
+
+    Args:
+        rotations (np.ndarray): (n, 3, 3) orthonormal rotation matrices.
+
+    Returns:
+        np.ndarray: (n, 4) quaternions in glTF (x, y, z, w) order.
+    """
+    m = rotations
+    trace = m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+    # Each row is proportional to the quaternion; pick the best conditioned one.
+    candidates = np.stack(
+        [
+            np.stack(
+                [
+                    m[:, 2, 1] - m[:, 1, 2],
+                    m[:, 0, 2] - m[:, 2, 0],
+                    m[:, 1, 0] - m[:, 0, 1],
+                    1.0 + trace,
+                ],
+                axis=1,
+            ),
+            np.stack(
+                [
+                    1.0 + m[:, 0, 0] - m[:, 1, 1] - m[:, 2, 2],
+                    m[:, 0, 1] + m[:, 1, 0],
+                    m[:, 0, 2] + m[:, 2, 0],
+                    m[:, 2, 1] - m[:, 1, 2],
+                ],
+                axis=1,
+            ),
+            np.stack(
+                [
+                    m[:, 0, 1] + m[:, 1, 0],
+                    1.0 - m[:, 0, 0] + m[:, 1, 1] - m[:, 2, 2],
+                    m[:, 1, 2] + m[:, 2, 1],
+                    m[:, 0, 2] - m[:, 2, 0],
+                ],
+                axis=1,
+            ),
+            np.stack(
+                [
+                    m[:, 0, 2] + m[:, 2, 0],
+                    m[:, 1, 2] + m[:, 2, 1],
+                    1.0 - m[:, 0, 0] - m[:, 1, 1] + m[:, 2, 2],
+                    m[:, 1, 0] - m[:, 0, 1],
+                ],
+                axis=1,
+            ),
+        ],
+        axis=1,
+    )
+    diagonal = np.stack([trace, m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]], axis=1)
+    best = candidates[np.arange(len(m)), np.argmax(diagonal, axis=1)]
+    best /= np.linalg.norm(best, axis=1, keepdims=True)
+    # Keep w non-negative so equal rotations encode identically.
+    return np.where(best[:, 3:] < 0, -best, best)
+
+
+def decompose_trs(
+    matrices: np.ndarray, tolerance: float = 1e-4
+) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Split affine matrices into translation, rotation and scale.
+
+    Args:
+        matrices (np.ndarray): (n, 4, 4) transformation matrices.
+        tolerance (float): Allowed deviation of the rotation part from orthonormal.
+
+    Returns:
+        Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]: (n, 3) translations,
+            (n, 4) quaternions and (n, 3) scales, or None if any matrix has shear
+            or projection and therefore cannot be expressed as TRS.
+    """
+    if not np.allclose(matrices[:, 3], [0.0, 0.0, 0.0, 1.0]):
+        return None
+
+    translations = matrices[:, :3, 3]
+    linear = matrices[:, :3, :3]
+    scales = np.linalg.norm(linear, axis=1)
+    if np.any(scales == 0.0):
+        return None
+
+    # Mirrored instances carry the reflection in a negative X scale.
+    mirrored = np.linalg.det(linear) < 0
+    scales[mirrored, 0] *= -1
+    rotations = linear / scales[:, None, :]
+
+    identity_error = np.abs(
+        np.einsum("nji,njk->nik", rotations, rotations) - np.identity(3)
+    ).max()
+    if identity_error > tolerance:
+        return None
+
+    return translations, rotation_matrices_to_quaternions(rotations), scales
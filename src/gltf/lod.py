@@ -0,0 +1,314 @@
+"""Simplified levels of detail, written as MSFT_lod alternates.
+
+Meshes are simplified with the quadric error metric of Garland and Heckbert:
+every vertex accumulates the planes of the triangles around it, and collapsing
+an edge costs the summed squared distance of the merged vertex to those
+planes. Boundary edges add a steep plane perpendicular to their triangle, so
+open outlines such as the edge of a slab keep their shape.
+
+Instead of collapsing one edge at a time from a priority queue, each pass
+collapses a batch at once: edges that are the cheapest of all remaining edges
+at both of their vertices. Such edges share no vertex, so the whole batch is
+applied with array operations. Collapses that would flip a triangle are
+left out of the batch.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.gltf.weld import compact_vertices, remove_degenerate_faces
+
+MSFT_LOD = "MSFT_lod"
+SCREEN_COVERAGE = "MSFT_screencoverage"
+# Share of the screen, by area, below which the full resolution mesh is swapped.
+FULL_DETAIL_COVERAGE = 0.5
+# Weight of the planes holding boundary edges in place, relative to the faces.
+BOUNDARY_WEIGHT = 100.0
+# Cap on the collapse passes of one simplification.
+MAX_PASSES = 64
+# Triangles of an axis-aligned box over its corners, ordered by (x, y, z) bits.
+BOX_FACES = np.array(
+    [
+        [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],  # -x, +x
+        [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],  # -y, +y
+        [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3],  # -z, +z
+    ],
+    dtype=np.uint32,
+)  # fmt: skip
+# Meshes with no more triangles than a box are not simplified.
+MIN_FACES = len(BOX_FACES)
+# Rounds of picking non-adjacent edges to collapse in one pass.
+INDEPENDENT_SET_ROUNDS = 3
+# Smallest determinant, relative to the cube of its norm, of a quadric's 3x3
+# block for its optimum to be solved for rather than picked from the edge.
+MIN_RELATIVE_DETERMINANT = 1e-10
+
+Geometry = Tuple[np.ndarray, np.ndarray]
+
+
+def _face_planes(vertices: np.ndarray, faces: np.ndarray):
+    """Return each triangle's unnormalized normal, unit normal and area."""
+    p0, p1, p2 = (vertices[faces[:, k]] for k in range(3))
+    cross = np.cross(p1 - p0, p2 - p0)
+    length = np.linalg.norm(cross, axis=1)
+    normals = cross / np.where(length > 0, length, 1)[:, None]
+    return cross, normals, length / 2
+
+
+def _plane_quadrics(normals: np.ndarray, points: np.ndarray, weights: np.ndarray):
+    """Return the (n, 4, 4) weighted quadrics of the planes through `points`."""
+    planes = np.column_stack([normals, -np.einsum("ij,ij->i", normals, points)])
+    return planes[:, :, None] * planes[:, None, :] * weights[:, None, None]
+
+
+def _edge_keys(pairs: np.ndarray, vertex_count: int) -> np.ndarray:
+    """Encode undirected vertex pairs as one int64 each, ordered like the pairs."""
+    low = np.minimum(pairs[:, 0], pairs[:, 1]).astype(np.int64)
+    high = np.maximum(pairs[:, 0], pairs[:, 1]).astype(np.int64)
+    return low * vertex_count + high
+
+
+def _unique_edges(faces: np.ndarray, vertex_count: int) -> np.ndarray:
+    """Return the (k, 2) sorted, deduplicated edges of the triangles."""
+    keys = np.unique(
+        _edge_keys(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), vertex_count)
+    )
+    return np.column_stack([keys // vertex_count, keys % vertex_count])
+
+
+def vertex_quadrics(vertices: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """
+    Accumulate the error quadric of every vertex.
+
+    Args:
+        vertices (np.ndarray): (n, 3) float64 positions.
+        faces (np.ndarray): (m, 3) triangle indices.
+
+    Returns:
+        np.ndarray: (n, 4, 4) quadrics, weighted by triangle area.
+    """
+    quadrics = np.zeros((len(vertices), 4, 4))
+    _, normals, areas = _face_planes(vertices, faces)
+    face_quadrics = _plane_quadrics(normals, vertices[faces[:, 0]], areas)
+    for corner in range(3):
+        np.add.at(quadrics, faces[:, corner], face_quadrics)
+
+    # Edges used by a single triangle lie on the boundary.
+    directed = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    _, inverse, counts = np.unique(
+        _edge_keys(directed, len(vertices)), return_inverse=True, return_counts=True
+    )
+    boundary = counts[inverse] == 1
+    if boundary.any():
+        start, end = vertices[directed[boundary, 0]], vertices[directed[boundary, 1]]
+        side = np.cross(end - start, normals[np.flatnonzero(boundary) // 3])
+        length = np.linalg.norm(side, axis=1)
+        side /= np.where(length > 0, length, 1)[:, None]
+        weights = BOUNDARY_WEIGHT * np.einsum("ij,ij->i", end - start, end - start)
+        boundary_quadrics = _plane_quadrics(side, start, weights)
+        for column in range(2):
+            np.add.at(quadrics, directed[boundary, column], boundary_quadrics)
+    return quadrics
+
+
+def _quadric_error(quadrics: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    homogeneous = np.column_stack([positions, np.ones(len(positions))])
+    return np.einsum("ei,eij,ej->e", homogeneous, quadrics, homogeneous)
+
+
+def _collapse_targets(vertices, quadrics, edges) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find where each edge would collapse to and what it would cost.
+
+    The position minimizing the summed quadric is used when it is well defined
+    and near the edge; otherwise the cheaper of the endpoints and the midpoint.
+    """
+    a, b = edges[:, 0], edges[:, 1]
+    summed = quadrics[a] + quadrics[b]
+    candidates = [vertices[a], vertices[b], (vertices[a] + vertices[b]) / 2]
+
+    system = summed[:, :3, :3]
+    determinant = np.einsum(
+        "ij,ij->i", system[:, 0], np.cross(system[:, 1], system[:, 2])
+    )
+    scale = np.linalg.norm(system.reshape(-1, 9), axis=1) ** 3
+    solvable = np.abs(determinant) > MIN_RELATIVE_DETERMINANT * scale
+    if solvable.any():
+        optimum = candidates[2].copy()
+        optimum[solvable] = np.linalg.solve(
+            system[solvable], -summed[solvable, :3, 3:]
+        )[:, :, 0]
+        # Ill-conditioned systems can place the vertex far from the edge.
+        reach = np.linalg.norm(vertices[a] - vertices[b], axis=1)
+        near = np.linalg.norm(optimum - candidates[2], axis=1) <= reach
+        candidates.append(np.where((solvable & near)[:, None], optimum, candidates[2]))
+
+    errors = np.stack([_quadric_error(summed, c) for c in candidates])
+    best = np.argmin(errors, axis=0)
+    positions = np.stack(candidates)[best, np.arange(len(edges))]
+    return positions, errors[best, np.arange(len(edges))]
+
+
+def _independent_edges(
+    edges: np.ndarray, order: np.ndarray, vertex_count: int
+) -> np.ndarray:
+    """
+    Pick edges, cheapest first, such that no two share a vertex.
+
+    Each round accepts the edges that come first in `order` at both of their
+    vertices, then drops the edges touching an accepted one.
+
+    Returns:
+        np.ndarray: Indices of the accepted edges.
+    """
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    candidates = np.arange(len(edges))
+    accepted = []
+    for _ in range(INDEPENDENT_SET_ROUNDS):
+        first = np.full(vertex_count, len(edges))
+        np.minimum.at(first, edges[candidates, 0], rank[candidates])
+        np.minimum.at(first, edges[candidates, 1], rank[candidates])
+        a, b = edges[candidates, 0], edges[candidates, 1]
+        cheapest = (first[a] == rank[candidates]) & (first[b] == rank[candidates])
+        accepted.append(candidates[cheapest])
+
+        taken = np.zeros(vertex_count, dtype=bool)
+        taken[edges[candidates[cheapest]].ravel()] = True
+        candidates = candidates[~(taken[a] | taken[b])]
+        if not len(candidates):
+            break
+    return np.concatenate(accepted)
+
+
+def simplify_mesh(
+    vertices: np.ndarray, faces: np.ndarray, target_faces: int
+) -> Geometry:
+    """
+    Collapse edges until at most `target_faces` triangles remain, or none can.
+
+    Args:
+        vertices (np.ndarray): (n, 3) positions.
+        faces (np.ndarray): (m, 3) triangle indices.
+        target_faces (int): The triangle count to simplify down to.
+
+    Returns:
+        Geometry: The (k, 3) float32 positions and the (l, 3) uint32 faces.
+    """
+    positions = vertices.astype(np.float64)
+    faces = faces.astype(np.int64)
+    quadrics = vertex_quadrics(positions, faces)
+    rng = np.random.default_rng(0)
+
+    for _ in range(MAX_PASSES):
+        if len(faces) <= target_faces:
+            break
+        edges = _unique_edges(faces, len(positions))
+        targets, costs = _collapse_targets(positions, quadrics, edges)
+
+        # Ties, common on flat faces, are broken at random so they don't chain.
+        order = np.lexsort((rng.permutation(len(edges)), costs))
+        independent = _independent_edges(edges, order, len(positions))
+        # An interior collapse removes two triangles.
+        budget = max(1, math.ceil((len(faces) - target_faces) / 2))
+        chosen = independent[np.argsort(costs[independent], kind="stable")][:budget]
+
+        old_cross, _, _ = _face_planes(positions, faces)
+        while len(chosen):
+            remap = np.arange(len(positions))
+            remap[edges[chosen, 1]] = edges[chosen, 0]
+            moved = positions.copy()
+            moved[edges[chosen, 0]] = targets[chosen]
+            collapsed = remap[faces]
+
+            new_cross, _, _ = _face_planes(moved, collapsed)
+            flipped = np.einsum("ij,ij->i", old_cross, new_cross) < 0
+            if not flipped.any():
+                break
+            # Undo every collapse that moved a corner of a flipped triangle.
+            touched = np.zeros(len(positions), dtype=bool)
+            touched[collapsed[flipped].ravel()] = True
+            chosen = chosen[~touched[edges[chosen, 0]]]
+        if not len(chosen):
+            break
+
+        np.add.at(quadrics, edges[chosen, 0], quadrics[edges[chosen, 1]])
+        positions = moved
+        faces = remove_degenerate_faces(collapsed)
+
+    if len(faces) == 0:
+        return vertices[:0].astype(np.float32), np.zeros((0, 3), dtype=np.uint32)
+    positions, faces = compact_vertices(positions, faces)
+    return positions.astype(np.float32), faces.astype(np.uint32)
+
+
+def bounding_box_mesh(vertices: np.ndarray) -> Geometry:
+    """Return the axis-aligned box around `vertices` as 12 outward-facing triangles."""
+    low, high = vertices.min(axis=0), vertices.max(axis=0)
+    corners = np.array(
+        [[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=bool
+    )
+    box = np.where(corners, high, low).astype(np.float32)
+    return box, BOX_FACES.copy()
+
+
+def simplify_levels(
+    vertices: np.ndarray,
+    faces: np.ndarray,
+    levels: int,
+    ratio: float,
+    min_size: float = 0.0,
+) -> List[Optional[Geometry]]:
+    """
+    Build the coarser levels of detail of one mesh.
+
+    Each level keeps about `ratio` of the triangles of the level before it.
+    Meshes whose bounding box diagonal is under `min_size` are replaced by
+    their bounding box at the first coarse level, when that is smaller, and
+    dropped from the levels after it.
+
+    Args:
+        vertices (np.ndarray): (n, 3) float32 positions.
+        faces (np.ndarray): (m, 3) uint32 triangle indices.
+        levels (int): The number of coarse levels.
+        ratio (float): Share of triangles each level keeps.
+        min_size (float): Size, in the units of `vertices`, below which a
+            mesh is reduced to its box and then dropped.
+
+    Returns:
+        List[Optional[Geometry]]: The geometry of each level, or None where
+            the mesh is dropped. A level that could not be simplified further
+            holds the same arrays as the level before it.
+    """
+    if len(faces) == 0:
+        return [None] * levels
+
+    small = np.linalg.norm(np.ptp(vertices, axis=0)) < min_size
+    result: List[Optional[Geometry]] = []
+    previous = (vertices, faces)
+    for level in range(levels):
+        if small and level:
+            result.append(None)
+            continue
+        target = max(MIN_FACES, math.floor(len(faces) * ratio ** (level + 1)))
+        simplified = simplify_mesh(*previous, target)
+        if small and len(simplified[1]) > len(BOX_FACES):
+            simplified = bounding_box_mesh(vertices)
+        if len(simplified[1]) == 0 or len(simplified[1]) >= len(previous[1]):
+            simplified = previous
+        result.append(simplified)
+        previous = simplified
+    return result
+
+
+def screen_coverage(levels: int, ratio: float) -> List[float]:
+    """
+    Return the MSFT_screencoverage thresholds of the full mesh and its levels.
+
+    Triangle density on screen stays about constant when the triangle count
+    shrinks with the area the object covers, so each threshold is `ratio`
+    times the one before it.
+    """
+    return [FULL_DETAIL_COVERAGE * ratio**level for level in range(levels + 1)]
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, Hashable, List, Optional, Tuple
 
 from pygltflib import GLTF2, Material, PbrMetallicRoughness
 
@@ -27,10 +27,8 @@ def create_material(gltf: GLTF2, color: List[float]) -> int:
     return material_index
 
 
-def speckle_to_gltf_pbr(material, gltf: GLTF2) -> Optional[int]:
-    if material is None:
-        return None
-
+def speckle_to_gltf_material(material) -> Material:
+    """Convert a Speckle RenderMaterial into a glTF PBR material."""
     base_color = extract_color(getattr(material, "diffuse", -1))
     opacity = getattr(material, "opacity", 1.0)
     base_color[3] = opacity  # Set alpha channel
@@ -64,11 +62,95 @@ def speckle_to_gltf_pbr(material, gltf: GLTF2) -> Optional[int]:
             :3
         ]  # Only use RGB values
 
-    # Check if this material already exists in the materials array
-    for i, existing_material in enumerate(gltf.materials):
-        if existing_material == gltf_material:
-            return i  # Return the index of the existing material
+    return gltf_material
+
+
+def gltf_material_key(gltf_material: Material) -> Tuple:
+    """Reduce a glTF material to a hashable tuple of the fields that tell it apart."""
+    pbr = gltf_material.pbrMetallicRoughness
+    if isinstance(pbr, dict):
+        pbr = PbrMetallicRoughness(**pbr)
+    return (
+        gltf_material.name,
+        tuple(pbr.baseColorFactor or ()),
+        pbr.metallicFactor,
+        pbr.roughnessFactor,
+        gltf_material.alphaMode,
+        gltf_material.alphaCutoff,
+        tuple(gltf_material.emissiveFactor or ()),
+    )
+
+
+class MaterialRegistry:
+    """
+    Convert each distinct Speckle render material to glTF once.
+
+    Lookups are keyed by the render material's Speckle id (a content hash) or,
+    for materials without an id, by a tuple of the fields the conversion reads.
+    Converted materials are additionally indexed by their glTF field values, so
+    two differently keyed materials that convert identically still share one
+    glTF material, as they did with the previous linear scan.
+    """
+
+    # RenderMaterial fields read by speckle_to_gltf_material.
+    SOURCE_FIELDS = (
+        "name",
+        "diffuse",
+        "opacity",
+        "metalness",
+        "roughness",
+        "emissive",
+        "alpha_mode",
+        "alpha_cutoff",
+    )
+
+    def __init__(self, gltf: GLTF2):
+        self.gltf = gltf
+        self._by_source: Dict[Hashable, int] = {}
+        self._by_value: Dict[Tuple, int] = {}
 
-    # If the material doesn't exist, add it to the array and return its index
-    gltf.materials.append(gltf_material)
-    return len(gltf.materials) - 1
+    @classmethod
+    def key(cls, material) -> Hashable:
+        """Build the lookup key for a Speckle render material."""
+        speckle_id = getattr(material, "id", None)
+        if speckle_id:
+            return "id", speckle_id
+        return ("fields",) + tuple(
+            getattr(material, field, None) for field in cls.SOURCE_FIELDS
+        )
+
+    def get_or_add(self, material) -> Optional[int]:
+        """
+        Return the glTF material index for a Speckle render material.
+
+        Args:
+            material: The Speckle RenderMaterial, or None.
+
+        Returns:
+            Optional[int]: The index into `gltf.materials`, or None without a material.
+        """
+        if material is None:
+            return None
+
+        key = self.key(material)
+        material_index = self._by_source.get(key)
+        if material_index is not None:
+            return material_index
+
+        gltf_material = speckle_to_gltf_material(material)
+        value_key = gltf_material_key(gltf_material)
+        material_index = self._by_value.get(value_key)
+        if material_index is None:
+            material_index = len(self.gltf.materials)
+            self.gltf.materials.append(gltf_material)
+            self._by_value[value_key] = material_index
+
+        self._by_source[key] = material_index
+        return material_index
+
+    def summary(self) -> str:
+        """Describe how many materials were converted."""
+        return (
+            f"Material registry: {len(self._by_value)} glTF materials "
+            f"for {len(self._by_source)} Speckle render materials"
+        )
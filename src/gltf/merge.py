@@ -0,0 +1,154 @@
+"""Material-batched merged geometry with per-vertex feature ids.
+
+Instead of one node and mesh per display mesh, all geometry sharing a material
+is concatenated into a few large primitives. Every vertex carries a
+`_FEATURE_ID_0` attribute (EXT_mesh_features) pointing back at the Speckle
+object it came from, so viewers can still pick and look up individual elements.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+from pygltflib import Node
+
+from src.gltf.primitive import create_float_accessor
+from src.gltf.session import ExportSession
+
+MESH_FEATURES = "EXT_mesh_features"
+
+# A batch is written out once it holds this many vertices, which bounds both
+# the memory held per material and the size of a single draw call.
+MAX_BATCH_VERTICES = 1 << 22
+
+
+class MaterialBatch:
+    """Geometry collected for one material but not yet written."""
+
+    def __init__(self, units: Optional[str] = None):
+        self.units = units
+        self.vertices: List[np.ndarray] = []
+        self.faces: List[np.ndarray] = []
+        self.feature_ids: List[np.ndarray] = []
+        self.normals: List[np.ndarray] = []
+        self.vertex_count = 0
+
+    def add(
+        self,
+        vertices: np.ndarray,
+        faces: np.ndarray,
+        feature_id: int,
+        normals: Optional[np.ndarray] = None,
+    ) -> None:
+        self.faces.append(faces + self.vertex_count)
+        self.vertices.append(vertices)
+        if normals is not None:
+            self.normals.append(normals)
+        self.feature_ids.append(np.full(len(vertices), feature_id, dtype=np.float32))
+        self.vertex_count += len(vertices)
+
+
+class MergedMeshBuilder:
+    """
+    Collect display meshes into per-material primitives of a single glTF mesh.
+
+    Primitives whose positions are quantized need their own node transform, so
+    each of those becomes a separate mesh under the same node.
+
+    Feature ids index `speckle_ids`, which is stored in the node extras so a
+    picked feature id maps back to its Speckle object. Feature ids are written
+    as float32, which is exact up to 2^24 objects and, unlike 8 or 16-bit ids,
+    needs no padding to meet the 4-byte vertex attribute alignment.
+    """
+
+    def __init__(self, session: ExportSession, max_vertices: int = MAX_BATCH_VERTICES):
+        self.session = session
+        self.max_vertices = max_vertices
+        self.speckle_ids: List[Optional[str]] = []
+        self.primitives = []
+        self.mesh_indices: List[int] = []
+        self._batches: Dict[Optional[int], MaterialBatch] = {}
+        self._feature_primitives = []
+
+    def add_feature(self, speckle_id: Optional[str]) -> int:
+        """Register a Speckle object and return its feature id."""
+        self.speckle_ids.append(speckle_id)
+        return len(self.speckle_ids) - 1
+
+    def add(
+        self,
+        vertices: np.ndarray,
+        faces: np.ndarray,
+        material_index: Optional[int],
+        feature_id: int,
+        units: Optional[str] = None,
+    ) -> None:
+        """Queue a converted display mesh under its material."""
+        if not len(faces):
+            return
+        # Normals are generated per mesh, before the feature ids are assigned
+        # to its vertices, so no vertex is smoothed across two objects.
+        vertices, faces, normals = self.session.vertex_normals(vertices, faces)
+        batch = self._batches.get(material_index)
+        if batch is not None and batch.vertex_count + len(vertices) > self.max_vertices:
+            self._flush(material_index)
+            batch = None
+        if batch is None:
+            batch = self._batches[material_index] = MaterialBatch(units)
+        batch.add(vertices, faces, feature_id, normals)
+
+    def _flush(self, material_index: Optional[int]) -> None:
+        batch = self._batches.pop(material_index)
+        gltf = self.session.gltf
+        feature_ids = np.concatenate(batch.feature_ids)
+
+        primitive, matrix = self.session.create_primitive(
+            np.concatenate(batch.vertices),
+            np.concatenate(batch.faces),
+            material_index,
+            batch.units,
+            np.concatenate(batch.normals) if batch.normals else None,
+        )
+        primitive.attributes._FEATURE_ID_0 = create_float_accessor(
+            feature_ids, gltf, self.session.buffer_data, "SCALAR"
+        )
+        primitive.extensions = {
+            MESH_FEATURES: {
+                "featureIds": [
+                    {"featureCount": len(np.unique(feature_ids)), "attribute": 0}
+                ]
+            }
+        }
+        self._feature_primitives.append(primitive)
+        if matrix is None:
+            self.primitives.append(primitive)
+        else:
+            # A primitive that needs its own node transform gets its own mesh.
+            self.mesh_indices.append(self.session.add_mesh([primitive], matrix))
+
+    def finish(self) -> Optional[Node]:
+        """
+        Write the remaining batches and add the merged mesh to the scene.
+
+        Returns:
+            Optional[Node]: The node drawing the merged mesh, or None if empty.
+        """
+        for material_index in list(self._batches):
+            self._flush(material_index)
+        if self.primitives:
+            self.mesh_indices.insert(0, self.session.add_mesh(self.primitives))
+        if not self.mesh_indices:
+            return None
+
+        # With structural metadata, feature ids index rows of the property table.
+        if self.session.property_table:
+            for primitive in self._feature_primitives:
+                feature_ids = primitive.extensions[MESH_FEATURES]["featureIds"]
+                feature_ids[0]["propertyTable"] = 0
+
+        gltf = self.session.gltf
+        if MESH_FEATURES not in gltf.extensionsUsed:
+            gltf.extensionsUsed.append(MESH_FEATURES)
+
+        node = self.session.add_node(self.mesh_indices)
+        node.extras = {"speckle_feature_ids": self.speckle_ids}
+        return node
@@ -1,12 +1,8 @@
-from typing import List, Optional
-
 import numpy as np
 from specklepy.objects import Base
-from specklepy.objects.geometry import Mesh as SpeckleMesh, Vector
-from specklepy.objects.other import Transform
+from specklepy.objects.geometry import Mesh as SpeckleMesh
 
-from src.gltf.helpers import triangulate_face
-from src.gltf.instances import apply_transformations, safe_apply_transformations
+from src.gltf.helpers import decode_speckle_faces
 
 
 def is_speckle_mesh(obj: Base) -> bool:
@@ -23,43 +19,20 @@ def is_speckle_mesh(obj: Base) -> bool:
     )
 
 
-def process_speckle_mesh(
-    speckle_mesh: SpeckleMesh, transforms: Optional[List[Transform]] = None
-) -> tuple:
-    vertices = np.array(speckle_mesh.vertices, dtype=np.float32).reshape((-1, 3))
+def process_speckle_mesh(speckle_mesh: SpeckleMesh) -> tuple:
+    # Instance transforms are not baked in here; the instanced exporter places
+    # each occurrence with a node matrix (see create_gltf_from_instances).
+    return process_mesh_data(speckle_mesh.vertices, speckle_mesh.faces)
+
 
-    # Apply any transformations if they exist
-    # if transforms:
-    #     vertices = safe_apply_transformations(vertices, transforms)
+def process_mesh_data(vertices, faces) -> tuple:
+    """Decode flat Speckle vertex and face lists into Y-up positions and triangles."""
+    vertices = np.array(vertices, dtype=np.float32).reshape((-1, 3))
 
     # Perform Y/Z swap and negate new Y (old Z)
     vertices_swapped = vertices[:, [0, 2, 1]]  # Reorder columns to X, Z, Y
     vertices_swapped[:, 2] *= -1  # Negate the new Z (old Y)
 
-    faces = []
-    i = 0
-    while i < len(speckle_mesh.faces):
-
-        face_vertex_count = (
-            speckle_mesh.faces[i] or 3
-        )  # old displayMeshes used 0 to indicate a triangle, because of course they did
-
-        i += 1  # Skip the vertex count
-        face_vertex_indices = speckle_mesh.faces[i : i + face_vertex_count]
-        face_vertices = [
-            Vector.from_list(vertices_swapped[idx].tolist())
-            for idx in face_vertex_indices
-        ]
-        if face_vertex_count == 3:
-            faces.append(face_vertex_indices)
-        else:
-            triangulated = triangulate_face(face_vertices)
-            faces.extend(
-                [[face_vertex_indices[idx] for idx in tri] for tri in triangulated]
-            )
-        i += face_vertex_count
-
-    # Convert faces to a numpy array with uint32 dtype
-    faces = np.array(faces, dtype=np.uint32)
+    faces = decode_speckle_faces(faces, vertices_swapped)
 
     return vertices_swapped, faces
@@ -0,0 +1,510 @@
+"""Pure NumPy encoders for EXT_meshopt_compression.
+
+Implements the meshoptimizer vertex codec (mode ATTRIBUTES, version 0) and the
+index sequence codec (mode INDICES, version 1) as described by the extension
+specification, so compressed exports need no native dependency. Decoders are
+included to verify round trips.
+
+The vertex codec delta-encodes each byte of a vertex against the previous
+vertex, zigzag-maps the deltas and packs every group of 16 bytes with 0, 2, 4
+or 8 bits per value, whichever is smallest. The index sequence codec stores
+zigzag deltas as variable-length integers.
+
+Normalized int8 normals are additionally passed through the OCTAHEDRAL filter,
+which stores two octahedral coordinates in place of x, y and z. The third byte
+then always holds 127, which the vertex codec encodes in almost nothing.
+"""
+
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import numpy as np
+from pygltflib import Buffer
+
+MESHOPT_COMPRESSION = "EXT_meshopt_compression"
+
+VERTEX_HEADER = 0xA0  # codec 0xA_, version 0
+INDEX_SEQUENCE_HEADER = 0xD1  # codec 0xD_, version 1
+BYTE_GROUP_SIZE = 16
+VERTEX_BLOCK_SIZE_BYTES = 8192
+VERTEX_BLOCK_MAX_SIZE = 256
+TAIL_MAX_SIZE = 32
+INDEX_TAIL_SIZE = 4
+
+# Bits used per value for each 2-bit group header code.
+GROUP_BITS = (0, 2, 4, 8)
+
+COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9}
+TYPE_SIZES["MAT4"] = 16
+# The value 1.0 of the OCTAHEDRAL filter for 8-bit components.
+OCTAHEDRAL_ONE = 127
+
+
+def vertex_block_size(vertex_size: int) -> int:
+    """Number of vertices per codec block for a given vertex size in bytes."""
+    result = (VERTEX_BLOCK_SIZE_BYTES // vertex_size) & ~(BYTE_GROUP_SIZE - 1)
+    return min(result, VERTEX_BLOCK_MAX_SIZE)
+
+
+def _encode_byte_streams(streams: np.ndarray) -> np.ndarray:
+    """
+    Encode byte streams with the meshopt byte group coding.
+
+    Args:
+        streams (np.ndarray): (s, n) uint8 values, n a multiple of 16.
+
+    Returns:
+        np.ndarray: The encoded streams back to back, each as a 2-bit-per-group
+            header followed by the group payloads.
+    """
+    stream_count, length = streams.shape
+    group_count = length // BYTE_GROUP_SIZE
+    groups = streams.reshape(stream_count, group_count, BYTE_GROUP_SIZE)
+
+    # Pick the cheapest encoding per group, preferring fewer bits on ties.
+    count_2 = (groups >= 3).sum(axis=2)
+    count_4 = (groups >= 15).sum(axis=2)
+    sizes = np.stack(
+        [
+            np.where(groups.any(axis=2), np.iinfo(np.int64).max, 0),
+            4 + count_2,
+            8 + count_4,
+            np.full(count_2.shape, 16),
+        ],
+        axis=2,
+    )
+    codes = np.argmin(sizes, axis=2)
+    lengths = sizes[
+        np.arange(stream_count)[:, None], np.arange(group_count)[None], codes
+    ]
+
+    payload = np.zeros((stream_count, group_count, 32), dtype=np.uint8)
+    raw = codes == 3
+    payload[raw, :BYTE_GROUP_SIZE] = groups[raw]
+
+    for code, bits in ((1, 2), (2, 4)):
+        selected = codes == code
+        if not selected.any():
+            continue
+        values = groups[selected]
+        sentinel = (1 << bits) - 1
+        per_byte = 8 // bits
+        packed_size = BYTE_GROUP_SIZE // per_byte
+
+        encoded = np.minimum(values, sentinel).reshape(-1, packed_size, per_byte)
+        shifts = (bits * np.arange(per_byte - 1, -1, -1)).astype(np.uint8)
+        packed = np.bitwise_or.reduce(encoded << shifts, axis=2)
+
+        # Values that hit the sentinel follow the packed bits in order.
+        escaped = values >= sentinel
+        positions = packed_size + np.cumsum(escaped, axis=1) - 1
+        rows = np.zeros((len(values), 32), dtype=np.uint8)
+        rows[:, :packed_size] = packed
+        row_index = np.broadcast_to(np.arange(len(values))[:, None], escaped.shape)
+        rows[row_index[escaped], positions[escaped]] = values[escaped]
+        payload[selected] = rows
+
+    header_size = (group_count + 3) // 4
+    padded_codes = np.zeros((stream_count, header_size * 4), dtype=np.uint8)
+    padded_codes[:, :group_count] = codes
+    header = np.bitwise_or.reduce(
+        padded_codes.reshape(stream_count, header_size, 4)
+        << (2 * np.arange(4)).astype(np.uint8),
+        axis=2,
+    )
+
+    rows = np.concatenate([header, payload.reshape(stream_count, -1)], axis=1)
+    header_mask = np.ones((stream_count, header_size), dtype=bool)
+    payload_mask = (np.arange(32) < lengths[..., None]).reshape(stream_count, -1)
+    return rows[np.concatenate([header_mask, payload_mask], axis=1)]
+
+
+def _zigzag8(values: np.ndarray) -> np.ndarray:
+    signed = values.view(np.int8).astype(np.int16)
+    return ((signed << 1) ^ (signed >> 7)).astype(np.uint8)
+
+
+def _unzigzag8(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int16)
+    return ((values >> 1) ^ -(values & 1)).astype(np.uint8)
+
+
+def encode_vertex_buffer(data: np.ndarray) -> bytes:
+    """
+    Encode vertex data with the meshopt vertex codec.
+
+    Args:
+        data (np.ndarray): (count, vertex_size) uint8 view of the vertices, with
+            vertex_size a multiple of 4 and at most 256.
+
+    Returns:
+        bytes: The encoded stream.
+    """
+    data = np.ascontiguousarray(data, dtype=np.uint8)
+    count, vertex_size = data.shape
+    baseline = data[0] if count else np.zeros(vertex_size, dtype=np.uint8)
+
+    previous = np.concatenate([baseline[None], data[:-1]])
+    deltas = _zigzag8(data - previous)
+
+    block_size = vertex_block_size(vertex_size)
+    full_blocks = count // block_size
+    parts = [np.array([VERTEX_HEADER], dtype=np.uint8)]
+
+    if full_blocks:
+        streams = (
+            deltas[: full_blocks * block_size]
+            .reshape(full_blocks, block_size, vertex_size)
+            .transpose(0, 2, 1)
+            .reshape(full_blocks * vertex_size, block_size)
+        )
+        parts.append(_encode_byte_streams(streams))
+
+    remainder = count - full_blocks * block_size
+    if remainder:
+        aligned = -(-remainder // BYTE_GROUP_SIZE) * BYTE_GROUP_SIZE
+        streams = np.zeros((vertex_size, aligned), dtype=np.uint8)
+        streams[:, :remainder] = deltas[full_blocks * block_size :].T
+        parts.append(_encode_byte_streams(streams))
+
+    # The decoder takes its initial baseline from the last bytes of the stream.
+    tail_size = max(TAIL_MAX_SIZE, vertex_size)
+    parts.append(np.zeros(tail_size - vertex_size, dtype=np.uint8))
+    parts.append(baseline)
+    return np.concatenate(parts).tobytes()
+
+
+def _decode_bytes(
+    data: np.ndarray, position: int, length: int
+) -> Tuple[np.ndarray, int]:
+    group_count = length // BYTE_GROUP_SIZE
+    header = data[position : position + (group_count + 3) // 4]
+    position += len(header)
+
+    values = np.zeros(length, dtype=np.uint8)
+    for group in range(group_count):
+        code = (int(header[group // 4]) >> ((group % 4) * 2)) & 3
+        bits = GROUP_BITS[code]
+        target = values[group * BYTE_GROUP_SIZE : (group + 1) * BYTE_GROUP_SIZE]
+        if bits == 0:
+            continue
+        if bits == 8:
+            target[:] = data[position : position + BYTE_GROUP_SIZE]
+            position += BYTE_GROUP_SIZE
+            continue
+
+        packed_size = BYTE_GROUP_SIZE * bits // 8
+        packed = data[position : position + packed_size]
+        shifts = bits * np.arange(8 // bits - 1, -1, -1)
+        unpacked = ((packed[:, None] >> shifts) & ((1 << bits) - 1)).ravel()
+        escaped = unpacked == (1 << bits) - 1
+        escape_count = int(escaped.sum())
+        extra = data[position + packed_size : position + packed_size + escape_count]
+        unpacked[escaped] = extra
+        target[:] = unpacked
+        position += packed_size + escape_count
+
+    return values, position
+
+
+def decode_vertex_buffer(encoded: bytes, count: int, vertex_size: int) -> np.ndarray:
+    """
+    Decode a meshopt vertex codec stream.
+
+    Returns:
+        np.ndarray: (count, vertex_size) uint8 vertex data.
+    """
+    data = np.frombuffer(encoded, dtype=np.uint8)
+    if data[0] & 0xF0 != VERTEX_HEADER & 0xF0 or data[0] & 0x0F > 0:
+        raise ValueError("Not a meshopt vertex stream")
+
+    last = data[-vertex_size:].copy()
+    result = np.empty((count, vertex_size), dtype=np.uint8)
+    block_size = vertex_block_size(vertex_size)
+    position = 1
+
+    for start in range(0, count, block_size):
+        size = min(block_size, count - start)
+        aligned = -(-size // BYTE_GROUP_SIZE) * BYTE_GROUP_SIZE
+        for byte in range(vertex_size):
+            values, position = _decode_bytes(data, position, aligned)
+            deltas = _unzigzag8(values[:size])
+            deltas[0] = (int(deltas[0]) + int(last[byte])) & 0xFF
+            result[start : start + size, byte] = np.cumsum(deltas, dtype=np.uint8)
+        last = result[start + size - 1].copy()
+
+    if len(data) - position != max(TAIL_MAX_SIZE, vertex_size):
+        raise ValueError("Malformed meshopt vertex stream")
+    return result
+
+
+def _encode_vbytes(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.uint64)
+    byte_counts = 1 + sum(
+        (values >= np.uint64(1) << np.uint64(7 * k)).astype(np.int64)
+        for k in range(1, 5)
+    )
+    shifts = (7 * np.arange(5)).astype(np.uint64)
+    groups = ((values[:, None] >> shifts) & np.uint64(0x7F)).astype(np.uint8)
+    continued = np.arange(5) < (byte_counts[:, None] - 1)
+    groups[continued] |= 0x80
+    return groups[np.arange(5) < byte_counts[:, None]]
+
+
+def encode_index_sequence(indices: np.ndarray) -> bytes:
+    """
+    Encode indices with the meshopt index sequence codec.
+
+    Each index is stored as a zigzag delta from the previous one. The codec
+    allows switching between two baselines per index; this encoder always uses
+    the first, which keeps encoding fully vectorized.
+
+    Args:
+        indices (np.ndarray): The index values.
+
+    Returns:
+        bytes: The encoded stream.
+    """
+    indices = np.asarray(indices, dtype=np.int64).ravel()
+    deltas = np.diff(indices, prepend=0).astype(np.int32).astype(np.int64)
+    zigzag = ((deltas << 1) ^ (deltas >> 31)) & 0xFFFFFFFF
+    # The low bit selects the baseline used to reconstruct the index.
+    values = zigzag << 1
+
+    return (
+        bytes([INDEX_SEQUENCE_HEADER])
+        + _encode_vbytes(values).tobytes()
+        + bytes(INDEX_TAIL_SIZE)
+    )
+
+
+def decode_index_sequence(encoded: bytes, count: int) -> np.ndarray:
+    """
+    Decode a meshopt index sequence codec stream.
+
+    Returns:
+        np.ndarray: The uint32 index values.
+    """
+    if encoded[0] & 0xF0 != INDEX_SEQUENCE_HEADER & 0xF0 or encoded[0] & 0x0F > 1:
+        raise ValueError("Not a meshopt index sequence stream")
+
+    last = [0, 0]
+    result = np.empty(count, dtype=np.uint32)
+    position = 1
+    for i in range(count):
+        value, shift = 0, 0
+        while True:
+            byte = encoded[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        baseline = value & 1
+        value >>= 1
+        delta = (value >> 1) ^ -(value & 1)
+        last[baseline] = (last[baseline] + delta) & 0xFFFFFFFF
+        result[i] = last[baseline]
+
+    if len(encoded) - position != INDEX_TAIL_SIZE:
+        raise ValueError("Malformed meshopt index sequence stream")
+    return result
+
+
+def encode_octahedral(normals: np.ndarray) -> np.ndarray:
+    """
+    Encode unit normals for the EXT_meshopt_compression OCTAHEDRAL filter.
+
+    Args:
+        normals (np.ndarray): (n, 3) unit vectors.
+
+    Returns:
+        np.ndarray: (n, 4) int8 octahedral coordinates, the filter's 1.0 and 0.
+    """
+    normals = normals.astype(np.float64)
+    normals /= np.maximum(np.abs(normals).sum(axis=1, keepdims=True), 1e-12)
+    x, y, z = normals.T
+    sign_x, sign_y = np.where(x >= 0, 1.0, -1.0), np.where(y >= 0, 1.0, -1.0)
+    u = np.where(z >= 0, x, (1 - np.abs(y)) * sign_x)
+    v = np.where(z >= 0, y, (1 - np.abs(x)) * sign_y)
+
+    encoded = np.zeros((len(normals), 4), dtype=np.int8)
+    encoded[:, 0] = np.round(u * OCTAHEDRAL_ONE)
+    encoded[:, 1] = np.round(v * OCTAHEDRAL_ONE)
+    encoded[:, 2] = OCTAHEDRAL_ONE
+    return encoded
+
+
+def decode_octahedral(encoded: np.ndarray) -> np.ndarray:
+    """
+    Undo the OCTAHEDRAL filter as a meshopt decoder does.
+
+    Args:
+        encoded (np.ndarray): (n, 4) int8 filtered values.
+
+    Returns:
+        np.ndarray: (n, 4) int8 normalized xyz and the unchanged fourth component.
+    """
+    x, y, one = (encoded[:, k].astype(np.float64) for k in range(3))
+    z = one - np.abs(x) - np.abs(y)
+    t = np.maximum(-z, 0)
+    x -= np.where(x >= 0, t, -t)
+    y -= np.where(y >= 0, t, -t)
+    scale = OCTAHEDRAL_ONE / np.sqrt(x * x + y * y + z * z)
+
+    decoded = encoded.copy()
+    for axis, value in enumerate((x, y, z)):
+        scaled = value * scale
+        decoded[:, axis] = np.trunc(scaled + np.copysign(0.5, scaled))
+    return decoded
+
+
+def _element_sizes(gltf) -> Dict[int, int]:
+    """Map bufferView indices to the element size of an accessor reading them."""
+    sizes = {}
+    for accessor in gltf.accessors:
+        if accessor.bufferView is not None:
+            sizes.setdefault(
+                accessor.bufferView,
+                COMPONENT_SIZES[accessor.componentType] * TYPE_SIZES[accessor.type],
+            )
+    return sizes
+
+
+def _octahedral_views(gltf) -> Set[int]:
+    """Return the bufferViews holding int8 normals the OCTAHEDRAL filter accepts."""
+    views = set()
+    for mesh in gltf.meshes:
+        for primitive in mesh.primitives:
+            normal = primitive.attributes.NORMAL
+            if normal is None:
+                continue
+            accessor = gltf.accessors[normal]
+            view = accessor.bufferView
+            if (
+                view is not None
+                and accessor.componentType == 5120
+                and gltf.bufferViews[view].byteStride == 4
+                and not accessor.byteOffset
+            ):
+                views.add(view)
+    return views
+
+
+def compress_buffer(
+    gltf, read: Callable[[int, int], bytes], target, fallback_length: int
+) -> None:
+    """
+    Re-encode the document's first buffer with EXT_meshopt_compression.
+
+    Compressible bufferViews are encoded into `target` and redirected to a new
+    fallback buffer that keeps their uncompressed layout but carries no data.
+    Views the codecs cannot represent (e.g. uint8 indices) are copied as they are.
+
+    Args:
+        gltf (GLTF2): The document whose bufferViews are rewritten in place.
+        read (Callable[[int, int], bytes]): Reads (offset, length) of the source data.
+        target: Sink with `len()` and `extend()` receiving the new buffer 0.
+        fallback_length (int): Length of the uncompressed source data.
+    """
+    element_sizes = _element_sizes(gltf)
+    octahedral = _octahedral_views(gltf)
+    fallback_index = len(gltf.buffers)
+
+    for view_index, view in enumerate(gltf.bufferViews):
+        if view.buffer != 0:
+            continue
+        raw = read(view.byteOffset or 0, view.byteLength)
+        stride = view.byteStride or element_sizes.get(view_index)
+        mode = "INDICES" if view.target == 34963 else "ATTRIBUTES"
+        compressible = bool(stride) and view.byteLength % stride == 0
+        if mode == "INDICES":
+            compressible = compressible and stride in (2, 4)
+        else:
+            compressible = compressible and stride % 4 == 0 and stride <= 256
+
+        offset = len(target)
+        if not compressible:
+            target.extend(raw)
+            target.extend(bytes(-len(target) % 4))
+            view.byteOffset = offset
+            continue
+
+        count = view.byteLength // stride
+        if mode == "INDICES":
+            dtype = np.uint16 if stride == 2 else np.uint32
+            encoded = encode_index_sequence(np.frombuffer(raw, dtype=dtype))
+        else:
+            data = np.frombuffer(raw, dtype=np.uint8).reshape(count, stride)
+            if view_index in octahedral:
+                normals = data.view(np.int8)[:, :3].astype(np.float64)
+                data = encode_octahedral(normals).view(np.uint8)
+            encoded = encode_vertex_buffer(data)
+
+        target.extend(encoded)
+        target.extend(bytes(-len(target) % 4))
+        view.buffer = fallback_index
+        extension = {
+            "buffer": 0,
+            "byteOffset": offset,
+            "byteLength": len(encoded),
+            "byteStride": stride,
+            "count": count,
+            "mode": mode,
+        }
+        if view_index in octahedral:
+            extension["filter"] = "OCTAHEDRAL"
+        view.extensions = {MESHOPT_COMPRESSION: extension}
+
+    gltf.buffers.append(
+        Buffer(
+            byteLength=fallback_length,
+            extensions={MESHOPT_COMPRESSION: {"fallback": True}},
+        )
+    )
+    for extension_list in (gltf.extensionsUsed, gltf.extensionsRequired):
+        if MESHOPT_COMPRESSION not in extension_list:
+            extension_list.append(MESHOPT_COMPRESSION)
+
+
+def decode_buffer_view(gltf, view_index: int, data: bytes) -> Optional[bytes]:
+    """
+    Decode a compressed bufferView back to its uncompressed bytes.
+
+    Args:
+        gltf (GLTF2): The compressed document.
+        view_index (int): The bufferView to decode.
+        data (bytes): The contents of buffer 0.
+
+    Returns:
+        Optional[bytes]: The uncompressed bytes, or None if the view is not compressed.
+    """
+    extension = (gltf.bufferViews[view_index].extensions or {}).get(MESHOPT_COMPRESSION)
+    if extension is None:
+        return None
+
+    start = extension.get("byteOffset", 0)
+    return decode_meshopt_data(
+        extension, bytes(data[start : start + extension["byteLength"]])
+    )
+
+
+def decode_meshopt_data(extension: Dict, encoded: bytes) -> bytes:
+    """
+    Decode the bytes an EXT_meshopt_compression bufferView extension points at.
+
+    Args:
+        extension (Dict): The view's EXT_meshopt_compression object.
+        encoded (bytes): The `byteLength` bytes at its `byteOffset`.
+
+    Returns:
+        bytes: The uncompressed bytes of the view.
+    """
+    stride, count = extension["byteStride"], extension["count"]
+    if extension["mode"] == "ATTRIBUTES":
+        data = decode_vertex_buffer(encoded, count, stride)
+        if extension.get("filter") == "OCTAHEDRAL":
+            data = decode_octahedral(data.view(np.int8)).view(np.uint8)
+        return data.tobytes()
+    indices = decode_index_sequence(encoded, count)
+    return indices.astype(np.uint16 if stride == 2 else np.uint32).tobytes()
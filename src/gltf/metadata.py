@@ -1,13 +1,12 @@
-import json
-from typing import Dict, Any
+from typing import Any, Dict, Optional
 
 import numpy as np
 from pygltflib import Node
 from specklepy.objects import Base
 
 
-def add_metadata_to_node(node: Node, obj: Base):
-    metadata = extract_metadata(obj)
+def add_metadata_to_node(node: Node, obj: Base, extra: Optional[Dict[str, Any]] = None):
+    metadata = extract_metadata(obj, extra)
     if metadata:
         if node.extras is None:
             node.extras = {}
@@ -28,7 +27,35 @@ def numpy_to_python(obj):
     return obj
 
 
-def extract_metadata(obj: Base) -> Dict[str, Any]:
+def is_json_value(value) -> bool:
+    """Check that `json.dumps` accepts a value, without serializing it."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(is_json_value(item) for item in value)
+    if isinstance(value, dict):
+        return all(
+            (key is None or isinstance(key, (str, int, float, bool)))
+            and is_json_value(item)
+            for key, item in value.items()
+        )
+    return False
+
+
+def extract_metadata(
+    obj: Base, extra: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Collect an object's JSON-serializable members as metadata.
+
+    Args:
+        obj (Base): The Speckle object.
+        extra (Optional[Dict[str, Any]]): Entries to add that are not stored on
+            the object, e.g. the `parent_type` found while traversing.
+
+    Returns:
+        Dict[str, Any]: The metadata.
+    """
     metadata = {}
     for attr, value in obj.__dict__.items():
         if not attr.startswith("_") and attr not in ["vertices", "faces", "colors"]:
@@ -37,11 +64,11 @@ def extract_metadata(obj: Base) -> Dict[str, Any]:
             else:
                 # Convert numpy types to Python native types
                 converted_value = numpy_to_python(value)
-                try:
-                    # Attempt to JSON serialize
-                    json.dumps(converted_value)
+                if is_json_value(converted_value):
                     metadata[attr] = converted_value
-                except TypeError:
-                    # If it still can't be JSON serialized, convert to string
+                else:
+                    # If it can't be JSON serialized, convert to string
                     metadata[attr] = str(converted_value)
+    if extra:
+        metadata.update(extra)
     return metadata
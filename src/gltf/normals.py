@@ -0,0 +1,177 @@
+"""Smooth vertex normals with a crease angle, written as the NORMAL attribute.
+
+Every corner of every triangle gets the area-weighted sum of the normals of
+the triangles around its vertex that lie within the crease angle of its own
+triangle. Corners of a vertex are found by sorting corners by vertex and
+splitting the sorted array into segments; each corner is compared in bulk
+with every corner of its segment. Corners of one vertex that end up with different normals,
+e.g. either side of a box edge, become separate vertices.
+
+Normals are stored as float32, or compactly as normalized int8 under
+KHR_mesh_quantization. With meshopt compression, int8 normals are further
+encoded with the octahedral filter of EXT_meshopt_compression.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+from pygltflib import Accessor
+
+from src.gltf.primitive import create_float_accessor
+from src.gltf.quantize import KHR_MESH_QUANTIZATION
+from src.gltf.weld import _first_use_order
+
+# Corner pairs compared at once. Chunks split the corners of a vertex shared
+# by very many triangles, such as the centre of a fan, so memory stays bounded
+# by this or, for a single corner, by the number of triangles at its vertex.
+PAIR_CHUNK = 1 << 22
+# Normals are compared at this resolution when deciding to split a vertex.
+SPLIT_RESOLUTION = 1 << 20
+# Used where the surrounding triangles have no area to take a normal from.
+DEFAULT_NORMAL = (0.0, 1.0, 0.0)
+INT8_MAX = 127
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    length = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = vectors / np.where(length > 0, length, 1)
+    normalized[length[:, 0] == 0] = DEFAULT_NORMAL
+    return normalized
+
+
+def _corner_chunks(pair_counts: np.ndarray):
+    """Yield (first, last) corner ranges making at most `PAIR_CHUNK` pairs each."""
+    pairs = np.cumsum(pair_counts.astype(np.int64))
+    first = 0
+    while first < len(pair_counts):
+        offset = pairs[first - 1] if first else 0
+        last = int(np.searchsorted(pairs, offset + PAIR_CHUNK, side="right"))
+        last = max(last, first + 1)
+        yield first, last
+        first = last
+
+
+def crease_normals(
+    vertices: np.ndarray, faces: np.ndarray, crease_angle: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute smooth vertex normals, splitting vertices along creases.
+
+    Args:
+        vertices (np.ndarray): (n, 3) positions.
+        faces (np.ndarray): (m, 3) triangle indices.
+        crease_angle (float): Triangles meeting at a larger angle, in degrees,
+            are shaded separately.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The (k, 3) float32 positions,
+            the (m, 3) uint32 faces indexing them and the (k, 3) float32 unit
+            normals. Vertices are numbered in order of first use.
+    """
+    if len(faces) == 0:
+        return vertices, faces, np.zeros((len(vertices), 3), dtype=np.float32)
+
+    p0, p1, p2 = (vertices[faces[:, k]].astype(np.float64) for k in range(3))
+    # The cross product's length is twice the area, which weights the sum.
+    weighted = np.cross(p1 - p0, p2 - p0)
+    unit = _normalize(weighted)
+    limit = np.cos(np.radians(crease_angle))
+
+    corner_vertex = faces.ravel()
+    corner_face = np.repeat(np.arange(len(faces)), 3)
+    order = np.argsort(corner_vertex, kind="stable")
+    sorted_face = corner_face[order]
+    sorted_vertex = corner_vertex[order]
+    starts = np.flatnonzero(np.r_[True, sorted_vertex[1:] != sorted_vertex[:-1]])
+    lengths = np.diff(np.r_[starts, len(order)])
+
+    # Each corner is paired with every corner of its segment.
+    corner_pairs = np.repeat(lengths, lengths)
+    corner_segment = np.repeat(starts, lengths)
+
+    sorted_normals = np.zeros((len(order), 3))
+    for first, last in _corner_chunks(corner_pairs):
+        pair_counts = corner_pairs[first:last]
+        corners = np.repeat(np.arange(first, last), pair_counts)
+        within = np.arange(pair_counts.sum()) - np.repeat(
+            np.cumsum(pair_counts) - pair_counts, pair_counts
+        )
+        others = np.repeat(corner_segment[first:last], pair_counts) + within
+
+        own, other = sorted_face[corners], sorted_face[others]
+        smooth = np.einsum("ij,ij->i", unit[own], unit[other]) >= limit
+        for axis in range(3):
+            sorted_normals[:, axis] += np.bincount(
+                corners[smooth],
+                weights=weighted[other[smooth], axis],
+                minlength=len(order),
+            )
+
+    normals = np.empty_like(sorted_normals)
+    normals[order] = sorted_normals
+    normals = _normalize(normals)
+
+    # Corners of one vertex sharing a normal stay one vertex.
+    keys = np.column_stack(
+        [corner_vertex, np.round(normals * SPLIT_RESOLUTION).astype(np.int64)]
+    )
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    first_use = np.sort(first)
+    return (
+        vertices[corner_vertex[first_use]].astype(np.float32),
+        _first_use_order(first, inverse).reshape(-1, 3).astype(np.uint32),
+        normals[first_use].astype(np.float32),
+    )
+
+
+def add_normal_attribute(
+    primitive,
+    normals: np.ndarray,
+    gltf,
+    buffer_data,
+    compact: bool = False,
+    matrix: Optional[np.ndarray] = None,
+) -> int:
+    """
+    Write normals as the primitive's NORMAL attribute.
+
+    Args:
+        primitive (Primitive): The primitive whose POSITION the normals match.
+        normals (np.ndarray): (n, 3) unit normals.
+        gltf (GLTF2): The glTF document being built.
+        buffer_data (BufferBuilder): The buffers the normals are written to.
+        compact (bool): Store normalized int8 instead of float32.
+        matrix (Optional[np.ndarray]): The matrix nodes drawing the primitive
+            apply, e.g. to dequantize its positions. Viewers transform normals
+            by its inverse transpose, so they are stored pre-transformed.
+
+    Returns:
+        int: The index of the new accessor.
+    """
+    if matrix is not None:
+        normals = _normalize(normals * np.linalg.norm(matrix[:3, :3], axis=0))
+
+    if not compact:
+        accessor = create_float_accessor(normals, gltf, buffer_data, "VEC3")
+    else:
+        # Vertex attributes must be 4-byte aligned, so pad each normal to 4 bytes.
+        packed = np.zeros((len(normals), 4), dtype=np.int8)
+        packed[:, :3] = np.round(normals * INT8_MAX)
+        gltf.accessors.append(
+            Accessor(
+                bufferView=buffer_data.add_view(
+                    packed, target=34962, byte_stride=4  # GL_ARRAY_BUFFER
+                ),
+                componentType=5120,  # GL_BYTE
+                normalized=True,
+                count=len(packed),
+                type="VEC3",
+            )
+        )
+        accessor = len(gltf.accessors) - 1
+        for extension_list in (gltf.extensionsUsed, gltf.extensionsRequired):
+            if KHR_MESH_QUANTIZATION not in extension_list:
+                extension_list.append(KHR_MESH_QUANTIZATION)
+
+    primitive.attributes.NORMAL = accessor
+    return accessor
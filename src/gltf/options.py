@@ -0,0 +1,79 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.gltf.buffer import MAX_BUFFER_LENGTH
+from src.inputs import MetadataFormat
+from src.utils.store import cache_directory
+
+# File name of the conversion cache within `cache_directory()`.
+CACHE_FILE_NAME = "meshes.sqlite"
+
+
+@dataclass
+class ExportOptions:
+    """Conversion settings shared by the glTF builders."""
+
+    # Store positions as normalized int16 under KHR_mesh_quantization.
+    quantize: bool = False
+    # Largest position error quantization may introduce, in metres.
+    quantization_precision: float = 0.001
+    # Weld vertices closer than this, in metres, and drop unused ones; None disables.
+    weld_tolerance: Optional[float] = 1e-5
+    # Processes decoding meshes ahead of the exporter; 1 converts serially.
+    workers: int = 1
+    # Encode bufferViews with the EXT_meshopt_compression codecs.
+    meshopt_compression: bool = False
+    # Store metadata in an EXT_structural_metadata property table, not node extras.
+    structural_metadata: bool = False
+    # SQLite file caching converted meshes by Speckle id; None disables.
+    cache_path: Optional[Path] = None
+    # Size, in bytes, the conversion cache is evicted down to.
+    cache_size: int = 1 << 30
+    # Record which mesh holds each display mesh so a later export can reuse it.
+    incremental: bool = False
+    # An earlier incremental GLB export whose geometry may be copied.
+    previous_export: Optional[Path] = None
+    # Simplified MSFT_lod levels written per mesh; 0 writes full detail only.
+    lod_levels: int = 0
+    # Share of the previous level's triangles each level keeps.
+    lod_ratio: float = 0.25
+    # Meshes smaller than this, in metres, become boxes and then disappear.
+    lod_min_size: float = 0.0
+    # The most objects a 3D Tiles leaf tile holds before it is split.
+    tile_max_elements: int = 256
+    # Write smooth NORMAL attributes, split where faces meet at a sharp angle.
+    normals: bool = False
+    # Faces meeting at more than this angle, in degrees, are shaded separately.
+    crease_angle: float = 30.0
+    # Store normals as normalized int8 instead of float32.
+    compact_normals: bool = False
+    # Length past which geometry goes to another glTF buffer.
+    max_buffer_length: int = MAX_BUFFER_LENGTH
+
+    @classmethod
+    def from_inputs(cls, function_inputs) -> "ExportOptions":
+        """Build the options from the Automate function inputs."""
+        return cls(
+            quantize=function_inputs.quantize_geometry,
+            quantization_precision=function_inputs.quantization_precision / 1000,
+            meshopt_compression=function_inputs.meshopt_compression,
+            structural_metadata=(
+                function_inputs.metadata_format == MetadataFormat.STRUCTURAL
+            ),
+            workers=function_inputs.conversion_workers or os.cpu_count() or 1,
+            cache_path=(
+                cache_directory() / CACHE_FILE_NAME
+                if function_inputs.conversion_cache_size
+                else None
+            ),
+            cache_size=function_inputs.conversion_cache_size << 20,
+            incremental=function_inputs.incremental_export,
+            lod_levels=function_inputs.lod_levels,
+            lod_min_size=function_inputs.lod_min_size,
+            tile_max_elements=function_inputs.tile_max_elements,
+            normals=function_inputs.generate_normals,
+            crease_angle=function_inputs.crease_angle,
+            compact_normals=function_inputs.compact_normals,
+        )
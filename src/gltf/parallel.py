@@ -0,0 +1,249 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Deque, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.gltf.mesh import process_mesh_data
+from src.gltf.weld import clean_mesh
+
+# Meshes are sent to the workers in batches of about this many vertices.
+BATCH_VERTICES = 1 << 16
+BATCH_MAX_MESHES = 512
+
+ConvertedMesh = Tuple[np.ndarray, np.ndarray, Tuple[int, int]]
+# Per mesh: the raw vertex and face array lengths, and the weld tolerance.
+BatchEntry = Tuple[int, int, Optional[float]]
+
+
+def _pack_batch(
+    meshes: List[Tuple[np.ndarray, np.ndarray]],
+) -> Optional[SharedMemory]:
+    """
+    Write a batch's vertex and face arrays back to back into shared memory.
+
+    Batches cross the process boundary this way in both directions, so only
+    the block name and the array sizes are pickled.
+
+    Returns:
+        The block, or None if the batch is empty.
+    """
+    size = sum(v.nbytes + f.nbytes for v, f in meshes)
+    if size == 0:
+        return None
+    block = SharedMemory(create=True, size=size)
+    offset = 0
+    for arrays in meshes:
+        for array in arrays:
+            block.buf[offset : offset + array.nbytes] = array.tobytes()
+            offset += array.nbytes
+    return block
+
+
+def _free(block: Optional[SharedMemory]) -> None:
+    if block is not None:
+        block.close()
+        block.unlink()
+
+
+def _unpack_batch(
+    name: Optional[str], entries: List[BatchEntry]
+) -> List[Tuple[np.ndarray, np.ndarray, Optional[float]]]:
+    """Copy a batch's raw arrays out of the shared memory block written for it."""
+    if name is None:
+        return [
+            (np.empty(0, np.float32), np.empty(0, np.int64), tolerance)
+            for _, _, tolerance in entries
+        ]
+
+    block = SharedMemory(name=name)
+    try:
+        meshes, offset = [], 0
+        for vertex_length, face_length, tolerance in entries:
+            vertices = np.frombuffer(block.buf, np.float32, vertex_length, offset)
+            offset += vertices.nbytes
+            faces = np.frombuffer(block.buf, np.int64, face_length, offset)
+            offset += faces.nbytes
+            meshes.append((vertices.copy(), faces.copy(), tolerance))
+            del vertices, faces
+        return meshes
+    finally:
+        block.close()
+
+
+def _convert_batch(
+    name: Optional[str], batch: List[BatchEntry]
+) -> Tuple[Optional[str], List[Tuple[int, int, Tuple[int, int]]]]:
+    """
+    Decode and clean a batch of meshes in a worker process.
+
+    The raw arrays are read from the shared memory block `name`, and the
+    converted arrays are written into a new block for the main process.
+
+    Returns:
+        The shared memory name (None if empty) and, per mesh, the vertex count,
+        face count and the (vertex, face) counts before cleanup.
+    """
+    converted = []
+    for vertices, faces, tolerance in _unpack_batch(name, batch):
+        vertices, faces = process_mesh_data(vertices, faces)
+        before = (len(vertices), len(faces))
+        if tolerance is not None:
+            vertices, faces = clean_mesh(vertices, faces, tolerance)
+        converted.append((vertices.astype(np.float32), faces.astype(np.uint32), before))
+
+    entries = [(len(v), len(f), before) for v, f, before in converted]
+    block = _pack_batch([(vertices, faces) for vertices, faces, _ in converted])
+    if block is None:
+        return None, entries
+
+    name = block.name
+    block.close()
+    # The main process unlinks the block once it has copied the arrays out.
+    resource_tracker.unregister(block._name, "shared_memory")
+    return name, entries
+
+
+def _read_batch(
+    name: Optional[str], entries: List[Tuple[int, int, Tuple[int, int]]]
+) -> List[ConvertedMesh]:
+    """Copy a worker's converted meshes out of shared memory and free it."""
+    if name is None:
+        return [
+            (np.empty((0, 3), np.float32), np.empty((0, 3), np.uint32), before)
+            for _, _, before in entries
+        ]
+
+    block = SharedMemory(name=name)
+    try:
+        meshes, offset = [], 0
+        for vertex_count, face_count, before in entries:
+            vertices = np.frombuffer(
+                block.buf, np.float32, vertex_count * 3, offset
+            ).reshape(-1, 3)
+            offset += vertices.nbytes
+            faces = np.frombuffer(block.buf, np.uint32, face_count * 3, offset)
+            offset += faces.nbytes
+            meshes.append((vertices.copy(), faces.reshape(-1, 3).copy(), before))
+            del vertices, faces
+        return meshes
+    finally:
+        _free(block)
+
+
+def prefetch_key(display_mesh) -> Hashable:
+    """Identify a display mesh, sharing work between meshes with one Speckle id."""
+    speckle_id = getattr(display_mesh, "id", None)
+    return ("id", speckle_id) if speckle_id else ("object", id(display_mesh))
+
+
+class MeshPrefetcher:
+    """
+    Decode display meshes on a process pool ahead of the serial export loop.
+
+    Meshes are submitted in traversal order, a bounded number of batches
+    ahead of the consumer, and handed out by `get` in whatever order the
+    exporter asks for them. The exporter still writes every buffer itself, so
+    the output is byte-identical to a serial export.
+    """
+
+    def __init__(
+        self,
+        display_meshes: Iterable,
+        workers: int,
+        weld_tolerance: Callable[[Optional[str]], Optional[float]],
+        window: Optional[int] = None,
+    ):
+        """
+        Args:
+            display_meshes (Iterable): The Speckle meshes in the order they will be used.
+            workers (int): Number of worker processes.
+            weld_tolerance (Callable): Returns the weld tolerance for a unit
+                string, or None to skip cleanup.
+            window (Optional[int]): Batches kept in flight, by default 2 per worker.
+        """
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._batches = self._make_batches(display_meshes, weld_tolerance)
+        self._window = window or 2 * workers
+        self._pending: Deque[Tuple[List[Hashable], Optional[SharedMemory], Future]] = (
+            deque()
+        )
+        self._ready: Dict[Hashable, ConvertedMesh] = {}
+        self._consumed = set()
+
+    @staticmethod
+    def _make_batches(display_meshes: Iterable, weld_tolerance: Callable):
+        seen = set()
+        keys, batch, vertex_count = [], [], 0
+        for display_mesh in display_meshes:
+            key = prefetch_key(display_mesh)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            tolerance = weld_tolerance(getattr(display_mesh, "units", None))
+            # Converted here so the workers get flat buffers, not Python lists.
+            vertices = np.asarray(display_mesh.vertices, dtype=np.float32).ravel()
+            faces = np.asarray(display_mesh.faces, dtype=np.int64).ravel()
+            keys.append(key)
+            batch.append((vertices, faces, tolerance))
+            vertex_count += len(vertices) // 3
+            if vertex_count >= BATCH_VERTICES or len(batch) >= BATCH_MAX_MESHES:
+                yield keys, batch
+                keys, batch, vertex_count = [], [], 0
+        if batch:
+            yield keys, batch
+
+    def _top_up(self) -> None:
+        while len(self._pending) < self._window:
+            batch = next(self._batches, None)
+            if batch is None:
+                return
+            keys, items = batch
+            block = _pack_batch([(vertices, faces) for vertices, faces, _ in items])
+            entries = [(len(v), len(f), tolerance) for v, f, tolerance in items]
+            name = None if block is None else block.name
+            try:
+                future = self._executor.submit(_convert_batch, name, entries)
+            except BaseException:
+                _free(block)
+                raise
+            self._pending.append((keys, block, future))
+
+    def get(self, display_mesh) -> Optional[ConvertedMesh]:
+        """
+        Return the converted mesh, waiting for its batch if needed.
+
+        Returns:
+            Optional[ConvertedMesh]: The positions, faces and pre-cleanup counts,
+                or None if the mesh was not prefetched or was already handed out.
+        """
+        key = prefetch_key(display_mesh)
+        while key not in self._ready:
+            if key in self._consumed:
+                return None
+            self._top_up()
+            if not self._pending:
+                return None
+            keys, block, future = self._pending.popleft()
+            try:
+                converted = future.result()
+            finally:
+                _free(block)
+            self._ready.update(zip(keys, _read_batch(*converted)))
+            self._top_up()
+
+        self._consumed.add(key)
+        return self._ready.pop(key)
+
+    def close(self) -> None:
+        """Stop the workers and free any shared memory still in flight."""
+        for _, block, future in self._pending:
+            if not future.cancel() and future.exception() is None:
+                _read_batch(*future.result())
+            _free(block)
+        self._pending.clear()
+        self._ready.clear()
+        self._executor.shutdown()
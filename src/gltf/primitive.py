@@ -1,4 +1,5 @@
-from pygltflib import Primitive, Attributes, BufferView, Accessor
+import numpy as np
+from pygltflib import Primitive, Attributes, Accessor
 
 
 def create_primitive(vertices, faces, gltf, buffer_data, material_index=None):
@@ -7,21 +8,14 @@ def create_primitive(vertices, faces, gltf, buffer_data, material_index=None):
     if material_index is not None:
         primitive.material = material_index
 
-    # Vertices
-    vertices_byte_offset = len(buffer_data)
-    vertices_byte_length = vertices.nbytes
-    buffer_data.extend(vertices.tobytes())
-
-    vertices_buffer_view = BufferView(
-        buffer=0,
-        byteOffset=vertices_byte_offset,
-        byteLength=vertices_byte_length,
-        target=34962,  # GL_ARRAY_BUFFER
-    )
-    gltf.bufferViews.append(vertices_buffer_view)
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    faces = np.ascontiguousarray(faces, dtype=np.uint32)
+    buffer_data.reserve(vertices.nbytes + faces.nbytes)
 
+    # Vertices
+    vertices_view = buffer_data.add_view(vertices, target=34962)  # GL_ARRAY_BUFFER
     vertices_accessor = Accessor(
-        bufferView=len(gltf.bufferViews) - 1,
+        bufferView=vertices_view,
         componentType=5126,  # GL_FLOAT
         count=len(vertices),
         type="VEC3",
@@ -31,20 +25,9 @@ def create_primitive(vertices, faces, gltf, buffer_data, material_index=None):
     gltf.accessors.append(vertices_accessor)
 
     # Indices
-    indices_byte_offset = len(buffer_data)
-    indices_byte_length = faces.nbytes
-    buffer_data.extend(faces.tobytes())
-
-    indices_buffer_view = BufferView(
-        buffer=0,
-        byteOffset=indices_byte_offset,
-        byteLength=indices_byte_length,
-        target=34963,  # GL_ELEMENT_ARRAY_BUFFER
-    )
-    gltf.bufferViews.append(indices_buffer_view)
-
+    indices_view = buffer_data.add_view(faces, target=34963)  # GL_ELEMENT_ARRAY_BUFFER
     indices_accessor = Accessor(
-        bufferView=len(gltf.bufferViews) - 1,
+        bufferView=indices_view,
         componentType=5125,  # GL_UNSIGNED_INT
         count=faces.size,
         type="SCALAR",
@@ -56,3 +39,32 @@ def create_primitive(vertices, faces, gltf, buffer_data, material_index=None):
     primitive.indices = len(gltf.accessors) - 1
 
     return primitive
+
+
+def create_float_accessor(array, gltf, buffer_data, accessor_type):
+    """
+    Write a float32 array to the buffer and add an accessor for it.
+
+    Args:
+        array (np.ndarray): (n, k) values, where k matches `accessor_type`, or
+            (n,) values for "SCALAR".
+        gltf (GLTF2): The glTF document being built.
+        buffer_data (BufferBuilder): The buffers the values are written to.
+        accessor_type (str): The glTF accessor type, e.g. "VEC3".
+
+    Returns:
+        int: The index of the new accessor.
+    """
+    array = np.ascontiguousarray(array, dtype=np.float32).reshape((len(array), -1))
+
+    gltf.accessors.append(
+        Accessor(
+            bufferView=buffer_data.add_view(array),
+            componentType=5126,  # GL_FLOAT
+            count=len(array),
+            type=accessor_type,
+            max=array.max(axis=0).tolist(),
+            min=array.min(axis=0).tolist(),
+        )
+    )
+    return len(gltf.accessors) - 1
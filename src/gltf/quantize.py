@@ -0,0 +1,142 @@
+"""Compact vertex and index storage under KHR_mesh_quantization.
+
+Positions are stored as normalized int16 relative to the primitive's bounding
+box. The mapping back to model space (a scale by the half extent and a
+translation to the box centre) is returned as a matrix for the node that
+draws the mesh. Indices use the narrowest unsigned type the vertex count allows.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+from pygltflib import Accessor, Primitive, Attributes
+from specklepy.objects.units import get_scale_factor_to_meters, get_units_from_string
+
+from src.gltf.primitive import create_primitive
+
+KHR_MESH_QUANTIZATION = "KHR_mesh_quantization"
+INT16_MAX = 32767
+
+
+def units_to_meters(units: Optional[str]) -> float:
+    """Return the size of one model unit in metres, assuming metres if unknown."""
+    try:
+        return get_scale_factor_to_meters(get_units_from_string(units))
+    except Exception:
+        return 1.0
+
+
+def quantize_positions(
+    vertices: np.ndarray, precision: float
+) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Quantize positions to normalized int16 within their bounding box.
+
+    Args:
+        vertices (np.ndarray): (n, 3) positions.
+        precision (float): Largest allowed rounding error, in the vertices' units.
+
+    Returns:
+        Optional[Tuple[np.ndarray, np.ndarray]]: (n, 4) int16 positions, padded
+            to the 8-byte stride vertex attributes need, and the 4x4 matrix that
+            maps them back. None if the box is too large for `precision`.
+    """
+    low = vertices.min(axis=0).astype(np.float64)
+    high = vertices.max(axis=0).astype(np.float64)
+    centre = (low + high) / 2
+    half_extent = (high - low) / 2
+    half_extent[half_extent == 0] = 1.0
+
+    # Rounding to the nearest step is off by at most half a step.
+    if np.max(half_extent / INT16_MAX / 2) > precision:
+        return None
+
+    quantized = np.zeros((len(vertices), 4), dtype=np.int16)
+    quantized[:, :3] = np.round((vertices - centre) / half_extent * INT16_MAX)
+
+    matrix = np.identity(4)
+    matrix[:3, :3] = np.diag(half_extent)
+    matrix[:3, 3] = centre
+    return quantized, matrix
+
+
+def narrow_indices(faces: np.ndarray, vertex_count: int) -> Tuple[np.ndarray, int]:
+    """
+    Store indices in the narrowest type that can address every vertex.
+
+    The largest value of each type is reserved for primitive restart, so it
+    must not appear as an index.
+
+    Returns:
+        Tuple[np.ndarray, int]: The flattened indices and their glTF componentType.
+    """
+    if vertex_count <= 0xFF:
+        return faces.astype(np.uint8).ravel(), 5121  # GL_UNSIGNED_BYTE
+    if vertex_count <= 0xFFFF:
+        return faces.astype(np.uint16).ravel(), 5123  # GL_UNSIGNED_SHORT
+    return faces.astype(np.uint32).ravel(), 5125  # GL_UNSIGNED_INT
+
+
+def create_quantized_primitive(
+    vertices, faces, gltf, buffer_data, material_index=None, precision=0.001
+):
+    """
+    Create a primitive with quantized positions and narrowed indices.
+
+    Falls back to `create_primitive` when the bounding box is too large to meet
+    `precision` with 16 bits.
+
+    Returns:
+        Tuple[Primitive, Optional[np.ndarray]]: The primitive and the matrix the
+            node drawing it must apply, or None if it was not quantized.
+    """
+    quantized = quantize_positions(vertices, precision)
+    if quantized is None:
+        return (
+            create_primitive(vertices, faces, gltf, buffer_data, material_index),
+            None,
+        )
+    positions, matrix = quantized
+
+    primitive = Primitive(attributes=Attributes(POSITION=len(gltf.accessors)))
+    if material_index is not None:
+        primitive.material = material_index
+
+    indices, component_type = narrow_indices(faces, len(vertices))
+    buffer_data.reserve(positions.nbytes + indices.nbytes)
+
+    # Positions
+    gltf.accessors.append(
+        Accessor(
+            bufferView=buffer_data.add_view(
+                positions, target=34962, byte_stride=8  # GL_ARRAY_BUFFER
+            ),
+            componentType=5122,  # GL_SHORT
+            normalized=True,
+            count=len(positions),
+            type="VEC3",
+            max=positions[:, :3].max(axis=0).tolist(),
+            min=positions[:, :3].min(axis=0).tolist(),
+        )
+    )
+
+    # Indices
+    gltf.accessors.append(
+        Accessor(
+            bufferView=buffer_data.add_view(
+                indices, target=34963  # GL_ELEMENT_ARRAY_BUFFER
+            ),
+            componentType=component_type,
+            count=indices.size,
+            type="SCALAR",
+            max=[int(indices.max())],
+            min=[int(indices.min())],
+        )
+    )
+    primitive.indices = len(gltf.accessors) - 1
+
+    for extension_list in (gltf.extensionsUsed, gltf.extensionsRequired):
+        if KHR_MESH_QUANTIZATION not in extension_list:
+            extension_list.append(KHR_MESH_QUANTIZATION)
+
+    return primitive, matrix
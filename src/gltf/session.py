@@ -0,0 +1,485 @@
+import itertools
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from pygltflib import GLTF2, Asset, Mesh, Node, Primitive, Scene
+
+from src.gltf.buffer import BufferBuilder
+from src.gltf.cache import ConversionCache
+from src.gltf.dedup import GeometryCache
+from src.gltf.helpers import add_gpu_instanced_nodes, add_nodes_and_meshes
+from src.gltf.incremental import MANIFEST_KEY, PreviousExport, build_manifest
+from src.gltf.lod import MSFT_LOD, SCREEN_COVERAGE, screen_coverage, simplify_levels
+from src.gltf.material import MaterialRegistry
+from src.gltf.mesh import process_speckle_mesh
+from src.gltf.meshopt import compress_buffer
+from src.gltf.metadata import add_metadata_to_node, extract_metadata
+from src.gltf.normals import add_normal_attribute, crease_normals
+from src.gltf.options import ExportOptions
+from src.gltf.parallel import MeshPrefetcher
+from src.gltf.primitive import create_primitive
+from src.gltf.quantize import create_quantized_primitive, units_to_meters
+from src.gltf.structural import PropertyTableBuilder
+from src.gltf.weld import CleanupStats, clean_mesh
+from src.utils.instrument import active
+
+
+class ExportSession:
+    """
+    State shared while one Speckle version is converted to glTF.
+
+    Holds the document being built, the sink the geometry is written to and
+    the caches that make repeated geometry and materials cheap.
+    """
+
+    def __init__(self, buffer_data=None, options: Optional[ExportOptions] = None):
+        """
+        Start a new glTF document.
+
+        Args:
+            buffer_data: Where geometry is written, e.g. a `GlbWriter` streaming to
+                disk. Defaults to an in-memory buffer embedded as a data URI.
+            options (Optional[ExportOptions]): Conversion settings.
+        """
+        self.options = options or ExportOptions()
+        self.gltf = GLTF2()
+        self.gltf.asset = Asset(version="2.0", generator="Speckle to GLTF Converter")
+        self.main_scene = Scene(nodes=[])
+        self.gltf.scenes.append(self.main_scene)
+        self.gltf.scene = 0
+        self.buffer_data = BufferBuilder(
+            self.gltf, buffer_data, self.options.max_buffer_length
+        )
+        self.buffer = self.buffer_data.buffer
+
+        self.geometry_cache = GeometryCache()
+        self.cleanup = CleanupStats()
+        self._prefetcher: Optional[MeshPrefetcher] = None
+        self.conversion_cache = (
+            ConversionCache(self.options.cache_path, self.options.cache_size)
+            if self.options.cache_path is not None
+            else None
+        )
+        # Copied meshes have no decoded geometry to simplify, so LOD exports
+        # convert every mesh.
+        self.previous = (
+            PreviousExport.open(self.options.previous_export, self.options)
+            if self.options.previous_export is not None and not self.options.lod_levels
+            else None
+        )
+        # Speckle display mesh ids and the glTF mesh they were written as.
+        self.mesh_ids: Dict[str, int] = {}
+        self.materials = MaterialRegistry(self.gltf)
+        self.property_table = (
+            PropertyTableBuilder() if self.options.structural_metadata else None
+        )
+        # Matrices that nodes drawing a mesh must apply, e.g. to dequantize it.
+        self.mesh_matrices: Dict[int, np.ndarray] = {}
+        # The mesh drawn at each coarse level of detail of a mesh, None if dropped.
+        self.lod_meshes: Dict[int, List[Optional[int]]] = {}
+
+    def material_index(self, display_mesh) -> Optional[int]:
+        """Return the glTF material for a display mesh's render material, if any."""
+        with active().stage("materials", items=1):
+            material = getattr(display_mesh, "renderMaterial", None)
+            return self.materials.get_or_add(material)
+
+    def weld_tolerance(self, units: Optional[str]) -> Optional[float]:
+        """Return the weld tolerance in the given model units, or None if disabled."""
+        if self.options.weld_tolerance is None:
+            return None
+        return self.options.weld_tolerance / units_to_meters(units)
+
+    def prefetch(self, objects: Iterable, display_meshes: Callable) -> Iterable:
+        """
+        Convert the objects' display meshes on `options.workers` processes ahead of use.
+
+        The traversal is consumed lazily by both the exporter and the workers;
+        only the objects between the two are buffered. Meshes found in the
+        conversion cache or the previous export are not sent to the workers.
+
+        Args:
+            objects (Iterable): The traversal the exporter is about to consume.
+            display_meshes (Callable): Returns the Speckle meshes of one item of
+                `objects`, in the order `process_mesh` will be called for them.
+
+        Returns:
+            Iterable: The traversal for the exporter to iterate instead of `objects`.
+        """
+        objects = active().iterate("traversal", objects)
+        if self.options.workers <= 1:
+            return objects
+
+        objects, lookahead = itertools.tee(objects)
+        self._prefetcher = MeshPrefetcher(
+            (
+                mesh
+                for item in lookahead
+                for mesh in display_meshes(item)
+                if not self._is_converted(mesh)
+            ),
+            self.options.workers,
+            self.weld_tolerance,
+        )
+        return objects
+
+    def _cache_key(self, display_mesh) -> Optional[str]:
+        tolerance = self.weld_tolerance(getattr(display_mesh, "units", None))
+        return ConversionCache.key(display_mesh, tolerance)
+
+    def _is_converted(self, display_mesh) -> bool:
+        if self.previous is not None and getattr(display_mesh, "id", None) in (
+            self.previous
+        ):
+            return True
+        return (
+            self.conversion_cache is not None
+            and self._cache_key(display_mesh) in self.conversion_cache
+        )
+
+    def reuse_mesh(self, display_mesh, material_index: Optional[int]) -> Optional[int]:
+        """
+        Copy a display mesh's glTF mesh from the previous export, if it has one.
+
+        Returns:
+            Optional[int]: The copied mesh, or None if it must be converted.
+        """
+        speckle_id = getattr(display_mesh, "id", None)
+        if self.previous is None or speckle_id not in self.previous:
+            return None
+        primitives, matrix = self.previous.copy_mesh(
+            speckle_id, self.gltf, self.buffer_data, material_index
+        )
+        return self.add_mesh(primitives, matrix)
+
+    def record_mesh(self, display_mesh, mesh_index: int) -> None:
+        """Remember which glTF mesh a display mesh was written as, for the manifest."""
+        speckle_id = getattr(display_mesh, "id", None)
+        if self.options.incremental and speckle_id:
+            self.mesh_ids.setdefault(speckle_id, mesh_index)
+
+    def process_mesh(self, display_mesh) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode a Speckle mesh and, unless disabled, weld and compact it.
+
+        Meshes are read from the conversion cache when it has them, and stored
+        in it after they are converted.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (n, 3) float32 Y-up positions and
+                (m, 3) uint32 triangle indices.
+        """
+        with active().stage("conversion", items=1):
+            tolerance = self.weld_tolerance(getattr(display_mesh, "units", None))
+            cache_key = ConversionCache.key(display_mesh, tolerance)
+            cached = self.conversion_cache and self.conversion_cache.get(cache_key)
+            converted = cached or (
+                self._prefetcher and self._prefetcher.get(display_mesh)
+            )
+            if converted:
+                vertices, faces, before = converted
+            else:
+                vertices, faces = process_speckle_mesh(display_mesh)
+                before = (len(vertices), len(faces))
+                if tolerance is not None:
+                    vertices, faces = clean_mesh(vertices, faces, tolerance)
+
+            if self.conversion_cache is not None and not cached:
+                self.conversion_cache.put(cache_key, vertices, faces, before)
+
+            if tolerance is not None:
+                self.cleanup.add(before, (len(vertices), len(faces)))
+            return vertices, faces
+
+    def vertex_normals(
+        self, vertices: np.ndarray, faces: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Generate smooth normals if enabled, splitting vertices along creases.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]: The positions and
+                faces, with vertices split where needed, and their normals, or
+                None when normals are disabled.
+        """
+        if not self.options.normals or not len(faces):
+            return vertices, faces, None
+        with active().stage("normals", items=1):
+            return crease_normals(vertices, faces, self.options.crease_angle)
+
+    def create_primitive(
+        self,
+        vertices: np.ndarray,
+        faces: np.ndarray,
+        material_index: Optional[int],
+        units: Optional[str] = None,
+        normals: Optional[np.ndarray] = None,
+    ) -> Tuple[Primitive, Optional[np.ndarray]]:
+        """
+        Write a primitive's geometry according to the session options.
+
+        Args:
+            vertices (np.ndarray): (n, 3) float32 positions.
+            faces (np.ndarray): (m, 3) uint32 triangle indices.
+            material_index (Optional[int]): The glTF material to use.
+            units (Optional[str]): Units of `vertices`, used to scale the precision.
+            normals (Optional[np.ndarray]): (n, 3) unit normals of `vertices`.
+                Generated when normals are enabled and none are given.
+
+        Returns:
+            Tuple[Primitive, Optional[np.ndarray]]: The primitive and the matrix
+                nodes drawing it must apply, if any.
+        """
+        if normals is None:
+            vertices, faces, normals = self.vertex_normals(vertices, faces)
+        with active().stage("conversion"):
+            if self.options.quantize:
+                precision = self.options.quantization_precision / units_to_meters(units)
+                primitive, matrix = create_quantized_primitive(
+                    vertices,
+                    faces,
+                    self.gltf,
+                    self.buffer_data,
+                    material_index,
+                    precision,
+                )
+            else:
+                primitive = create_primitive(
+                    vertices, faces, self.gltf, self.buffer_data, material_index
+                )
+                matrix = None
+            if normals is not None:
+                add_normal_attribute(
+                    primitive,
+                    normals,
+                    self.gltf,
+                    self.buffer_data,
+                    self.options.compact_normals,
+                    matrix,
+                )
+            return primitive, matrix
+
+    def add_mesh(
+        self, primitives: List[Primitive], matrix: Optional[np.ndarray] = None
+    ) -> int:
+        """Add a mesh, remembering the matrix its nodes must apply, and return its index."""
+        mesh_index = len(self.gltf.meshes)
+        self.gltf.meshes.append(Mesh(primitives=primitives))
+        if matrix is not None:
+            self.mesh_matrices[mesh_index] = matrix
+        return mesh_index
+
+    def add_lods(
+        self,
+        mesh_index: int,
+        vertices: np.ndarray,
+        faces: np.ndarray,
+        material_index: Optional[int],
+        units: Optional[str] = None,
+    ) -> None:
+        """
+        Write the simplified levels of detail of a mesh, if enabled.
+
+        A level that could not be simplified further draws the mesh of the
+        level before it.
+
+        Args:
+            mesh_index (int): The full resolution mesh.
+            vertices (np.ndarray): (n, 3) float32 positions of the mesh.
+            faces (np.ndarray): (m, 3) uint32 triangle indices of the mesh.
+            material_index (Optional[int]): The glTF material to use.
+            units (Optional[str]): Units of `vertices`.
+        """
+        if not self.options.lod_levels or len(faces) == 0:
+            return
+        with active().stage("lod", items=1):
+            levels = simplify_levels(
+                vertices,
+                faces,
+                self.options.lod_levels,
+                self.options.lod_ratio,
+                self.options.lod_min_size / units_to_meters(units),
+            )
+            lod_meshes = []
+            previous, previous_index = (vertices, faces), mesh_index
+            for level in levels:
+                if level is None:
+                    lod_meshes.append(None)
+                    continue
+                if level[1] is not previous[1]:
+                    primitive, matrix = self.create_primitive(
+                        *level, material_index, units
+                    )
+                    previous, previous_index = level, self.add_mesh([primitive], matrix)
+                lod_meshes.append(previous_index)
+            self.lod_meshes[mesh_index] = lod_meshes
+
+    def add_feature(self, obj, extra: Optional[Dict] = None) -> int:
+        """Add an object's properties to the property table and return its row."""
+        with active().stage("metadata", items=1):
+            return self.property_table.add(extract_metadata(obj, extra))
+
+    def add_metadata(self, node: Node, obj, extra: Optional[Dict] = None) -> None:
+        """
+        Attach an object's properties to the node drawing it.
+
+        They are stored in the node extras or, with structural metadata, as a
+        property table row whose index the node records as `speckle_feature_id`.
+        """
+        if self.property_table is None:
+            with active().stage("metadata", items=1):
+                add_metadata_to_node(node, obj, extra)
+            return
+        if node.extras is None:
+            node.extras = {}
+        node.extras["speckle_feature_id"] = self.add_feature(obj, extra)
+
+    def add_properties(self, node: Node, metadata: Dict) -> None:
+        """Attach properties extracted earlier to a node, as `add_metadata` does."""
+        if self.property_table is not None:
+            node.extras["speckle_feature_id"] = self.property_table.add(metadata)
+        elif metadata:
+            node.extras["speckle_metadata"] = metadata
+
+    def add_node(
+        self, mesh_indices: List[int], matrix: Optional[np.ndarray] = None
+    ) -> Node:
+        """
+        Add a scene node drawing `mesh_indices`, see `add_nodes_and_meshes`.
+
+        When the meshes have levels of detail, each level becomes a node outside
+        the scene that the added node lists as an MSFT_lod alternate.
+        """
+        node = add_nodes_and_meshes(
+            self.gltf, self.main_scene, mesh_indices, matrix, self.mesh_matrices
+        )
+        self._add_lod_nodes(
+            node,
+            mesh_indices,
+            lambda meshes: add_nodes_and_meshes(
+                self.gltf, None, meshes, matrix, self.mesh_matrices
+            ),
+        )
+        return node
+
+    def add_instanced_node(
+        self, mesh_indices: List[int], matrices: np.ndarray
+    ) -> Optional[Node]:
+        """
+        Add one node drawing every occurrence, see `add_gpu_instanced_nodes`.
+
+        Returns:
+            Optional[Node]: The node, or None if the occurrences need a node each.
+        """
+        node = add_gpu_instanced_nodes(
+            self.gltf,
+            self.main_scene,
+            self.buffer_data,
+            mesh_indices,
+            matrices,
+            self.mesh_matrices,
+        )
+        if node is not None:
+            self._add_lod_nodes(
+                node,
+                mesh_indices,
+                lambda meshes: add_gpu_instanced_nodes(
+                    self.gltf,
+                    None,
+                    self.buffer_data,
+                    meshes,
+                    matrices,
+                    self.mesh_matrices,
+                )
+                or add_nodes_and_meshes(self.gltf, None, []),
+            )
+        return node
+
+    def _add_lod_nodes(
+        self, node: Node, mesh_indices: List[int], add_level: Callable
+    ) -> None:
+        """
+        List the levels of detail of `node`'s meshes as its MSFT_lod alternates.
+
+        Args:
+            node (Node): The node drawing the full resolution meshes.
+            mesh_indices (List[int]): The meshes `node` draws.
+            add_level (Callable): Adds the node drawing the given meshes of one
+                level, outside the scene, as the next node of the document.
+        """
+        if not any(mesh_index in self.lod_meshes for mesh_index in mesh_indices):
+            return
+
+        levels = self.options.lod_levels
+        lod_ids = []
+        for level in range(levels):
+            level_meshes = [
+                self.lod_meshes.get(mesh_index, [mesh_index] * levels)[level]
+                for mesh_index in mesh_indices
+            ]
+            lod_ids.append(len(self.gltf.nodes))
+            add_level([mesh for mesh in level_meshes if mesh is not None])
+
+        node.extensions[MSFT_LOD] = {"ids": lod_ids}
+        node.extras[SCREEN_COVERAGE] = screen_coverage(levels, self.options.lod_ratio)
+        if MSFT_LOD not in self.gltf.extensionsUsed:
+            self.gltf.extensionsUsed.append(MSFT_LOD)
+
+    def finish(self, report: bool = True) -> GLTF2:
+        """
+        Describe the written geometry in the glTF buffer and return the document.
+
+        In-memory data is embedded as a base64 data URI. Data streamed to a
+        `GlbWriter` stays on disk and only its length is recorded. With meshopt
+        compression enabled the written data is re-encoded first. The property
+        table, if any, is written last.
+
+        Args:
+            report (bool): Print the cache, cleanup and material summaries.
+        """
+        with active().stage("serialization"):
+            if self._prefetcher is not None:
+                self._prefetcher.close()
+                self._prefetcher = None
+            if self.conversion_cache is not None:
+                print(self.conversion_cache.summary())
+                self.conversion_cache.close()
+                self.conversion_cache = None
+            if self.previous is not None:
+                print(self.previous.summary())
+                self.previous.close()
+                self.previous = None
+
+            if report:
+                print(self.geometry_cache.summary())
+                print(self.cleanup.summary())
+                print(self.materials.summary())
+
+            if self.options.incremental:
+                self.gltf.asset.extras = {
+                    MANIFEST_KEY: build_manifest(
+                        self.options, self.mesh_ids, self.mesh_matrices
+                    )
+                }
+
+            if self.options.meshopt_compression:
+                self._compress()
+
+            # Written after compression, which only applies to vertex and index data.
+            if self.property_table is not None:
+                self.property_table.write(self.gltf, self.buffer_data)
+
+            self.buffer_data.finish()
+            return self.gltf
+
+    def _compress(self) -> None:
+        """Replace the written data with its EXT_meshopt_compression encoding."""
+        fallback_length = len(self.buffer_data)
+        self.buffer_data.rewrite(
+            lambda read: compress_buffer(
+                self.gltf, read, self.buffer_data, fallback_length
+            )
+        )
+        print(
+            f"Meshopt compression: {fallback_length} -> {len(self.buffer_data)} bytes"
+        )
@@ -0,0 +1,235 @@
+"""Object properties as binary EXT_structural_metadata property tables.
+
+Rather than copying every object's properties into the JSON of its node, the
+properties of all objects are gathered into one typed column per property and
+written to the BIN chunk as a single property table, one row per feature.
+Nodes only record their row as `speckle_feature_id`; merged primitives point
+their EXT_mesh_features feature ids at the table directly.
+
+Numbers become INT32 or FLOAT64 columns and booleans a bitstream. Strings
+that repeat are stored once, as the values of an enum, with each row holding
+only the enum value; other strings are stored as UTF-8 with an offset array.
+Lists and dictionaries are stored as JSON strings.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pygltflib import GLTF2
+
+STRUCTURAL_METADATA = "EXT_structural_metadata"
+CLASS_NAME = "speckle_object"
+
+INT32_MAX = int(np.iinfo(np.int32).max)
+INT32_NO_DATA = int(np.iinfo(np.int32).min)
+FLOAT64_NO_DATA = float(np.finfo(np.float64).min)
+ENUM_NO_DATA = "__no_data__"
+# A string column becomes an enum when, on average, each value repeats this often.
+ENUM_MIN_REPEATS = 2
+# Property table bufferViews must start on an 8-byte boundary.
+VIEW_ALIGNMENT = 8
+
+_INVALID_ID_CHARACTERS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def property_id(name: str, taken: Dict[str, str]) -> str:
+    """Turn a member name into a unique identifier the extension accepts."""
+    identifier = _INVALID_ID_CHARACTERS.sub("_", name) or "_"
+    if identifier[0].isdigit():
+        identifier = f"_{identifier}"
+    candidate, suffix = identifier, 1
+    while candidate in taken:
+        suffix += 1
+        candidate = f"{identifier}_{suffix}"
+    taken[candidate] = name
+    return candidate
+
+
+def _column_value(value: Any) -> Any:
+    """Reduce a metadata value to a bool, int, float, str or None."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return json.dumps(value, default=str)
+
+
+class PropertyTableBuilder:
+    """
+    Gather object properties into columns and write them as a property table.
+
+    Rows are added as the objects are exported, and the table is written once
+    at the end, when the type of every column is known.
+    """
+
+    def __init__(self):
+        self._columns: Dict[str, List[Any]] = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, metadata: Dict[str, Any]) -> int:
+        """
+        Add one object's properties as a row.
+
+        Args:
+            metadata (Dict[str, Any]): The object's properties, as returned by
+                `extract_metadata`.
+
+        Returns:
+            int: The row, i.e. the feature id of the object.
+        """
+        row = self.count
+        for name, value in metadata.items():
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = [None] * row
+            column.append(_column_value(value))
+        self.count += 1
+        for column in self._columns.values():
+            if len(column) < self.count:
+                column.append(None)
+        return row
+
+    def write(self, gltf: GLTF2, buffer_data) -> Optional[int]:
+        """
+        Write the columns to the buffer and describe them in the document.
+
+        Args:
+            gltf (GLTF2): The document being built.
+            buffer_data (BufferBuilder): The buffers the columns are written to.
+
+        Returns:
+            Optional[int]: The index of the property table, or None if empty.
+        """
+        if not self.count:
+            return None
+
+        class_properties, table_properties, enums = {}, {}, {}
+        taken: Dict[str, str] = {}
+        for name, values in self._columns.items():
+            identifier = property_id(name, taken)
+            definition, table_property = self._write_column(
+                identifier, values, gltf, buffer_data, enums
+            )
+            if identifier != name:
+                definition["name"] = name
+            class_properties[identifier] = definition
+            table_properties[identifier] = table_property
+
+        schema = {"id": "speckle", "classes": {CLASS_NAME: {"properties": {}}}}
+        schema["classes"][CLASS_NAME]["properties"] = class_properties
+        if enums:
+            schema["enums"] = enums
+
+        gltf.extensions = gltf.extensions or {}
+        gltf.extensions[STRUCTURAL_METADATA] = {
+            "schema": schema,
+            "propertyTables": [
+                {
+                    "class": CLASS_NAME,
+                    "count": self.count,
+                    "properties": table_properties,
+                }
+            ],
+        }
+        if STRUCTURAL_METADATA not in gltf.extensionsUsed:
+            gltf.extensionsUsed.append(STRUCTURAL_METADATA)
+        return 0
+
+    def _write_column(self, identifier, values, gltf, buffer_data, enums):
+        """Pick a column's type and write its values, returning its descriptions."""
+        present = [value for value in values if value is not None]
+        missing = len(present) < len(values)
+
+        if present and all(isinstance(value, bool) for value in present):
+            if not missing:
+                bits = np.packbits(np.array(values, dtype=bool), bitorder="little")
+                view = _write_view(bits, buffer_data)
+                return {"type": "BOOLEAN"}, {"values": view}
+            # Booleans have no no-data value, so fall back to strings.
+            values = [None if value is None else str(value).lower() for value in values]
+            present = [value for value in values if value is not None]
+
+        if all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in present
+        ):
+            is_int32 = all(
+                isinstance(value, int) and INT32_NO_DATA < value <= INT32_MAX
+                for value in present
+            )
+            component_type, dtype, no_data = (
+                ("INT32", np.int32, INT32_NO_DATA)
+                if is_int32
+                else ("FLOAT64", np.float64, FLOAT64_NO_DATA)
+            )
+            column = np.array(
+                [no_data if value is None else value for value in values], dtype=dtype
+            )
+            definition = {"type": "SCALAR", "componentType": component_type}
+            if missing:
+                definition["noData"] = no_data
+            view = _write_view(column, buffer_data)
+            return definition, {"values": view}
+
+        strings = [None if value is None else str(value) for value in values]
+        unique = list(dict.fromkeys(value for value in strings if value is not None))
+        if (
+            len(unique) * ENUM_MIN_REPEATS <= len(strings)
+            and "" not in unique
+            and ENUM_NO_DATA not in unique
+        ):
+            return self._write_enum(
+                identifier, strings, unique, gltf, buffer_data, enums
+            )
+
+        encoded = [(value or "").encode("utf-8") for value in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        definition = {"type": "STRING"}
+        if missing:
+            definition["noData"] = ""
+        return definition, {
+            "values": _write_view(b"".join(encoded), buffer_data),
+            "stringOffsets": _write_view(offsets, buffer_data),
+            "stringOffsetType": "UINT32",
+        }
+
+    @staticmethod
+    def _write_enum(identifier, strings, unique, gltf, buffer_data, enums):
+        """Store a string column once per distinct value, as an enum."""
+        names = unique + ([ENUM_NO_DATA] if None in strings else [])
+        lookup = {name: value for value, name in enumerate(names)}
+        if len(names) <= 0x100:
+            value_type, dtype = "UINT8", np.uint8
+        elif len(names) <= 0x10000:
+            value_type, dtype = "UINT16", np.uint16
+        else:
+            value_type, dtype = "UINT32", np.uint32
+        column = np.array(
+            [lookup[ENUM_NO_DATA if value is None else value] for value in strings],
+            dtype=dtype,
+        )
+
+        enum_id = f"{identifier}_values"
+        enums[enum_id] = {
+            "valueType": value_type,
+            "values": [
+                {"name": name, "value": value} for name, value in lookup.items()
+            ],
+        }
+        definition = {"type": "ENUM", "enumType": enum_id}
+        if None in strings:
+            definition["noData"] = ENUM_NO_DATA
+        view = _write_view(column, buffer_data)
+        return definition, {"values": view}
+
+
+def _write_view(data, buffer_data) -> int:
+    """Append bytes or an array as an 8-byte aligned bufferView; return its index."""
+    # A bufferView may not be empty, e.g. for a column of empty strings.
+    if not memoryview(data).nbytes:
+        data = b"\x00"
+    return buffer_data.add_view(data, alignment=VIEW_ALIGNMENT)
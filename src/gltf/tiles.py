@@ -0,0 +1,411 @@
+"""Spatially tiled output: a 3D Tiles tileset of octree-chunked GLB files.
+
+The conversion pass decodes every object's display meshes once, records the
+object's bounding box and spools the decoded arrays to a temporary file, so
+only keys, bounds, materials and metadata stay in memory. An octree is then
+built over the box centres, splitting until a tile holds at most
+`tile_max_elements` objects, and every tile is written as its own GLB next to
+a `tileset.json` describing the tree, reading its meshes back one at a time.
+Viewers only download the tiles in view, and each file stays small.
+
+Leaves hold the full resolution objects. With levels of detail enabled, a
+tile above the leaves holds the simplified meshes of every object under it,
+one level coarser per level of the tree, and is replaced by its children as
+the viewer comes closer. Without them, only the leaves have content.
+
+glTF content is Y-up while a tileset is Z-up; viewers rotate the content,
+so bounding volumes are written in the Speckle (Z-up) frame.
+"""
+
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+from specklepy.objects import Base
+
+from src.gltf.create import get_display_meshes, traverse_version
+from src.gltf.dedup import GeometryCache
+from src.gltf.lod import Geometry, simplify_levels
+from src.gltf.metadata import extract_metadata
+from src.gltf.options import ExportOptions
+from src.gltf.quantize import units_to_meters
+from src.gltf.session import ExportSession
+from src.utils.instrument import active
+from src.utils.lazy import LazyVersion
+from src.utils.store import GlbWriter
+
+TILESET_VERSION = "1.1"
+# Depth at which tiles stop splitting even if they hold too many objects.
+MAX_DEPTH = 12
+# Geometric error of simplified tile content, as a share of the tile's size.
+LOD_ERROR_FRACTION = 1 / 16
+
+
+@dataclass
+class TileElement:
+    """One Speckle object: its converted meshes, bounds and properties."""
+
+    # (geometry key, render material, units) of each display mesh.
+    meshes: List[Tuple[Hashable, Optional[Base], Optional[str]]]
+    # (2, 3) minimum and maximum corner of the object in glTF (Y-up) coordinates.
+    bounds: np.ndarray
+    metadata: Optional[Dict] = None
+
+    @property
+    def centre(self) -> np.ndarray:
+        return self.bounds.mean(axis=0)
+
+
+@dataclass
+class Tile:
+    """A node of the octree."""
+
+    path: str
+    elements: List[TileElement] = field(default_factory=list)
+    children: List["Tile"] = field(default_factory=list)
+    # Levels of tiles below this one; leaves have height 0.
+    height: int = 0
+    bounds: Optional[np.ndarray] = None
+
+    @property
+    def name(self) -> str:
+        return f"tile_{self.path or 'root'}"
+
+    def descendants(self) -> List[TileElement]:
+        """Return the elements of this tile and of every tile under it."""
+        elements = list(self.elements)
+        for child in self.children:
+            elements += child.descendants()
+        return elements
+
+
+def build_octree(
+    elements: List[TileElement], max_elements: int, path: str = "", depth: int = 0
+) -> Tile:
+    """
+    Split elements into octants of their centres until each tile is small enough.
+
+    Each element is placed in exactly one leaf, by its centre. A tile's bounds
+    are the union of the bounds of everything under it, so neighbouring tiles
+    may overlap where large objects cross the split planes.
+
+    Args:
+        elements (List[TileElement]): The objects to place.
+        max_elements (int): The most objects a leaf may hold.
+        path (str): The octants leading to this tile, one digit per level.
+        depth (int): The depth of this tile.
+
+    Returns:
+        Tile: The root of the (sub)tree.
+    """
+    tile = Tile(path)
+    centres = np.array([element.centre for element in elements])
+    if len(elements) > max_elements and depth < MAX_DEPTH:
+        split = (centres.min(axis=0) + centres.max(axis=0)) / 2
+        octants = (centres > split) @ np.array([1, 2, 4])
+        if len(np.unique(octants)) > 1:
+            for octant in np.unique(octants):
+                members = [elements[i] for i in np.flatnonzero(octants == octant)]
+                tile.children.append(
+                    build_octree(members, max_elements, f"{path}{octant}", depth + 1)
+                )
+            tile.height = 1 + max(child.height for child in tile.children)
+    if not tile.children:
+        tile.elements = elements
+
+    corners = [element.bounds for element in tile.elements]
+    corners += [child.bounds for child in tile.children]
+    tile.bounds = np.stack(
+        [
+            np.min([corner[0] for corner in corners], axis=0),
+            np.max([corner[1] for corner in corners], axis=0),
+        ]
+    )
+    return tile
+
+
+def bounding_box(bounds: np.ndarray) -> List[float]:
+    """Describe glTF (Y-up) bounds as a 3D Tiles (Z-up) `box` bounding volume."""
+    (x0, y0, z0), (x1, y1, z1) = bounds.astype(float)
+    # glTF (x, y, z) is Speckle (x, -z, y).
+    low, high = np.array([x0, -z1, y0]), np.array([x1, -z0, y1])
+    centre, half = (low + high) / 2, (high - low) / 2
+    return [
+        *centre.tolist(),
+        *[half[0], 0.0, 0.0],
+        *[0.0, half[1], 0.0],
+        *[0.0, 0.0, half[2]],
+    ]
+
+
+class GeometrySpool:
+    """
+    Decoded meshes kept in a temporary file until a tile needs them.
+
+    Tiles are written after the conversion pass has decoded the whole version,
+    so holding the arrays in memory would cost as much as a single-GLB export.
+    Each mesh is instead appended to the file once and read back whenever a
+    tile writes it; a dropped level of detail is recorded without data.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self._file = tempfile.TemporaryFile(dir=directory)
+        # Offset, dtype and shape of each array of a mesh, or None if dropped.
+        self._entries: Dict[Hashable, Optional[List[Tuple]]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def has_geometry(self, key: Hashable) -> bool:
+        """Whether `key` was stored with at least one triangle."""
+        return self._entries.get(key) is not None
+
+    def put(self, key: Hashable, geometry: Optional[Geometry]) -> None:
+        """Append a mesh, or record that there is none, under `key`."""
+        if geometry is None or len(geometry[1]) == 0:
+            self._entries[key] = None
+            return
+        self._file.seek(0, os.SEEK_END)
+        entry = []
+        for array in geometry:
+            array = np.ascontiguousarray(array)
+            entry.append((self._file.tell(), array.dtype, array.shape))
+            self._file.write(memoryview(array).cast("B"))
+        self._entries[key] = entry
+
+    def get(self, key: Hashable) -> Optional[Geometry]:
+        """Read the mesh stored under `key` back, or None if it has none."""
+        entry = self._entries[key]
+        if entry is None:
+            return None
+        arrays = []
+        for offset, dtype, shape in entry:
+            array = np.empty(shape, dtype)
+            self._file.seek(offset)
+            self._file.readinto(memoryview(array).cast("B"))
+            arrays.append(array)
+        return arrays[0], arrays[1]
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class TilesetWriter:
+    """Convert a Speckle version into an octree of GLB tiles and a tileset."""
+
+    def __init__(
+        self,
+        directory: Path,
+        include_metadata: bool,
+        options: Optional[ExportOptions] = None,
+    ):
+        """
+        Args:
+            directory (Path): Where `tileset.json` and the tiles are written.
+            include_metadata (bool): Whether to attach Speckle properties to nodes.
+            options (Optional[ExportOptions]): Conversion settings.
+        """
+        self.directory = Path(directory)
+        self.include_metadata = include_metadata
+        self.options = options or ExportOptions()
+        # Tiles place levels of detail themselves and are never incremental.
+        self.tile_options = replace(
+            self.options,
+            lod_levels=0,
+            incremental=False,
+            previous_export=None,
+            cache_path=None,
+            workers=1,
+        )
+        # Decoded meshes under (key, 0), their levels of detail under (key, level).
+        self.geometry: Optional[GeometrySpool] = None
+        # (2, 3) bounds of each decoded mesh, None if it has no triangles.
+        self._bounds: Dict[Hashable, Optional[np.ndarray]] = {}
+        self.tile_count = 0
+
+    def convert(self, speckle_data: Union[Base, LazyVersion]) -> List[TileElement]:
+        """Decode and spool every object's display meshes, and collect the objects."""
+        self.geometry = GeometrySpool(self.directory)
+        session = ExportSession(
+            options=replace(
+                self.options, lod_levels=0, incremental=False, previous_export=None
+            )
+        )
+        objects = session.prefetch(
+            traverse_version(speckle_data), lambda item: get_display_meshes(item[0])
+        )
+
+        elements = []
+        for obj, parent_type in objects:
+            meshes, corners = [], []
+            for display_mesh in get_display_meshes(obj):
+                key = GeometryCache.key(display_mesh, None)
+                if key not in self._bounds:
+                    vertices, faces = session.process_mesh(display_mesh)
+                    self.geometry.put((key, 0), (vertices, faces))
+                    self._bounds[key] = (
+                        np.stack([vertices.min(axis=0), vertices.max(axis=0)])
+                        if len(faces)
+                        else None
+                    )
+                    del vertices, faces
+                if self._bounds[key] is None:
+                    continue
+                material = getattr(display_mesh, "renderMaterial", None)
+                meshes.append((key, material, getattr(display_mesh, "units", None)))
+                corners += list(self._bounds[key])
+            if not meshes:
+                continue
+
+            metadata = None
+            if self.include_metadata:
+                with active().stage("metadata", items=1):
+                    metadata = extract_metadata(obj, {"parent_type": parent_type})
+            bounds = np.stack([np.min(corners, axis=0), np.max(corners, axis=0)])
+            elements.append(TileElement(meshes, bounds, metadata))
+
+        session.finish(report=False)
+        print(session.cleanup.summary())
+        return elements
+
+    def _level_key(self, key: Hashable, units, level: int) -> Hashable:
+        """Return the spool key of a mesh's level, simplifying it on first use."""
+        if level and (key, level) not in self.geometry:
+            with active().stage("lod", items=1):
+                levels = simplify_levels(
+                    *self.geometry.get((key, 0)),
+                    self.options.lod_levels,
+                    self.options.lod_ratio,
+                    self.options.lod_min_size / units_to_meters(units),
+                )
+            for coarse, geometry in enumerate(levels, start=1):
+                self.geometry.put((key, coarse), geometry)
+        return key, level
+
+    def write_tile(self, tile: Tile, elements: List[TileElement], level: int) -> bool:
+        """
+        Write the given objects, at a level of detail, as the tile's GLB.
+
+        Returns:
+            bool: Whether anything was written; objects may all be dropped
+                at coarse levels.
+        """
+        content = []
+        for element in elements:
+            meshes = [
+                (key, material, units)
+                for key, material, units in element.meshes
+                if self.geometry.has_geometry(self._level_key(key, units, level))
+            ]
+            if meshes:
+                content.append((element, meshes))
+        if not content:
+            return False
+
+        writer = GlbWriter(self.directory / f"{tile.name}.glb")
+        session = ExportSession(writer, self.tile_options)
+        for element, meshes in content:
+            mesh_indices = []
+            for key, material, units in meshes:
+                with active().stage("materials", items=1):
+                    material_index = session.materials.get_or_add(material)
+                cache_key = (key, level, material_index)
+                mesh_index = session.geometry_cache.get(cache_key)
+                if mesh_index is None:
+                    # Only the mesh being written is read back into memory.
+                    primitive, matrix = session.create_primitive(
+                        *self.geometry.get((key, level)), material_index, units
+                    )
+                    mesh_index = session.add_mesh([primitive], matrix)
+                    session.geometry_cache.add(cache_key, mesh_index)
+                mesh_indices.append(mesh_index)
+            node = session.add_node(mesh_indices)
+            if element.metadata is not None:
+                session.add_properties(node, element.metadata)
+
+        writer.finalize(session.finish(report=False))
+        self.tile_count += 1
+        return True
+
+    def write_tree(self, tile: Tile) -> Dict:
+        """Write the tiles of a (sub)tree and return its tileset JSON."""
+        children = [self.write_tree(child) for child in tile.children]
+        diagonal = float(np.linalg.norm(tile.bounds[1] - tile.bounds[0]))
+
+        tile_json = {"boundingVolume": {"box": bounding_box(tile.bounds)}}
+        if not tile.children:
+            has_content = self.write_tile(tile, tile.elements, 0)
+            geometric_error = 0.0
+        elif self.options.lod_levels:
+            level = min(tile.height, self.options.lod_levels)
+            has_content = self.write_tile(tile, tile.descendants(), level)
+            geometric_error = diagonal * LOD_ERROR_FRACTION
+        else:
+            has_content, geometric_error = False, diagonal
+        # Parents must never claim less error than the tiles refining them.
+        tile_json["geometricError"] = max(
+            [geometric_error] + [child["geometricError"] for child in children]
+        )
+        if has_content:
+            tile_json["content"] = {"uri": f"{tile.name}.glb"}
+        if children:
+            tile_json["children"] = children
+        return tile_json
+
+    def write(self, speckle_data: Union[Base, LazyVersion]) -> Path:
+        """
+        Convert the version and write the tiles and `tileset.json`.
+
+        Returns:
+            Path: The path of `tileset.json`.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            elements = self.convert(speckle_data)
+            if not elements:
+                raise ValueError("The version has no display meshes to tile")
+
+            root = build_octree(elements, self.options.tile_max_elements)
+            root_json = self.write_tree(root)
+        finally:
+            if self.geometry is not None:
+                self.geometry.close()
+        root_json["refine"] = "REPLACE"
+        tileset = {
+            "asset": {
+                "version": TILESET_VERSION,
+                "generator": "Speckle to GLTF Converter",
+            },
+            "geometricError": float(np.linalg.norm(root.bounds[1] - root.bounds[0])),
+            "root": root_json,
+        }
+        path = self.directory / "tileset.json"
+        path.write_text(json.dumps(tileset, indent=2))
+        print(f"3D Tiles: {len(elements)} objects in {self.tile_count} tiles")
+        return path
+
+
+def create_tileset(
+    speckle_data: Union[Base, LazyVersion],
+    include_metadata: bool,
+    directory: Path,
+    options: Optional[ExportOptions] = None,
+) -> Path:
+    """
+    Write a Speckle version as a 3D Tiles tileset of GLB tiles.
+
+    Args:
+        speckle_data (Union[Base, LazyVersion]): The root of the received
+            Speckle version, or a version to deserialize while it is exported.
+        include_metadata (bool): Whether to attach Speckle properties to nodes.
+        directory (Path): Where `tileset.json` and the tiles are written.
+        options (Optional[ExportOptions]): Conversion settings.
+
+    Returns:
+        Path: The path of `tileset.json`.
+    """
+    return TilesetWriter(directory, include_metadata, options).write(speckle_data)
@@ -0,0 +1,320 @@
+"""Batched polygon triangulation for decoded Speckle faces.
+
+Polygons are grouped by vertex count. Triangles pass straight through, convex
+polygons of any size are fanned with array operations, concave quads are fanned
+from their reflex corner, and only the remaining polygons are projected to 2D
+and ear-clipped one at a time. The ear clipper runs a bounded number of passes
+and falls back to a fan, so degenerate input can never stall an export.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def polygon_normals(points: np.ndarray) -> np.ndarray:
+    """
+    Compute Newell normals for a batch of polygons with the same vertex count.
+
+    Args:
+        points (np.ndarray): (n, k, 3) polygon corner positions.
+
+    Returns:
+        np.ndarray: (n, 3) unnormalized normals, with length equal to twice the area.
+    """
+    # Centring first keeps the sum of cross products precise far from the origin.
+    centred = points - points.mean(axis=1, keepdims=True)
+    return np.cross(centred, np.roll(centred, -1, axis=1)).sum(axis=1)
+
+
+def corner_turns(points: np.ndarray, normals: np.ndarray) -> np.ndarray:
+    """
+    Measure how each polygon corner turns relative to the polygon normal.
+
+    Positive values are convex corners, negative values reflex corners, and
+    values near zero collinear ones.
+
+    Args:
+        points (np.ndarray): (n, k, 3) polygon corner positions.
+        normals (np.ndarray): (n, 3) polygon normals.
+
+    Returns:
+        np.ndarray: (n, k) turn of each corner.
+    """
+    incoming = points - np.roll(points, 1, axis=1)
+    outgoing = np.roll(points, -1, axis=1) - points
+    return np.einsum("nkc,nc->nk", np.cross(incoming, outgoing), normals)
+
+
+def fan(corners: np.ndarray) -> np.ndarray:
+    """
+    Fan triangulate polygons around their first corner.
+
+    Args:
+        corners (np.ndarray): (n, k) vertex indices of the polygons.
+
+    Returns:
+        np.ndarray: (n, k - 2, 3) vertex indices of the triangles.
+    """
+    steps = np.arange(1, corners.shape[1] - 1)
+    return np.stack(
+        [
+            np.repeat(corners[:, :1], len(steps), axis=1),
+            corners[:, steps],
+            corners[:, steps + 1],
+        ],
+        axis=2,
+    )
+
+
+def project_to_plane(points: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Project a planar-ish polygon onto its best fit plane.
+
+    The 2D basis is chosen so that the projected polygon winds counter-clockwise.
+
+    Args:
+        points (np.ndarray): (k, 3) polygon corner positions.
+
+    Returns:
+        Optional[np.ndarray]: (k, 2) projected positions, or None if the polygon
+            has no area.
+    """
+    normal = polygon_normals(points[None])[0]
+    length = np.linalg.norm(normal)
+    if length == 0.0 or not np.isfinite(length):
+        return None
+    normal /= length
+
+    helper = np.eye(3)[np.argmin(np.abs(normal))]
+    u = np.cross(normal, helper)
+    u /= np.linalg.norm(u)
+    v = np.cross(normal, u)
+
+    centred = points - points.mean(axis=0)
+    return np.column_stack([centred @ u, centred @ v])
+
+
+def _cross_2d(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _blocked_ears(
+    a: np.ndarray, b: np.ndarray, c: np.ndarray, reflex: np.ndarray
+) -> np.ndarray:
+    """
+    Find the candidate ears with a reflex vertex inside their triangle.
+
+    Only the reflex vertices within each ear's bounding box are tested, found
+    by binary search on their sorted x coordinates, so the work grows with
+    the vertices near each ear rather than with every candidate-reflex pair.
+
+    Args:
+        a (np.ndarray): (n, 2) previous corner of each candidate ear.
+        b (np.ndarray): (n, 2) the candidate corners.
+        c (np.ndarray): (n, 2) following corner of each candidate ear.
+        reflex (np.ndarray): (r, 2) reflex vertex positions.
+
+    Returns:
+        np.ndarray: (n,) whether each ear is blocked.
+    """
+    low = np.minimum(np.minimum(a, b), c)
+    high = np.maximum(np.maximum(a, b), c)
+    order = np.argsort(reflex[:, 0], kind="stable")
+    xs = reflex[order, 0]
+    first = np.searchsorted(xs, low[:, 0], side="left")
+    counts = np.searchsorted(xs, high[:, 0], side="right") - first
+
+    # One row per ear and reflex vertex sharing its x range.
+    ear = np.repeat(np.arange(len(b)), counts)
+    offsets = np.cumsum(counts) - counts
+    within = np.arange(len(ear)) - np.repeat(offsets, counts)
+    p = reflex[order[np.repeat(first, counts) + within]]
+    a, b, c = a[ear], b[ear], c[ear]
+
+    inside = (
+        (p[:, 1] >= low[ear, 1])
+        & (p[:, 1] <= high[ear, 1])
+        & (_cross_2d(b - a, p - a) >= 0)
+        & (_cross_2d(c - b, p - b) >= 0)
+        & (_cross_2d(a - c, p - c) >= 0)
+    )
+    # A reflex vertex that coincides with the ear's own corners does not
+    # block it; it is either a neighbour or a bridge duplicate.
+    inside &= ~(
+        np.all(p == a, axis=1) | np.all(p == b, axis=1) | np.all(p == c, axis=1)
+    )
+    blocked = np.zeros(len(low), dtype=bool)
+    blocked[ear[inside]] = True
+    return blocked
+
+
+def ear_clip(points: np.ndarray, max_passes: Optional[int] = None) -> np.ndarray:
+    """
+    Triangulate a counter-clockwise 2D polygon by clipping ears.
+
+    Every pass finds all ears at once (convex corners with no reflex vertex
+    inside their triangle) and clips a non-adjacent subset of them, so convex
+    polygons finish in a logarithmic number of passes. Collinear corners are
+    removed without emitting a triangle. If a pass finds no ear, or the pass
+    budget runs out, the remaining ring is fanned.
+
+    Args:
+        points (np.ndarray): (k, 2) polygon corner positions.
+        max_passes (Optional[int]): Pass budget, defaults to the corner count.
+
+    Returns:
+        np.ndarray: (m, 3) corner indices of the triangles, with m <= k - 2.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    ring = np.arange(len(points))
+    extent = np.ptp(points, axis=0).max() if len(points) else 0.0
+    tolerance = 1e-12 * extent * extent
+    max_passes = len(points) if max_passes is None else max_passes
+
+    triangles = []
+    for _ in range(max_passes):
+        if len(ring) <= 3:
+            break
+
+        current = points[ring]
+        previous = np.roll(current, 1, axis=0)
+        following = np.roll(current, -1, axis=0)
+        turns = _cross_2d(current - previous, following - current)
+
+        collinear = np.abs(turns) <= tolerance
+        if collinear.any():
+            ring = ring[~collinear]
+            continue
+
+        candidates = np.flatnonzero(turns > 0)
+        reflex = np.flatnonzero(turns < 0)
+        if reflex.size and candidates.size:
+            blocked = _blocked_ears(
+                previous[candidates],
+                current[candidates],
+                following[candidates],
+                current[reflex],
+            )
+            candidates = candidates[~blocked]
+
+        if not candidates.size:
+            break
+
+        # Clip ears on one parity only so no two clipped ears are adjacent.
+        even = candidates[candidates % 2 == 0]
+        if len(ring) % 2 and even.size and even[0] == 0 and even[-1] == len(ring) - 1:
+            even = even[:-1]
+        odd = candidates[candidates % 2 == 1]
+        ears = even if len(even) >= len(odd) else odd
+
+        size = len(ring)
+        triangles.append(
+            np.column_stack(
+                [ring[(ears - 1) % size], ring[ears], ring[(ears + 1) % size]]
+            )
+        )
+        ring = np.delete(ring, ears)
+
+    if len(ring) >= 3:
+        triangles.append(fan(ring[None])[0])
+
+    if not triangles:
+        return np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(triangles)
+
+
+def triangulate_polygon(points: np.ndarray) -> np.ndarray:
+    """
+    Triangulate a single 3D polygon.
+
+    Args:
+        points (np.ndarray): (k, 3) polygon corner positions.
+
+    Returns:
+        np.ndarray: (m, 3) corner indices of the triangles, with m <= k - 2.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) < 3:
+        return np.zeros((0, 3), dtype=np.int64)
+
+    projected = project_to_plane(points)
+    if projected is None:
+        return fan(np.arange(len(points))[None])[0]
+    return ear_clip(projected)
+
+
+def _triangulate_group(
+    vertices: np.ndarray, corners: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Triangulate polygons sharing one vertex count, see `triangulate_polygons`."""
+    count = corners.shape[1]
+    if count == 3:
+        return corners[:, None, :], np.ones((len(corners), 1), dtype=bool)
+
+    triangles = np.zeros((len(corners), count - 2, 3), dtype=corners.dtype)
+    used = np.zeros((len(corners), count - 2), dtype=bool)
+
+    points = vertices[corners].astype(np.float64)
+    normals = polygon_normals(points)
+    turns = corner_turns(points, normals)
+    edge_lengths = np.linalg.norm(points - np.roll(points, 1, axis=1), axis=2)
+    tolerance = 1e-9 * edge_lengths * np.roll(edge_lengths, -1, axis=1)
+    tolerance *= np.linalg.norm(normals, axis=1)[:, None]
+    convex = (turns >= -tolerance).all(axis=1)
+
+    triangles[convex] = fan(corners[convex])
+    used[convex] = True
+    pending = np.flatnonzero(~convex)
+
+    if count == 4 and pending.size:
+        # A simple concave quad has one reflex corner; fanning from it is valid.
+        reflex = np.argmin(turns[pending], axis=1)
+        rolled = np.take_along_axis(
+            corners[pending], (reflex[:, None] + np.arange(4)) % 4, axis=1
+        )
+        triangles[pending] = fan(rolled)
+        used[pending] = True
+        pending = pending[:0]
+
+    for polygon in pending:
+        local = triangulate_polygon(points[polygon])
+        triangles[polygon, : len(local)] = corners[polygon][local]
+        used[polygon, : len(local)] = True
+
+    return triangles, used
+
+
+def triangulate_polygons(
+    vertices: np.ndarray, faces: np.ndarray, starts: np.ndarray, counts: np.ndarray
+) -> np.ndarray:
+    """
+    Triangulate polygons stored back to back in a flat index array.
+
+    Args:
+        vertices (np.ndarray): (n, 3) vertex positions.
+        faces (np.ndarray): Flat array holding the polygon vertex indices.
+        starts (np.ndarray): Offset of each polygon's first index in `faces`.
+        counts (np.ndarray): Vertex count of each polygon, all at least 3.
+
+    Returns:
+        np.ndarray: (m, 3) vertex indices of the triangles, in polygon order.
+    """
+    # Each polygon owns n - 2 output slots; the cumulative sum gives each one
+    # its place so the original polygon order is preserved.
+    slot_counts = counts - 2
+    offsets = np.cumsum(slot_counts) - slot_counts
+    total = int(slot_counts.sum())
+    triangles = np.empty((total, 3), dtype=np.int64)
+    used = np.zeros(total, dtype=bool)
+
+    for count in np.unique(counts):
+        selected = counts == count
+        corners = faces[starts[selected, None] + np.arange(count)]
+        group_triangles, group_used = _triangulate_group(vertices, corners)
+
+        slots = offsets[selected, None] + np.arange(count - 2)
+        triangles[slots] = group_triangles
+        used[slots] = group_used
+
+    return triangles[used]
@@ -0,0 +1,73 @@
+"""The trimesh exporter backend.
+
+Builds a trimesh scene of every displayable element and lets trimesh write
+the GLB. It depends on trimesh and its optional dependencies, which take a
+large share of a cold start to import, so this module is only imported when
+the backend is selected.
+"""
+
+from typing import Optional
+
+import trimesh
+from specklepy.objects import Base
+from specklepy.objects.other import Transform
+from trimesh.exchange.export import export_scene
+
+from src.gltf.element import speckle_to_element
+from src.inputs import FunctionInputs
+from src.utils.checks import ElementCheckRules
+from src.utils.flatten import extract_base_and_transform
+from src.utils.store import prep_temp_file
+
+
+def create_gltf_from_trimesh(
+    speckle_data: Base, model_name: str, function_inputs: FunctionInputs
+):
+
+    reference_objects: tuple[
+        Base,
+        str,
+        Optional[Transform],
+    ] = extract_base_and_transform(speckle_data)
+
+    element_rules = ElementCheckRules()
+
+    visible_objects_rule = element_rules.rule_combiner(
+        element_rules.is_displayable_rule(),
+    )
+
+    reference_displayable_objects = [
+        (base_obj, speckle_id, transform)
+        for base_obj, speckle_id, transform in reference_objects
+        if visible_objects_rule(base_obj)
+    ]
+
+    reference_elements = [
+        speckle_to_element(obj) for obj in reference_displayable_objects
+    ]
+
+    if not reference_elements:
+        return None
+
+    # Create a Trimesh scene
+    scene = trimesh.Scene()
+
+    for element in reference_elements:
+        for mesh in element.meshes:
+            # Add each mesh to the scene
+            scene.add_geometry(
+                mesh,
+                node_name=element.id,  # Use the element's ID as the node name
+                metadata=(
+                    {"speckle_id": element.id}
+                    if function_inputs.include_metadata
+                    else None
+                ),
+            )
+
+    temp_file = prep_temp_file(model_name, ".glb")
+
+    # Export the scene
+    export_scene(scene, file_obj=temp_file, file_type="glb")
+
+    return str(temp_file)
@@ -0,0 +1,123 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def _first_use_order(first: np.ndarray, inverse: np.ndarray) -> np.ndarray:
+    """Renumber `np.unique` groups by where they first occur, to keep locality."""
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.ravel()]
+
+
+def compact_vertices(
+    vertices: np.ndarray, faces: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Drop vertices no face uses, numbering the rest in order of first use."""
+    used, first, inverse = np.unique(faces, return_index=True, return_inverse=True)
+    faces = _first_use_order(first, inverse).reshape(-1, 3)
+    return vertices[used[np.argsort(first, kind="stable")]], faces
+
+
+def weld_vertices(
+    vertices: np.ndarray, faces: np.ndarray, tolerance: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge vertices closer than `tolerance` and drop the ones no face uses.
+
+    Positions are snapped to a grid of `tolerance` sized cells and vertices
+    sharing a cell become one, keeping the first vertex's exact position. Two
+    points closer than `tolerance` but on either side of a cell boundary are
+    kept apart; that is the price of a single vectorized `np.unique`.
+
+    Args:
+        vertices (np.ndarray): (n, 3) positions.
+        faces (np.ndarray): (m, 3) triangle indices into `vertices`.
+        tolerance (float): Cell size in the units of `vertices`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The welded positions and remapped faces.
+    """
+    vertices, faces = compact_vertices(vertices, faces)
+
+    keys = np.floor(vertices / tolerance).astype(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    remap = _first_use_order(first, inverse)
+    return vertices[np.sort(first)], remap[faces]
+
+
+def remove_degenerate_faces(faces: np.ndarray) -> np.ndarray:
+    """
+    Drop triangles that repeat a vertex or repeat an earlier triangle.
+
+    A triangle counts as a repeat when it has the same vertices in the same
+    winding, so back-to-back faces of two-sided geometry are kept.
+
+    Args:
+        faces (np.ndarray): (m, 3) triangle indices.
+
+    Returns:
+        np.ndarray: The remaining triangles in their original order.
+    """
+    a, b, c = faces.T
+    faces = faces[(a != b) & (b != c) & (c != a)]
+    if len(faces) == 0:
+        return faces
+
+    # Rotate each triangle so its smallest index comes first.
+    shift = np.argmin(faces, axis=1)
+    columns = (shift[:, None] + np.arange(3)) % 3
+    canonical = np.take_along_axis(faces, columns, axis=1)
+    _, first = np.unique(canonical, axis=0, return_index=True)
+    return faces[np.sort(first)]
+
+
+def clean_mesh(
+    vertices: np.ndarray, faces: np.ndarray, tolerance: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weld, compact and deduplicate a decoded mesh before it is written.
+
+    Args:
+        vertices (np.ndarray): (n, 3) float32 positions.
+        faces (np.ndarray): (m, 3) uint32 triangle indices.
+        tolerance (float): Weld distance in the units of `vertices`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (k, 3) float32 positions and the
+            (l, 3) uint32 faces, every vertex referenced by at least one face.
+    """
+    if len(faces) == 0:
+        return vertices[:0], faces
+
+    vertices, faces = weld_vertices(vertices, faces, tolerance)
+    faces = remove_degenerate_faces(faces)
+
+    # Welding can leave vertices whose every triangle collapsed.
+    vertices, faces = compact_vertices(vertices, faces)
+    return vertices, faces.astype(np.uint32)
+
+
+class CleanupStats:
+    """Count the vertices and triangles removed by `clean_mesh` during an export."""
+
+    def __init__(self):
+        self.vertices_before = 0
+        self.vertices_after = 0
+        self.faces_before = 0
+        self.faces_after = 0
+
+    def add(self, before: Tuple[int, int], after: Tuple[int, int]) -> None:
+        """Record one mesh's (vertex count, face count) before and after cleanup."""
+        self.vertices_before += before[0]
+        self.faces_before += before[1]
+        self.vertices_after += after[0]
+        self.faces_after += after[1]
+
+    def summary(self) -> str:
+        """Describe how much geometry the cleanup removed."""
+        return (
+            f"Mesh cleanup: {self.vertices_before} -> {self.vertices_after} vertices, "
+            f"{self.faces_before} -> {self.faces_after} triangles"
+        )
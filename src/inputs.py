@@ -10,6 +10,24 @@ from speckle_automate import AutomateBase
 class ExportFormat(Enum):
     GLTF = "gltf"
     GLB = "glb"
+    TILES = "3dtiles"
+
+
+class ExportBackend(Enum):
+    DIRECT = "direct"
+    INSTANCED = "instanced"
+    MERGED = "merged"
+    TRIMESH = "trimesh"
+
+
+class UploadCompression(Enum):
+    NONE = "none"
+    GZIP = "gzip"
+
+
+class MetadataFormat(Enum):
+    EXTRAS = "extras"
+    STRUCTURAL = "structural"
 
 
 class FunctionInputs(AutomateBase):
@@ -18,13 +36,176 @@ class FunctionInputs(AutomateBase):
     export_format: ExportFormat = Field(
         default=ExportFormat.GLTF,
         title="Export Format",
-        description="The format of the exported file: 'gltf' or 'glb'",
+        description=(
+            "The format of the exported file: 'gltf', 'glb', or '3dtiles' for a"
+            " zipped 3D Tiles tileset of GLB tiles"
+        ),
+    )
+    export_backend: ExportBackend = Field(
+        default=ExportBackend.DIRECT,
+        title="Export Backend",
+        description=(
+            "How the glTF is built: 'direct' with one node per object, 'instanced'"
+            " keeping Speckle instances, 'merged' into one primitive per material,"
+            " or 'trimesh'. Ignored by the '3dtiles' format"
+        ),
     )
     include_metadata: bool = Field(
         default=False,
         title="Include Metadata",
         description="Whether to include Speckle metadata in the export",
     )
+    metadata_format: MetadataFormat = Field(
+        default=MetadataFormat.EXTRAS,
+        title="Metadata Format",
+        description=(
+            "How metadata is stored: 'extras' as JSON on every node, or 'structural'"
+            " as binary EXT_structural_metadata property tables"
+        ),
+    )
+    quantize_geometry: bool = Field(
+        default=False,
+        title="Quantize Geometry",
+        description=(
+            "Store positions as 16-bit integers and indices in the narrowest type"
+            " (KHR_mesh_quantization), roughly halving the geometry size"
+        ),
+    )
+    quantization_precision: float = Field(
+        default=1.0,
+        gt=0,
+        title="Quantization Precision (mm)",
+        description=(
+            "The largest position error quantization may introduce, in millimetres."
+            " Meshes too large to meet it keep full precision"
+        ),
+    )
+    meshopt_compression: bool = Field(
+        default=False,
+        title="Meshopt Compression",
+        description=(
+            "Compress vertex and index data with EXT_meshopt_compression."
+            " Viewers need a meshopt decoder to open the result"
+        ),
+    )
+    tile_max_elements: int = Field(
+        default=256,
+        ge=1,
+        title="Objects per Tile",
+        description=(
+            "With the '3dtiles' format, tiles holding more objects than this are"
+            " split into octants"
+        ),
+    )
+    lod_levels: int = Field(
+        default=0,
+        ge=0,
+        le=3,
+        title="Levels of Detail",
+        description=(
+            "Simplified versions of every mesh to add as MSFT_lod alternates, each"
+            " with about a quarter of the triangles of the one before; 0 adds none"
+        ),
+    )
+    lod_min_size: float = Field(
+        default=0.5,
+        ge=0,
+        title="Level of Detail Minimum Size (m)",
+        description=(
+            "Meshes smaller than this are shown as their bounding box at the first"
+            " simplified level and left out of the coarser ones"
+        ),
+    )
+    generate_normals: bool = Field(
+        default=False,
+        title="Generate Normals",
+        description=(
+            "Add smooth vertex normals, keeping edges sharper than the crease angle"
+            " hard. Without them viewers shade every triangle flat"
+        ),
+    )
+    crease_angle: float = Field(
+        default=30.0,
+        ge=0,
+        le=180,
+        title="Crease Angle (degrees)",
+        description=(
+            "Faces meeting at a larger angle are shaded separately, e.g. the sides"
+            " of a box; 180 smooths everything"
+        ),
+    )
+    compact_normals: bool = Field(
+        default=False,
+        title="Compact Normals",
+        description=(
+            "Store normals as 8-bit integers instead of floats, with octahedral"
+            " encoding when meshopt compression is enabled"
+        ),
+    )
+    lazy_receive: bool = Field(
+        default=False,
+        title="Lazy Receive",
+        description=(
+            "Store the version on disk and deserialize objects one at a time while"
+            " exporting, instead of loading the whole model into memory first"
+        ),
+    )
+    trace_memory: bool = Field(
+        default=False,
+        title="Trace Memory",
+        description=(
+            "Record how much memory each phase of the export allocates in the run"
+            " report. Slows the export down noticeably"
+        ),
+    )
+    conversion_workers: int = Field(
+        default=1,
+        ge=0,
+        title="Conversion Workers",
+        description=(
+            "Processes used to decode and triangulate meshes; 0 uses every core."
+            " The output is identical to a single-process export"
+        ),
+    )
+    conversion_cache_size: int = Field(
+        default=0,
+        ge=0,
+        title="Conversion Cache Size (MB)",
+        description=(
+            "Keep up to this many megabytes of converted meshes on disk, keyed by"
+            " Speckle id, and reuse them in later runs; 0 disables the cache. Only"
+            " helps on self-hosted runners keeping SPECKLE_GLTF_CACHE_DIR on"
+            " persistent storage; hosted runs start with an empty cache"
+        ),
+    )
+    incremental_export: bool = Field(
+        default=False,
+        title="Incremental Export",
+        description=(
+            "Keep the GLB export and, when the model is exported again, copy the"
+            " geometry of unchanged objects from it instead of converting it. Only"
+            " helps on self-hosted runners keeping SPECKLE_GLTF_CACHE_DIR on"
+            " persistent storage; hosted runs start without the previous export"
+        ),
+    )
+
+    upload_compression: UploadCompression = Field(
+        default=UploadCompression.NONE,
+        title="Upload Compression",
+        description=(
+            "Compress the uploaded results with 'gzip'; the stored files get a"
+            " '.gz' suffix"
+        ),
+    )
+    upload_retries: int = Field(
+        default=4,
+        ge=0,
+        title="Upload Retries",
+        description=(
+            "How often an upload that failed with a connection error or a busy"
+            " server is retried, waiting longer after every attempt"
+        ),
+    )
 
 
 def test_generate_schema(path_given="schema.json"):
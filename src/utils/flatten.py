@@ -1,7 +1,7 @@
 """Helper module for a simple speckle object tree flattening."""
 
 from collections.abc import Iterable
-from typing import Optional, List, Tuple
+from typing import Iterator, Optional, List, Tuple
 
 from specklepy.objects import Base
 from specklepy.objects.other import Instance, Transform
@@ -29,25 +29,28 @@ def flatten_base(base: Base) -> Iterable[Base]:
     yield base
 
 
-def flatten_base_thorough(base: Base, parent_type: str = None) -> Iterable[Base]:
-    """Take a base and flatten it to an iterable of bases.
+def traverse_base(
+    base: Base, parent_type: Optional[str] = None
+) -> Iterator[Tuple[Base, Optional[str]]]:
+    """Lazily walk a base and its children without modifying them.
+
+    Children are yielded before their parent, in the same order as
+    `flatten_base_thorough`, so an exporter can consume the tree one object
+    at a time without ever holding the flattened list.
 
     Args:
-        base: The base object to flatten.
+        base: The base object to walk.
         parent_type: The type of the parent object, if any.
 
     Yields:
-        Base: A flattened base object.
+        Tuple[Base, Optional[str]]: Each object and the speckle_type of its parent.
     """
-    if isinstance(base, Base):
-        base["parent_type"] = parent_type
-
     elements = getattr(base, "elements", getattr(base, "@elements", None))
     if elements:
         try:
             for element in elements:
                 # Recursively yield flattened elements of the child
-                yield from flatten_base_thorough(element, base.speckle_type)
+                yield from traverse_base(element, base.speckle_type)
         except KeyError:
             pass
     elif hasattr(base, "@Lines"):
@@ -59,14 +62,33 @@ def flatten_base_thorough(base: Base, parent_type: str = None) -> Iterable[Base]
                 print(category)
                 if category.startswith("@"):
                     category_object: Base = getattr(base, category)[0]
-                    yield from flatten_base_thorough(
+                    yield from traverse_base(
                         category_object, category_object.speckle_type
                     )
 
         except KeyError:
             pass
 
-    yield base
+    yield base, parent_type
+
+
+def flatten_base_thorough(base: Base, parent_type: str = None) -> Iterable[Base]:
+    """Take a base and flatten it to an iterable of bases.
+
+    Each base gets a `parent_type` member recording the type of its parent.
+    Use `traverse_base` to walk the tree without modifying it.
+
+    Args:
+        base: The base object to flatten.
+        parent_type: The type of the parent object, if any.
+
+    Yields:
+        Base: A flattened base object.
+    """
+    for obj, obj_parent_type in traverse_base(base, parent_type):
+        if isinstance(obj, Base):
+            obj["parent_type"] = obj_parent_type
+        yield obj
 
 
 def extract_base_and_transform(
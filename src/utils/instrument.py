@@ -0,0 +1,220 @@
+"""Stage timers and memory figures for an export run.
+
+Code marks its phases with `with active().stage("conversion"):`. While an
+`Instrumentation` is activated, e.g. for the duration of `automate_function`,
+every stage accumulates wall time, CPU time, item counts and the peak memory
+seen while it ran; otherwise the calls do nothing. A stage entered many times,
+such as the conversion of each mesh, is reported as one total.
+
+Peak resident memory is read from the OS and is always recorded. Peak traced
+memory, which attributes Python allocations to the stage that made them, needs
+tracemalloc and is only recorded when `trace_memory` is enabled because tracing
+slows the export down considerably.
+
+The report also records how long the process had been running when the
+instrumentation was created. Created at the start of a run, that is the cold
+start: the container and interpreter start-up and the module imports.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+def peak_rss_bytes() -> int:
+    """Return the peak resident memory of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def process_age_s() -> Optional[float]:
+    """
+    Return the time since this process started, or None where it is unknown.
+
+    Reads the start time from /proc, so it is only available on Linux.
+    """
+    try:
+        with open("/proc/self/stat") as stat:
+            # The command name may contain spaces; fields resume after its ")".
+            fields = stat.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime:
+            uptime_s = float(uptime.read().split()[0])
+        # starttime, the 22nd field, counts clock ticks since boot.
+        started_s = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+    return max(uptime_s - started_s, 0.0)
+
+
+class StageRecord:
+    """Totals for one named stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.items = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_bytes = 0
+        self.peak_traced_bytes: Optional[int] = None
+
+    def add_items(self, count: int = 1) -> None:
+        """Count items handled by the stage, e.g. meshes converted."""
+        self.items += count
+
+    def to_dict(self) -> Dict:
+        record = {
+            "calls": self.calls,
+            "items": self.items,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+        if self.peak_traced_bytes is not None:
+            record["peak_traced_bytes"] = self.peak_traced_bytes
+        return record
+
+
+class Instrumentation:
+    """
+    Record the cost of each stage of an export.
+
+    Nested stages are timed independently, so an outer stage's time includes
+    the time of the stages inside it.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        """
+        Args:
+            trace_memory (bool): Also record peak traced memory with tracemalloc.
+        """
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, StageRecord] = {}
+        # Peak traced memory of the stages currently running, innermost last.
+        self._open: List[List] = []
+        self._started = time.perf_counter()
+        self.startup_s = process_age_s()
+
+    @contextmanager
+    def activate(self) -> Iterator["Instrumentation"]:
+        """Make this the instrumentation `active()` returns, tracing if enabled."""
+        token = _active.set(self)
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            yield self
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            _active.reset(token)
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[StageRecord]:
+        """
+        Measure a block of code as (part of) the stage `name`.
+
+        Args:
+            name (str): The stage.
+            items (int): Items the block handles; more can be added through
+                `add_items` on the yielded record.
+        """
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages[name] = StageRecord()
+        record.calls += 1
+        record.items += items
+
+        tracing = tracemalloc.is_tracing()
+        frame = [record, 0]
+        if tracing:
+            self._fold_traced_peak()
+            tracemalloc.reset_peak()
+            self._open.append(frame)
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_s += time.perf_counter() - wall
+            record.cpu_s += time.process_time() - cpu
+            record.peak_rss_bytes = max(record.peak_rss_bytes, peak_rss_bytes())
+            if tracing and tracemalloc.is_tracing():
+                self._fold_traced_peak()
+                self._open.remove(frame)
+                record.peak_traced_bytes = max(record.peak_traced_bytes or 0, frame[1])
+
+    def _fold_traced_peak(self) -> None:
+        """Credit the traced peak since the last reset to every open stage."""
+        _, peak = tracemalloc.get_traced_memory()
+        for frame in self._open:
+            frame[1] = max(frame[1], peak)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Yield from `iterable`, measuring the time spent producing each item."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as record:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                record.add_items()
+            yield item
+
+    def report(self) -> Dict:
+        """Return the stage totals as a JSON-serializable dictionary."""
+        return {
+            "wall_s": round(time.perf_counter() - self._started, 6),
+            "startup_s": None if self.startup_s is None else round(self.startup_s, 3),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": {name: record.to_dict() for name, record in self.stages.items()},
+        }
+
+    def write(self, path: Path) -> Path:
+        """Write the report as JSON and return its path."""
+        path = Path(path)
+        path.write_text(json.dumps(self.report(), indent=2))
+        return path
+
+    def summary(self, top: int = 3) -> str:
+        """Describe the run in one line: total time, slowest stages, peak memory."""
+        report = self.report()
+        slowest = sorted(
+            report["stages"].items(), key=lambda item: item[1]["wall_s"], reverse=True
+        )[:top]
+        stages = ", ".join(f"{name} {stage['wall_s']:.1f}s" for name, stage in slowest)
+        startup = (
+            "" if self.startup_s is None else f" after a {self.startup_s:.1f}s start-up"
+        )
+        return (
+            f"{report['wall_s']:.1f}s ({stages}){startup},"
+            f" peak memory {report['peak_rss_bytes'] / 2**20:.0f} MB"
+        )
+
+
+class _Inactive(Instrumentation):
+    """Stands in when no instrumentation is active; records nothing."""
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[StageRecord]:
+        yield StageRecord()
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterable:
+        return iterable
+
+
+_INACTIVE = _Inactive()
+_active: ContextVar[Instrumentation] = ContextVar("instrumentation", default=_INACTIVE)
+
+
+def active() -> Instrumentation:
+    """Return the instrumentation of the current run, or one that records nothing."""
+    return _active.get()
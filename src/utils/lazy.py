@@ -0,0 +1,117 @@
+"""Lazily receive a Speckle version, deserializing one object at a time."""
+
+import json
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from speckle_automate import AutomationContext
+from specklepy.objects import Base
+from specklepy.serialization.base_object_serializer import BaseObjectSerializer
+from specklepy.transports.abstract_transport import AbstractTransport
+from specklepy.transports.server import ServerTransport
+
+
+def copy_version_to_transport(
+    automate_context: AutomationContext, transport: AbstractTransport
+) -> str:
+    """Copy the triggering version's objects into a transport without deserializing them.
+
+    Unlike `AutomationContext.receive_version` this only stores the serialized
+    objects, e.g. in a SQLite transport on disk, so nothing is held in RAM.
+
+    Args:
+        automate_context: The automation context of the run.
+        transport: Where the serialized objects are stored.
+
+    Returns:
+        str: The id of the version's root object.
+    """
+    run_data = automate_context.automation_run_data
+    version_id = run_data.triggers[0].payload.version_id
+    commit = automate_context.speckle_client.commit.get(run_data.project_id, version_id)
+    if not commit or not commit.referencedObject:
+        raise ValueError(
+            f"Could not receive version {version_id} of project {run_data.project_id}"
+        )
+
+    server_transport = ServerTransport(
+        run_data.project_id, automate_context.speckle_client
+    )
+    server_transport.copy_object_and_children(commit.referencedObject, transport)
+    return commit.referencedObject
+
+
+class LazyVersion:
+    """
+    A Speckle version stored in a transport, deserialized on demand.
+
+    `traverse` walks the object tree on the raw JSON and only turns an object
+    into a `Base` when it is emitted, resolving its detached members and data
+    chunks at that point. Once the consumer moves on nothing keeps the object
+    alive, so memory is bounded by the largest object rather than the model.
+    """
+
+    def __init__(self, transport: AbstractTransport, object_id: str):
+        """
+        Args:
+            transport: The transport holding the serialized objects.
+            object_id: The id of the root object.
+        """
+        self.transport = transport
+        self.object_id = object_id
+
+    def load(self, object_id: str) -> Optional[Dict[str, Any]]:
+        """Read the raw JSON of an object from the transport."""
+        serialized = self.transport.get_object(object_id)
+        return json.loads(serialized) if serialized else None
+
+    def _resolve(self, value: Any) -> Optional[Dict[str, Any]]:
+        """Follow a detached reference, returning the raw JSON of a child object."""
+        if isinstance(value, dict) and value.get("speckle_type") == "reference":
+            return self.load(value["referencedId"])
+        if isinstance(value, dict) and "speckle_type" in value:
+            return value
+        return None
+
+    def recompose(self, raw: Dict[str, Any]) -> Base:
+        """Deserialize one object, resolving its detached members from the transport."""
+        # A new serializer per object, so its id cache never spans the model.
+        serializer = BaseObjectSerializer(read_transport=self.transport)
+        return serializer.recompose_base(obj=raw)
+
+    def traverse(self) -> Iterator[Tuple[Base, Optional[str]]]:
+        """Walk the version like `traverse_base`, deserializing objects lazily.
+
+        Children are yielded before their parent, and a parent is yielded
+        without the members its children were traversed through.
+
+        Yields:
+            Tuple[Base, Optional[str]]: Each object and the speckle_type of its parent.
+        """
+        root = self.load(self.object_id)
+        if root is not None:
+            yield from self._traverse(root, None)
+
+    def _traverse(
+        self, raw: Dict[str, Any], parent_type: Optional[str]
+    ) -> Iterator[Tuple[Base, Optional[str]]]:
+        speckle_type = raw.get("speckle_type")
+        elements_key = "elements" if "elements" in raw else "@elements"
+        elements = raw.get(elements_key)
+
+        if elements:
+            raw.pop(elements_key)
+            for index, element in enumerate(elements):
+                # Release inline children as soon as they have been emitted.
+                elements[index] = None
+                child = self._resolve(element)
+                if child is not None:
+                    yield from self._traverse(child, speckle_type)
+        elif "@Lines" in raw:
+            # could be old revit
+            for category in [name for name in raw if name.startswith("@")]:
+                values = raw.pop(category)
+                child = self._resolve(values[0]) if isinstance(values, list) else None
+                if child is not None:
+                    yield from self._traverse(child, child.get("speckle_type"))
+
+        yield self.recompose(raw), parent_type
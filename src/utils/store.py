@@ -1,15 +1,17 @@
 import base64
+import mmap
+import os
+import shutil
+import struct
 import tempfile
+import zipfile
 from datetime import datetime
 from pathlib import Path
 import io
-from typing import IO
+from typing import Callable, IO, List, Optional, Union
 
-import httpx
 from pygltflib import GLTF2
 
-from speckle_automate import AutomationContext
-
 from src.inputs import ExportFormat
 
 
@@ -23,11 +25,294 @@ def prep_temp_file(model_name: str, file_extension: str) -> Path:
     return temp_file
 
 
+# Names a directory that outlives the container, e.g. a volume mounted on a
+# self-hosted runner, to keep data for later runs in. Hosted Automate starts
+# every run in a fresh container, so the default temporary directory is empty.
+CACHE_DIR_ENV = "SPECKLE_GLTF_CACHE_DIR"
+
+
+def cache_directory() -> Path:
+    """Return where data reused by later runs, e.g. the conversion cache, is kept."""
+    configured = os.environ.get(CACHE_DIR_ENV)
+    if configured:
+        return Path(configured)
+    return Path(tempfile.gettempdir(), "speckle-gltf-cache")
+
+
+def incremental_export_path(project_id: str, model_name: str) -> Path:
+    """Return where the latest incremental GLB export of a model is kept."""
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in model_name)
+    return cache_directory() / "exports" / f"{project_id}_{safe_name}.glb"
+
+
+def keep_incremental_export(file_name: str, path: Path) -> None:
+    """Copy a finished GLB export to where the next incremental export reads it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(file_name, path)
+
+
+def archive_directory(directory: Path) -> Path:
+    """Zip a directory, e.g. a 3D Tiles tileset, into one file to store as a result."""
+    directory = Path(directory)
+    return Path(shutil.make_archive(str(directory), "zip", root_dir=directory))
+
+
+def archive_files(path: Path, others: List[Path]) -> Path:
+    """Zip a file and the files it references, e.g. a GLB and its `.bin` buffers."""
+    archive = path.with_suffix(".zip")
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for file in [path, *others]:
+            zip_file.write(file, file.name)
+    return archive
+
+
+GLB_MAGIC = b"glTF"
+GLB_VERSION = 2
+GLB_CHUNK_JSON = b"JSON"
+GLB_CHUNK_BIN = b"BIN\x00"
+COPY_CHUNK_SIZE = 1 << 20
+# Initial size of the memory-mapped `.bin` of a .gltf export.
+MIN_MAP_SIZE = 1 << 20
+
+
+class BinWriter:
+    """Write an external glTF buffer straight to a `.bin` file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "wb")
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def extend(self, data) -> None:
+        """Append bytes, or any C-contiguous buffer such as a NumPy array."""
+        view = memoryview(data).cast("B")
+        self._file.write(view)
+        self._length += view.nbytes
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class GlbWriter:
+    """
+    Write a GLB file without keeping the binary chunk in memory.
+
+    Geometry is appended with `extend` as primitives are produced and goes
+    straight to a spool file next to the target. `finalize` then writes the
+    12-byte header, the JSON chunk and the BIN chunk, streaming the spooled
+    bytes across and backpatching the total length. Peak memory is the size of
+    the largest array appended plus the JSON document.
+
+    The writer supports `len()` and `extend()`, so it can be passed wherever
+    the exporter expects the `buffer_data` bytearray. Geometry past the size
+    of one buffer goes to external `.bin` files next to the GLB, listed in
+    `external_buffers`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._spool = tempfile.TemporaryFile(dir=self.path.parent)
+        self._length = 0
+        self.external_buffers: List[Path] = []
+
+    def __len__(self) -> int:
+        return self._length
+
+    def extend(self, data) -> None:
+        """Append bytes, or any C-contiguous buffer such as a NumPy array."""
+        view = memoryview(data).cast("B")
+        self._spool.write(view)
+        self._length += view.nbytes
+
+    def external_buffer(self, index: int) -> BinWriter:
+        """Open the external file holding the document's buffer `index`."""
+        writer = BinWriter(self.path.with_name(f"{self.path.stem}_{index}.bin"))
+        self.external_buffers.append(writer.path)
+        return writer
+
+    def rewrite(self, rewriter: Callable[[Callable[[int, int], bytes]], None]) -> None:
+        """
+        Replace the spooled data, e.g. with a compressed encoding of it.
+
+        The writer is emptied and `rewriter` is called with a function reading
+        (offset, length) from the previous data; it appends the new data to
+        this writer with `extend`.
+        """
+        source = self._spool
+        self._spool = tempfile.TemporaryFile(dir=self.path.parent)
+        self._length = 0
+
+        def read(offset: int, length: int) -> bytes:
+            source.seek(offset)
+            return source.read(length)
+
+        try:
+            rewriter(read)
+        finally:
+            source.close()
+
+    def finalize(self, gltf: GLTF2) -> Path:
+        """
+        Write the GLB file and release the spool.
+
+        Args:
+            gltf (GLTF2): The document; its first buffer describes the spooled data.
+
+        Returns:
+            Path: The path of the written GLB file.
+        """
+        # The BIN chunk must be padded with zeros to a 4-byte boundary.
+        bin_padding = -self._length % 4
+        self._spool.write(b"\x00" * bin_padding)
+        bin_length = self._length + bin_padding
+
+        buffer = gltf.buffers[0]
+        buffer.uri = None
+        buffer.byteLength = self._length
+        json_blob = gltf.gltf_to_json(separators=(",", ":"), indent=None).encode(
+            "utf-8"
+        )
+        # The JSON chunk is padded with spaces so the BIN chunk stays aligned.
+        json_blob += b" " * (-len(json_blob) % 4)
+
+        with open(self.path, "wb") as glb:
+            glb.write(struct.pack("<4sII", GLB_MAGIC, GLB_VERSION, 0))
+            glb.write(struct.pack("<I4s", len(json_blob), GLB_CHUNK_JSON))
+            glb.write(json_blob)
+            glb.write(struct.pack("<I4s", bin_length, GLB_CHUNK_BIN))
+
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, glb, COPY_CHUNK_SIZE)
+
+            total_length = glb.tell()
+            glb.seek(8)
+            glb.write(struct.pack("<I", total_length))
+
+        self._spool.close()
+        return self.path
+
+
+class GltfWriter:
+    """
+    Write a .gltf file with its geometry in a memory-mapped `.bin` beside it.
+
+    Base64 data URIs make the JSON a third larger than the geometry and slow
+    to write and parse, so geometry is copied straight into a mapping of the
+    `.bin` file as primitives are produced. The file grows by doubling, or by
+    whatever `reserve` asks for ahead of a primitive. `finalize` truncates the
+    file to its length and writes the JSON referencing it.
+
+    Like `GlbWriter`, the writer supports `len()`, `extend()` and `rewrite()`
+    and can be passed as `buffer_data`. Geometry past the size of one buffer
+    goes to further `.bin` files in the same directory.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.bin_path = self.path.with_suffix(".bin")
+        self._file = open(self.bin_path, "w+b")
+        self._map: Optional[mmap.mmap] = None
+        self._length = 0
+        self.external_buffers: List[Path] = []
+
+    def __len__(self) -> int:
+        return self._length
+
+    def reserve(self, nbytes: int) -> None:
+        """Grow the file and its mapping to fit `nbytes` more bytes."""
+        capacity = len(self._map) if self._map is not None else 0
+        needed = self._length + nbytes
+        if needed > capacity:
+            if self._map is not None:
+                self._map.close()
+            capacity = max(needed, 2 * capacity, MIN_MAP_SIZE)
+            self._file.truncate(capacity)
+            self._map = mmap.mmap(self._file.fileno(), capacity)
+
+    def extend(self, data) -> None:
+        """Append bytes, or any C-contiguous buffer such as a NumPy array."""
+        view = memoryview(data).cast("B")
+        self.reserve(view.nbytes)
+        self._map[self._length : self._length + view.nbytes] = view
+        self._length += view.nbytes
+
+    def external_buffer(self, index: int) -> BinWriter:
+        """Open the external file holding the document's buffer `index`."""
+        writer = BinWriter(self.path.with_name(f"{self.path.stem}_{index}.bin"))
+        self.external_buffers.append(writer.path)
+        return writer
+
+    def _close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.truncate(self._length)
+        self._file.close()
+
+    def rewrite(self, rewriter: Callable[[Callable[[int, int], bytes]], None]) -> None:
+        """Replace the written data, as `GlbWriter.rewrite` does."""
+        source_path = self.bin_path.with_suffix(".bin.old")
+        self._close()
+        self.bin_path.replace(source_path)
+        self._file = open(self.bin_path, "w+b")
+        self._length = 0
+
+        with open(source_path, "rb") as source:
+
+            def read(offset: int, length: int) -> bytes:
+                source.seek(offset)
+                return source.read(length)
+
+            rewriter(read)
+        source_path.unlink()
+
+    def finalize(self, gltf: GLTF2) -> Path:
+        """
+        Write the .gltf file and close the `.bin`.
+
+        Args:
+            gltf (GLTF2): The document; its first buffer describes the mapped data.
+
+        Returns:
+            Path: The path of the written .gltf file.
+        """
+        self._close()
+        buffer = gltf.buffers[0]
+        buffer.uri = self.bin_path.name
+        buffer.byteLength = self._length
+        self.path.write_text(
+            gltf.gltf_to_json(separators=(",", ":"), indent=None), encoding="utf-8"
+        )
+        return self.path
+
+
+def gltf_writer(model_name: str) -> GltfWriter:
+    """Start a .gltf export in its own directory, to be archived with its `.bin`."""
+    path = prep_temp_file(model_name, ".gltf")
+    directory = path.with_suffix("")
+    directory.mkdir(parents=True, exist_ok=True)
+    return GltfWriter(directory / path.name)
+
+
 def write_gltf_to_tmp(
-    gltf_content: GLTF2, model_name: str, export_format: ExportFormat
+    gltf_content: GLTF2,
+    model_name: str,
+    export_format: ExportFormat,
+    writer: Optional[Union[GlbWriter, GltfWriter]] = None,
 ) -> str:
 
-    if export_format == ExportFormat.GLB:
+    if isinstance(writer, GltfWriter):
+        # The .gltf and its .bin files are uploaded as one zip archive.
+        writer.finalize(gltf_content)
+        temp_file = archive_directory(writer.path.parent)
+
+    elif writer is not None:
+        temp_file = writer.finalize(gltf_content)
+
+    elif export_format == ExportFormat.GLB:
         temp_file = prep_temp_file(model_name, ".glb")
         gltf_content.save_binary(temp_file)
 
@@ -36,29 +321,3 @@ def write_gltf_to_tmp(
         gltf_content.save(temp_file)
 
     return str(temp_file)
-
-
-def safe_store_file_result(automate_context: AutomationContext, file_name: str):
-    # Store the original URL
-    original_url = automate_context.automation_run_data.speckle_server_url
-
-    try:
-        # Modify the URL property of the automation_run_data
-        automate_context.automation_run_data.speckle_server_url = (
-            f"{original_url.rstrip('/')}/"
-        )
-
-        # Attempt to store the file
-        automate_context.store_file_result(file_name)
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code != 404:
-            raise
-
-        else:
-            # Handle the 404 error
-            error_message = f"Unable to store file: {file_name}. Error: {str(e)}"
-            print(error_message)  # For logging purposes
-            # automate_context.mark_run_exception(error_message)
-    finally:
-        # Restore the original URL
-        automate_context.automation_run_data.speckle_server_url = original_url
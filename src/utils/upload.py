@@ -0,0 +1,156 @@
+"""Upload export results to the project's blob storage in the background.
+
+Files are handed to a small pool of threads, each storing one file at a time
+through `AutomationContext.store_file_result`, which streams the file from
+disk and attaches the stored blob to the run. Results therefore upload while
+the function carries on, e.g. writing the run report, and several at once.
+
+The file can be gzip-compressed first, streamed into a `.gz` copy beside it;
+the blob is then stored under that name. Connection errors and transient
+server responses are retried with exponential backoff.
+"""
+
+import gzip
+import random
+import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Tuple, Union
+
+import httpx
+from speckle_automate import AutomationContext
+
+from src.inputs import UploadCompression
+
+COPY_CHUNK_SIZE = 1 << 20
+# Uploads running at once.
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 4
+# Delay before the first retry, doubling with every further attempt.
+BACKOFF_S = 0.5
+MAX_BACKOFF_S = 30.0
+# Responses worth retrying: the server or a proxy in front of it was busy.
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def context_store(automate_context: AutomationContext) -> Callable[[Path], None]:
+    """Return the function storing a file as a result of the automation run."""
+    run_data = automate_context.automation_run_data
+    # `store_file_result` appends the blob endpoint's path to the server URL.
+    run_data.speckle_server_url = f"{run_data.speckle_server_url.rstrip('/')}/"
+    return automate_context.store_file_result
+
+
+def gzip_file(path: Path) -> Path:
+    """Compress a file into a `.gz` copy beside it and return the copy's path."""
+    compressed = path.with_name(f"{path.name}.gz")
+    with open(path, "rb") as source, gzip.open(compressed, "wb") as target:
+        shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+    return compressed
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in TRANSIENT_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+class ResultUploader:
+    """
+    Store files as run results in the background.
+
+    Use as a context manager: leaving it waits for the uploads still running,
+    and, when leaving because of an error, does not let their failures hide it.
+    """
+
+    def __init__(
+        self,
+        store: Callable[[Path], None],
+        compression: UploadCompression = UploadCompression.NONE,
+        retries: int = DEFAULT_RETRIES,
+        workers: int = DEFAULT_WORKERS,
+        backoff_s: float = BACKOFF_S,
+    ):
+        """
+        Args:
+            store (Callable[[Path], None]): Stores one file, e.g. the function
+                `context_store` returns.
+            compression (UploadCompression): How to compress the files.
+            retries (int): Attempts after the first for each file.
+            workers (int): Files uploaded at once.
+            backoff_s (float): Delay before the first retry.
+        """
+        self.store = store
+        self.compression = compression
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="upload")
+        self._pending: List[Tuple[Path, Future]] = []
+
+    def upload(self, path: Union[str, Path]) -> None:
+        """Start uploading a finished file."""
+        path = Path(path)
+        self._pending.append((path, self._executor.submit(self._send, path)))
+
+    def _send(self, path: Path) -> None:
+        if self.compression == UploadCompression.GZIP:
+            path = gzip_file(path)
+        attempt = 0
+        while True:
+            try:
+                self.store(path)
+                return
+            except Exception as error:
+                if attempt == self.retries or not _is_transient(error):
+                    raise
+            # Jitter keeps parallel uploads from retrying in lockstep.
+            delay = min(self.backoff_s * 2**attempt, MAX_BACKOFF_S)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+
+    def wait(self) -> int:
+        """
+        Wait for the uploads started so far.
+
+        A 404 from the blob endpoint, which servers without blob storage
+        return, is reported and otherwise ignored; other failures are raised
+        once every upload has finished.
+
+        Returns:
+            int: The number of files uploaded.
+        """
+        pending, self._pending = self._pending, []
+        error = None
+        for path, future in pending:
+            try:
+                future.result()
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    error = error or e
+                    continue
+                print(f"Unable to store file: {path}. Error: {e}")
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+        return len(pending)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ResultUploader":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.wait()
+            else:
+                # The original error is the one worth reporting.
+                try:
+                    self.wait()
+                except Exception:
+                    pass
+        finally:
+            self.close()
@@ -0,0 +1,45 @@
+"""Unit tests for the exporter backend registry."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from src.gltf.backends import BACKENDS
+from src.gltf.create import create_gltf_merged
+from src.inputs import ExportBackend, FunctionInputs
+from src.utils.instrument import Instrumentation
+from tests.test_create import _model, _quad_mesh
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_every_backend_is_registered_and_loads():
+    assert set(BACKENDS) == set(ExportBackend)
+    for backend in BACKENDS.values():
+        assert callable(backend.load())
+    assert BACKENDS[ExportBackend.MERGED].load() is create_gltf_merged
+    assert FunctionInputs().export_backend == ExportBackend.DIRECT
+
+
+def test_loading_a_backend_is_timed():
+    instrumentation = Instrumentation()
+    with instrumentation.activate():
+        create = BACKENDS[ExportBackend.DIRECT].load()
+        gltf = create(_model([_quad_mesh()]), False, buffer_data=None, options=None)
+
+    assert len(gltf.meshes) == 1
+    assert instrumentation.report()["stages"]["import"]["items"] == 1
+
+
+def test_entry_point_does_not_import_trimesh():
+    script = (
+        "import sys, src.function, src.gltf.create;" " print('trimesh' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,51 @@
+"""Unit tests for the synthetic model generator and the benchmark suite."""
+
+from benchmarks.run import compare, run_suite
+from benchmarks.synthetic import SyntheticModelConfig, generate_model
+from src.gltf.create import create_gltf_from_instances
+from src.gltf.mesh import process_speckle_mesh
+from src.utils.flatten import extract_base_and_transform
+
+SMALL = SyntheticModelConfig(
+    objects=12, vertices_per_mesh=24, materials=3, instance_depth=2, definitions=2
+)
+
+
+def test_generated_model_has_the_configured_shape():
+    model = generate_model(SMALL)
+    assert len(model.elements) == 12
+    assert generate_model(SMALL).elements[0].property_0 == model.elements[0].property_0
+
+    meshes = [
+        mesh
+        for base, _, transforms in extract_base_and_transform(model)
+        for mesh in getattr(base, "displayValue", None) or []
+    ]
+    assert all(len(mesh.vertices) // 3 >= 24 for mesh in meshes)
+    assert {mesh.renderMaterial.name for mesh in meshes} <= {
+        f"Material {index}" for index in range(3)
+    }
+    for mesh in meshes:
+        vertices, faces = process_speckle_mesh(mesh)
+        assert len(faces) and faces.max() < len(vertices)
+
+    gltf = create_gltf_from_instances(model, include_metadata=True)
+    assert len(gltf.nodes) > len(gltf.meshes)
+
+
+def test_suite_compares_against_its_baseline():
+    stages = ["process_speckle_mesh", "metadata.structural", "glb_write"]
+    results = run_suite(SMALL, repeat=1, stages=stages)
+    assert list(results["stages"]) == stages
+    assert all(stage["items"] > 0 for stage in results["stages"].values())
+    assert compare(results, results, tolerance=0.25) == []
+
+    slower = {**results, "stages": dict(results["stages"])}
+    slower["stages"]["glb_write"] = {
+        **results["stages"]["glb_write"],
+        "peak_bytes": results["stages"]["glb_write"]["peak_bytes"] * 2,
+    }
+    assert compare(slower, results, tolerance=0.25) == [
+        f"glb_write: peak_bytes {results['stages']['glb_write']['peak_bytes']:.6g}"
+        f" -> {slower['stages']['glb_write']['peak_bytes']:.6g}"
+    ]
@@ -0,0 +1,82 @@
+"""Unit tests for the bufferView layout and multi-buffer split."""
+
+import numpy as np
+from pygltflib import GLTF2, BufferFormat
+
+from src.gltf.buffer import BufferBuilder, MemoryBuffer
+from src.gltf.create import create_gltf
+from src.gltf.options import ExportOptions
+from src.utils.store import GlbWriter
+from tests.test_create import _model, _read_accessor
+from tests.test_lod import _speckle_sphere
+
+
+def test_memory_buffer_preallocates():
+    buffer = MemoryBuffer()
+    buffer.reserve(1000)
+    storage = buffer._data
+    for _ in range(10):
+        buffer.extend(np.arange(25, dtype=np.float32))
+    assert buffer._data is storage
+    assert len(buffer) == 1000
+    assert np.array_equal(
+        np.frombuffer(buffer.getbuffer(), dtype=np.float32)[25:50], np.arange(25)
+    )
+
+    buffer.rewrite(lambda read: buffer.extend(read(4, 8)))
+    assert bytes(buffer.getbuffer()) == np.float32([1, 2]).tobytes()
+
+
+def test_views_are_aligned():
+    gltf = GLTF2()
+    builder = BufferBuilder(gltf)
+    builder.add_view(b"abc")
+    view = builder.add_view(np.ones((2, 3), dtype=np.float32), target=34962)
+    table = builder.add_view(b"x", alignment=8)
+    builder.finish()
+
+    assert gltf.bufferViews[view].byteOffset == 4
+    assert gltf.bufferViews[view].byteLength == 24
+    assert gltf.bufferViews[view].target == 34962
+    assert gltf.bufferViews[table].byteOffset == 32
+    assert gltf.buffers[0].byteLength == 33
+    assert gltf.buffers[0].uri.startswith("data:application/octet-stream;base64,")
+
+
+def test_views_past_the_limit_start_a_new_buffer():
+    gltf = GLTF2()
+    builder = BufferBuilder(gltf, max_length=100)
+    first = builder.add_view(bytes(60))
+    second = builder.add_view(bytes(60))
+    # A view longer than the limit gets a buffer of its own.
+    third = builder.add_view(bytes(150))
+    builder.finish()
+
+    assert [gltf.bufferViews[i].buffer for i in (first, second, third)] == [0, 1, 2]
+    assert [gltf.bufferViews[i].byteOffset for i in (first, second, third)] == [0] * 3
+    assert [buffer.byteLength for buffer in gltf.buffers] == [60, 60, 150]
+    assert len(builder) == 60
+
+
+def test_split_glb_writes_external_buffers(tmp_path):
+    model = _model([_speckle_sphere()], [_speckle_sphere(radius=2.0)])
+    expected = create_gltf(model, False)
+
+    writer = GlbWriter(tmp_path / "model.glb")
+    options = ExportOptions(max_buffer_length=30000)
+    gltf = create_gltf(model, False, buffer_data=writer, options=options)
+    loaded = GLTF2().load_binary(writer.finalize(gltf))
+
+    assert writer.external_buffers == [tmp_path / "model_1.bin"]
+    assert loaded.buffers[1].uri == "model_1.bin"
+    assert loaded.buffers[1].byteLength == (tmp_path / "model_1.bin").stat().st_size
+    assert {view.buffer for view in loaded.bufferViews} == {0, 1}
+
+    expected.convert_buffers(BufferFormat.BINARYBLOB)
+    blobs = [loaded.binary_blob(), (tmp_path / "model_1.bin").read_bytes()]
+    for index, accessor in enumerate(loaded.accessors):
+        blob = blobs[loaded.bufferViews[accessor.bufferView].buffer]
+        assert np.array_equal(
+            _read_accessor(loaded, index, blob),
+            _read_accessor(expected, index, expected.binary_blob()),
+        )
@@ -0,0 +1,60 @@
+"""Unit tests for the on-disk conversion cache."""
+
+import numpy as np
+
+from src.gltf import session as session_module
+from src.gltf.cache import ConversionCache
+from src.gltf.create import create_gltf, create_gltf_merged
+from src.gltf.options import ExportOptions
+from src.inputs import FunctionInputs
+from src.utils.store import CACHE_DIR_ENV
+from tests.test_create import _identified_quad, _model
+
+
+def test_cache_round_trips_and_evicts_least_recently_used(tmp_path):
+    vertices = np.arange(12, dtype=np.float32).reshape(-1, 3)
+    faces = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.uint32)
+    entry_size = vertices.nbytes + faces.nbytes
+
+    cache = ConversionCache(tmp_path / "cache.sqlite", max_bytes=2 * entry_size)
+    cache.put("a", vertices, faces, (4, 2))
+    cache.put("b", vertices, faces, (4, 2))
+    assert cache.get("a") is not None
+    cache.put("c", vertices, faces, (5, 3))
+    cache.close()
+
+    cache = ConversionCache(tmp_path / "cache.sqlite", max_bytes=2 * entry_size)
+    assert "b" not in cache
+    stored_vertices, stored_faces, before = cache.get("c")
+    np.testing.assert_array_equal(stored_vertices, vertices)
+    np.testing.assert_array_equal(stored_faces, faces)
+    assert before == (5, 3)
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_cached_export_matches_and_skips_conversion(tmp_path, monkeypatch):
+    options = ExportOptions(cache_path=tmp_path / "cache.sqlite")
+    model = _model([_identified_quad("first")], [_identified_quad("second", 1.0)])
+
+    for builder in (create_gltf, create_gltf_merged):
+        expected = builder(model, include_metadata=False)
+        assert builder(model, False, options=options).to_json() == expected.to_json()
+
+        def fail(_):
+            raise AssertionError("cached mesh was converted again")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(session_module, "process_speckle_mesh", fail)
+            cached = builder(model, False, options=options)
+        assert cached.to_json() == expected.to_json()
+
+
+def test_cache_is_kept_in_the_configured_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    options = ExportOptions.from_inputs(FunctionInputs(conversion_cache_size=64))
+    assert options.cache_path == tmp_path / "meshes.sqlite"
+    assert options.cache_size == 64 << 20
+
+    assert ExportOptions.from_inputs(FunctionInputs()).cache_path is None
@@ -0,0 +1,196 @@
+"""Unit tests for the glTF builders."""
+
+import numpy as np
+from pygltflib import BufferFormat
+from specklepy.objects import Base
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+from specklepy.objects.other import Instance, RenderMaterial, Transform
+
+from src.gltf.create import (
+    create_gltf,
+    create_gltf_from_instances,
+    create_gltf_merged,
+)
+from src.gltf.instances import decompose_trs
+
+
+def _quad_mesh(offset: float = 0.0, material=None) -> SpeckleMesh:
+    mesh = SpeckleMesh(
+        vertices=[0, 0, offset, 1, 0, offset, 1, 1, offset, 0, 1, offset],
+        faces=[4, 0, 1, 2, 3],
+    )
+    if material is not None:
+        mesh.renderMaterial = material
+    return mesh
+
+
+def _identified_quad(speckle_id: str, offset: float = 0.0):
+    mesh = _quad_mesh(offset=offset)
+    mesh.id = speckle_id
+    return mesh
+
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+
+
+def _read_accessor(gltf, accessor_index: int, blob: bytes = None) -> np.ndarray:
+    """Read an accessor's raw values from a document with an in-memory buffer."""
+    if blob is None:
+        gltf.convert_buffers(BufferFormat.BINARYBLOB)
+        blob = gltf.binary_blob()
+    accessor = gltf.accessors[accessor_index]
+    view = gltf.bufferViews[accessor.bufferView]
+    dtype = np.dtype(COMPONENT_DTYPES[accessor.componentType])
+    width = TYPE_SIZES[accessor.type]
+    stride = view.byteStride or dtype.itemsize * width
+    raw = np.frombuffer(
+        blob, dtype=np.uint8, count=view.byteLength, offset=view.byteOffset
+    )
+    rows = np.lib.stride_tricks.as_strided(
+        raw, shape=(accessor.count, width * dtype.itemsize), strides=(stride, 1)
+    )
+    return np.ascontiguousarray(rows).view(dtype).reshape(accessor.count, width)
+
+
+def _model(*display_values) -> Base:
+    root = Base()
+    root.elements = []
+    for display_value in display_values:
+        element = Base()
+        element.displayValue = display_value
+        root.elements.append(element)
+    return root
+
+
+def test_create_gltf_shares_identical_geometry():
+    red = RenderMaterial(name="red", diffuse=-65536)
+    model = _model(
+        [_quad_mesh(material=red)],
+        [_quad_mesh(material=red)],
+        [_quad_mesh(offset=1.0, material=red)],
+    )
+    gltf = create_gltf(model, include_metadata=False)
+
+    assert len(gltf.nodes) == 3
+    assert len(gltf.meshes) == 2
+    assert [node.mesh for node in gltf.nodes] == [0, 0, 1]
+
+
+def test_create_gltf_keeps_geometry_with_different_materials_apart():
+    model = _model(
+        [_quad_mesh(material=RenderMaterial(name="red", diffuse=-65536))],
+        [_quad_mesh(material=RenderMaterial(name="blue", diffuse=-16776961))],
+    )
+    gltf = create_gltf(model, include_metadata=False)
+
+    assert len(gltf.meshes) == 2
+    assert len(gltf.materials) == 2
+
+
+def test_create_gltf_dedup_by_speckle_id():
+    first, second = _quad_mesh(), _quad_mesh(offset=5.0)
+    first.id = second.id = "same-content-hash"
+    gltf = create_gltf(_model([first], [second]), include_metadata=False)
+
+    assert len(gltf.meshes) == 1
+
+
+def _instance(definition: Base, matrix) -> Instance:
+    return Instance(definition=definition, transform=Transform(value=matrix))
+
+
+def _translation(x: float, y: float, z: float):
+    return [1, 0, 0, x, 0, 1, 0, y, 0, 0, 1, z, 0, 0, 0, 1]
+
+
+def test_instances_become_nodes_with_matrices():
+    definition = Base()
+    definition.displayValue = [_quad_mesh()]
+    root = Base()
+    root.elements = [
+        _instance(definition, _translation(10, 0, 0)),
+        _instance(definition, _translation(0, 20, 0)),
+    ]
+    gltf = create_gltf_from_instances(root, include_metadata=False)
+
+    assert len(gltf.meshes) == 1
+    assert len(gltf.nodes) == 2
+    # Speckle Y becomes glTF -Z; matrices are column-major.
+    assert gltf.nodes[0].matrix[12:15] == [10, 0, 0]
+    assert gltf.nodes[1].matrix[12:15] == [0, 0, -20]
+
+
+def test_many_instances_use_gpu_instancing():
+    definition = Base()
+    definition.displayValue = [_quad_mesh()]
+    root = Base()
+    root.elements = [_instance(definition, _translation(i, 0, 0)) for i in range(20)]
+    gltf = create_gltf_from_instances(
+        root, include_metadata=False, gpu_instancing_threshold=8
+    )
+
+    assert len(gltf.meshes) == 1
+    assert len(gltf.nodes) == 1
+    attributes = gltf.nodes[0].extensions["EXT_mesh_gpu_instancing"]["attributes"]
+    assert gltf.accessors[attributes["TRANSLATION"]].count == 20
+    assert "EXT_mesh_gpu_instancing" in gltf.extensionsRequired
+
+
+def test_decompose_trs_round_trip():
+    rng = np.random.default_rng(1)
+    angles = rng.uniform(-np.pi, np.pi, 50)
+    matrices = np.tile(np.identity(4), (50, 1, 1))
+    matrices[:, 0, 0] = matrices[:, 1, 1] = np.cos(angles)
+    matrices[:, 0, 1], matrices[:, 1, 0] = -np.sin(angles), np.sin(angles)
+    matrices[:, :3, :3] *= rng.uniform(0.5, 2.0, (50, 1, 3))
+    matrices[:, :3, 3] = rng.normal(size=(50, 3))
+
+    translations, rotations, scales = decompose_trs(matrices)
+    x, y, z, w = rotations.T
+    rebuilt = np.stack(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    ).transpose(2, 0, 1)
+    assert np.allclose(rebuilt * scales[:, None, :], matrices[:, :3, :3])
+    assert np.allclose(translations, matrices[:, :3, 3])
+
+
+def test_merged_export_batches_by_material():
+    red = RenderMaterial(name="red", diffuse=-65536)
+    blue = RenderMaterial(name="blue", diffuse=-16776961)
+    model = _model(
+        [_quad_mesh(material=red)],
+        [_quad_mesh(offset=1.0, material=red), _quad_mesh(material=blue)],
+        [_quad_mesh(offset=2.0, material=red)],
+    )
+    for index, element in enumerate(model.elements):
+        element.id = f"element-{index}"
+
+    gltf = create_gltf_merged(model, include_metadata=False)
+
+    assert len(gltf.nodes) == 1 and len(gltf.meshes) == 1
+    primitives = gltf.meshes[0].primitives
+    assert len(primitives) == 2
+    assert gltf.nodes[0].extras["speckle_feature_ids"] == [
+        "element-0",
+        "element-1",
+        "element-2",
+    ]
+
+    feature_ids = _read_accessor(gltf, primitives[0].attributes._FEATURE_ID_0)
+    assert feature_ids.ravel().tolist() == [0] * 4 + [1] * 4 + [2] * 4
+    assert primitives[0].extensions["EXT_mesh_features"]["featureIds"][0] == {
+        "featureCount": 3,
+        "attribute": 0,
+    }
@@ -0,0 +1,27 @@
+"""Unit tests for the Speckle tree traversal."""
+
+from specklepy.objects import Base
+
+from src.utils.flatten import flatten_base_thorough, traverse_base
+from tests.test_create import _model, _quad_mesh
+
+
+def test_traverse_base_does_not_modify_objects():
+    model = _model([_quad_mesh()], [_quad_mesh(offset=1.0)])
+    items = list(traverse_base(model))
+
+    assert [obj for obj, _ in items] == [*model.elements, model]
+    assert [parent for _, parent in items] == [
+        "Base",
+        "Base",
+        None,
+    ]
+    assert all("parent_type" not in obj.get_member_names() for obj, _ in items)
+
+
+def test_flatten_base_thorough_keeps_parent_type():
+    model = _model([_quad_mesh()])
+    flattened = list(flatten_base_thorough(model))
+    assert flattened == [model.elements[0], model]
+    assert flattened[0]["parent_type"] == "Base"
+    assert isinstance(flattened[1], Base) and flattened[1]["parent_type"] is None
@@ -0,0 +1,128 @@
+"""Unit tests for the mesh decoding helpers."""
+
+import numpy as np
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+
+from src.gltf.helpers import (
+    decode_speckle_faces,
+    find_face_headers,
+    speckle_mesh_to_trimesh,
+)
+from src.gltf.mesh import process_speckle_mesh
+from src.gltf import triangulate
+from src.gltf.triangulate import triangulate_polygon
+
+
+def _grid_vertices(size: int = 10) -> np.ndarray:
+    xs, ys = np.meshgrid(np.arange(size), np.arange(size))
+    return np.column_stack([xs.ravel(), ys.ravel(), np.zeros(size * size)])
+
+
+def test_find_face_headers_mixed_runs():
+    faces = [3, 0, 1, 2, 3, 1, 2, 3, 4, 0, 1, 2, 3, 0, 4, 5, 6, 5, 0, 1, 2, 3, 4]
+    assert find_face_headers(np.array(faces)).tolist() == [0, 4, 8, 13, 17]
+
+
+def test_decode_triangles_and_legacy_zero_header():
+    vertices = _grid_vertices()
+    faces = [3, 0, 1, 2, 0, 2, 3, 4, 3, 4, 5, 6]
+    decoded = decode_speckle_faces(faces, vertices)
+    assert decoded.dtype == np.uint32
+    assert decoded.tolist() == [[0, 1, 2], [2, 3, 4], [4, 5, 6]]
+
+
+def test_decode_concave_quad_uses_other_diagonal():
+    vertices = np.array(
+        [[0, 0, 0], [2, 0, 0], [2, 2, 0], [1.8, 0.2, 0]], dtype=np.float32
+    )
+    decoded = decode_speckle_faces([4, 0, 1, 2, 3], vertices)
+    # Fanned from the reflex corner so neither triangle leaves the quad.
+    assert decoded.tolist() == [[3, 0, 1], [3, 1, 2]]
+
+
+def test_decode_fans_convex_ngons_without_ear_clipping(monkeypatch):
+    def ear_clip_polygon(points):
+        raise AssertionError("a convex polygon was ear-clipped")
+
+    monkeypatch.setattr(triangulate, "triangulate_polygon", ear_clip_polygon)
+    angles = np.linspace(0, 2 * np.pi, 9)[:-1]
+    ring = np.column_stack([np.cos(angles), np.sin(angles), np.zeros(8)])
+    vertices = np.concatenate([ring, ring + [3, 0, 0]]).astype(np.float32)
+    # A hexagon and two octagons, one of them with a collinear corner.
+    vertices[9] = (vertices[8] + vertices[10]) / 2
+    faces = [6, 0, 1, 2, 3, 4, 5, 8, *range(8), 8, *range(8, 16)]
+    decoded = decode_speckle_faces(faces, vertices)
+    assert len(decoded) == 4 + 6 + 6
+    assert decoded[:4].tolist() == [[0, 1, 2], [0, 2, 3], [0, 3, 4], [0, 4, 5]]
+
+
+def test_decode_preserves_face_order_and_drops_degenerates():
+    vertices = _grid_vertices()
+    faces = [4, 0, 1, 11, 10, 2, 5, 6, 3, 20, 21, 22, 5, 30, 31, 32, 42, 40]
+    decoded = decode_speckle_faces(faces, vertices)
+    assert decoded.tolist()[:2] == [[0, 1, 11], [0, 11, 10]]
+    assert decoded.tolist()[2] == [20, 21, 22]
+    assert len(decoded) == 2 + 1 + 3
+    assert set(decoded[3:].ravel().tolist()) == {30, 31, 32, 42, 40}
+
+
+def test_process_speckle_mesh_contract():
+    mesh = SpeckleMesh(
+        vertices=[0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0],
+        faces=[4, 0, 1, 2, 3],
+    )
+    vertices, faces = process_speckle_mesh(mesh)
+    assert vertices.shape == (4, 3)
+    assert vertices.dtype == np.float32
+    assert faces.shape == (2, 3)
+    assert speckle_mesh_to_trimesh(mesh).faces.shape == (2, 3)
+
+
+def test_triangulate_concave_polygon_keeps_triangles_inside():
+    # An L-shaped hexagon: fanning from corner 2 would cover the notch.
+    points = np.array(
+        [[0, 0, 0], [2, 0, 0], [2, 1, 0], [1, 1, 0], [1, 2, 0], [0, 2, 0]],
+        dtype=np.float64,
+    )
+    triangles = triangulate_polygon(points)
+    centroids = points[triangles].mean(axis=1)
+    assert not np.any((centroids[:, 0] > 1) & (centroids[:, 1] > 1))
+    area = sum(
+        np.linalg.norm(np.cross(points[b] - points[a], points[c] - points[a])) / 2
+        for a, b, c in triangles
+    )
+    assert np.isclose(area, 3.0)
+
+
+def test_triangulate_degenerate_polygons_terminate():
+    collinear = np.array([[i, 0, 0] for i in range(8)], dtype=np.float64)
+    assert len(triangulate_polygon(collinear)) <= 6
+
+    # A self-intersecting star never yields an ear-free deadlock.
+    angles = np.linspace(0, 4 * np.pi, 11)[:-1]
+    star = np.column_stack([np.cos(angles), np.sin(angles), np.zeros(10)])
+    assert len(triangulate_polygon(star)) == 8
+
+
+def test_triangulate_large_convex_polygon():
+    angles = np.linspace(0, 2 * np.pi, 2001)[:-1]
+    circle = np.column_stack([np.cos(angles), np.sin(angles), np.zeros(2000)])
+    triangles = triangulate_polygon(circle)
+    assert len(triangles) == 1998
+    assert len(np.unique(np.sort(triangles, axis=1), axis=0)) == 1998
+
+
+def test_triangulate_large_concave_polygon():
+    # A spiky ring: every other corner is reflex, so each ear has blockers nearby.
+    angles = np.linspace(0, 2 * np.pi, 4001)[:-1]
+    radius = np.where(np.arange(4000) % 2, 0.6, 1.0) + 0.05 * np.sin(7 * angles)
+    x, y = radius * np.cos(angles), radius * np.sin(angles)
+    points = np.column_stack([x, y, np.zeros(4000)])
+    triangles = triangulate_polygon(points)
+    assert len(triangles) == 3998
+
+    # Overlapping triangles would cover more than the polygon itself.
+    a, b, c = (points[triangles[:, i]] for i in range(3))
+    area = np.linalg.norm(np.cross(b - a, c - a), axis=1).sum() / 2
+    polygon_area = abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+    assert np.isclose(area, polygon_area)
@@ -0,0 +1,66 @@
+"""Unit tests for reusing the geometry of a previous GLB export."""
+
+from src.gltf import session as session_module
+from src.gltf.create import create_gltf
+from src.gltf.options import ExportOptions
+from src.utils.store import GlbWriter
+from tests.test_create import _identified_quad, _model
+
+
+def _export(model, path, options):
+    writer = GlbWriter(path)
+    return writer.finalize(
+        create_gltf(model, include_metadata=False, buffer_data=writer, options=options)
+    )
+
+
+def test_incremental_export_copies_unchanged_meshes(tmp_path, monkeypatch):
+    for options in (
+        ExportOptions(incremental=True),
+        ExportOptions(incremental=True, quantize=True, meshopt_compression=True),
+    ):
+        previous = _export(
+            _model(
+                [_identified_quad("kept")],
+                [_identified_quad("changed")],
+                [_identified_quad("deleted", 2.0)],
+            ),
+            tmp_path / "previous.glb",
+            options,
+        )
+        edited = _model(
+            [_identified_quad("added", 3.0)],
+            [_identified_quad("kept")],
+            [_identified_quad("changed-again", 1.0)],
+        )
+        expected = _export(edited, tmp_path / "expected.glb", options)
+
+        converted = []
+        process_speckle_mesh = session_module.process_speckle_mesh
+
+        def counting(display_mesh):
+            converted.append(display_mesh.id)
+            return process_speckle_mesh(display_mesh)
+
+        with monkeypatch.context() as patch:
+            patch.setattr(session_module, "process_speckle_mesh", counting)
+            options.previous_export = previous
+            incremental = _export(edited, tmp_path / "incremental.glb", options)
+            options.previous_export = None
+
+        assert converted == ["added", "changed-again"]
+        assert incremental.read_bytes() == expected.read_bytes()
+
+
+def test_previous_export_with_other_settings_is_ignored(tmp_path):
+    model = _model([_identified_quad("kept")])
+    previous = _export(
+        model, tmp_path / "previous.glb", ExportOptions(incremental=True)
+    )
+
+    options = ExportOptions(incremental=True, quantize=True, previous_export=previous)
+    reexported = _export(model, tmp_path / "reexported.glb", options)
+    expected = _export(
+        model, tmp_path / "expected.glb", ExportOptions(incremental=True, quantize=True)
+    )
+    assert reexported.read_bytes() == expected.read_bytes()
@@ -0,0 +1,67 @@
+"""Unit tests for the stage timers and memory instrumentation."""
+
+import json
+import sys
+
+from src.gltf.create import create_gltf
+from src.utils.instrument import Instrumentation, active
+from tests.test_structural import _tagged_model
+
+
+def test_stages_accumulate_across_calls():
+    instrumentation = Instrumentation()
+    with instrumentation.activate():
+        for _ in range(3):
+            with active().stage("conversion", items=2):
+                pass
+        assert list(active().iterate("traversal", range(4))) == [0, 1, 2, 3]
+
+    stages = instrumentation.report()["stages"]
+    assert stages["conversion"]["calls"] == 3
+    assert stages["conversion"]["items"] == 6
+    assert stages["traversal"]["items"] == 4
+    assert stages["conversion"]["peak_rss_bytes"] > 0
+    assert "peak_traced_bytes" not in stages["conversion"]
+
+
+def test_nested_stages_share_the_traced_peak():
+    instrumentation = Instrumentation(trace_memory=True)
+    with instrumentation.activate():
+        with active().stage("outer"):
+            with active().stage("inner"):
+                block = bytearray(4 * 2**20)
+            del block
+
+    stages = instrumentation.report()["stages"]
+    assert stages["inner"]["peak_traced_bytes"] >= 4 * 2**20
+    assert stages["outer"]["peak_traced_bytes"] >= stages["inner"]["peak_traced_bytes"]
+
+
+def test_inactive_instrumentation_records_nothing():
+    with active().stage("conversion") as record:
+        record.add_items()
+    assert active().report()["stages"] == {}
+
+
+def test_export_reports_its_stages(tmp_path):
+    instrumentation = Instrumentation()
+    with instrumentation.activate():
+        create_gltf(_tagged_model(), include_metadata=True)
+
+    report = json.loads(instrumentation.write(tmp_path / "run.json").read_text())
+    stages = report["stages"]
+    assert stages["conversion"]["items"] == 4
+    # The root and its four elements.
+    assert stages["traversal"]["items"] == 5
+    assert {"materials", "metadata", "serialization"} <= set(stages)
+    assert "conversion" in instrumentation.summary(top=10)
+
+
+def test_report_includes_the_start_up_time():
+    instrumentation = Instrumentation()
+    report = instrumentation.report()
+
+    assert "startup_s" in report
+    if sys.platform == "linux":
+        assert report["startup_s"] > 0
+        assert "start-up" in instrumentation.summary()
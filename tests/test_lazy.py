@@ -0,0 +1,60 @@
+"""Unit tests for lazily deserializing a version from a transport."""
+
+import gc
+import weakref
+
+from specklepy.api import operations
+from specklepy.objects import Base
+from specklepy.transports.memory import MemoryTransport
+
+from src.gltf.create import create_gltf
+from src.utils.flatten import traverse_base
+from src.utils.lazy import LazyVersion
+from tests.test_create import _quad_mesh
+
+
+def _detached_model() -> Base:
+    root = Base()
+    root["@elements"] = []
+    for index in range(3):
+        element = Base()
+        element.name = f"element {index}"
+        # Detached display values and chunked vertices resolve from the transport.
+        element["@displayValue"] = [_quad_mesh(offset=float(index))]
+        root["@elements"].append(element)
+    return root
+
+
+def _send(base: Base):
+    transport = MemoryTransport()
+    object_id = operations.send(base, [transport], use_default_cache=False)
+    return transport, object_id
+
+
+def test_lazy_traversal_matches_received_version():
+    transport, object_id = _send(_detached_model())
+    received = operations.receive(object_id, local_transport=transport)
+
+    lazy = [
+        (obj.id, parent) for obj, parent in LazyVersion(transport, object_id).traverse()
+    ]
+    eager = [(obj.id, parent) for obj, parent in traverse_base(received)]
+    assert lazy == eager
+
+    expected = create_gltf(received, include_metadata=True)
+    exported = create_gltf(LazyVersion(transport, object_id), include_metadata=True)
+    assert exported.to_json() == expected.to_json()
+
+
+def test_lazy_traversal_releases_emitted_objects():
+    transport, object_id = _send(_detached_model())
+    traversal = LazyVersion(transport, object_id).traverse()
+
+    first, _ = next(traversal)
+    assert first.name == "element 0"
+    emitted = weakref.ref(first)
+    del first
+
+    next(traversal)
+    gc.collect()
+    assert emitted() is None
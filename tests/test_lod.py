@@ -0,0 +1,128 @@
+"""Unit tests for quadric simplification and MSFT_lod levels of detail."""
+
+import time
+
+import numpy as np
+import trimesh
+from specklepy.objects import Base
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+
+from src.gltf.create import create_gltf, create_gltf_from_instances
+from src.gltf.lod import MSFT_LOD, SCREEN_COVERAGE, simplify_levels, simplify_mesh
+from src.gltf.options import ExportOptions
+from tests.test_create import _instance, _model, _quad_mesh, _translation
+
+
+def _sphere(subdivisions: int = 4):
+    sphere = trimesh.creation.icosphere(subdivisions=subdivisions)
+    return sphere.vertices.astype(np.float32), sphere.faces.astype(np.uint32)
+
+
+def _speckle_sphere(radius: float = 1.0) -> SpeckleMesh:
+    vertices, faces = _sphere(3)
+    return SpeckleMesh(
+        vertices=(vertices * radius).ravel().tolist(),
+        faces=np.column_stack([np.full(len(faces), 3), faces]).ravel().tolist(),
+        units="m",
+    )
+
+
+def _grid(size: int):
+    xs, ys = np.meshgrid(np.arange(size), np.arange(size))
+    vertices = np.column_stack([xs.ravel(), ys.ravel(), np.zeros(size * size)])
+    index = np.arange(size * size).reshape(size, size)
+    a, b = index[:-1, :-1].ravel(), index[:-1, 1:].ravel()
+    c, d = index[1:, :-1].ravel(), index[1:, 1:].ravel()
+    faces = np.concatenate([np.column_stack([a, b, d]), np.column_stack([a, d, c])])
+    return vertices.astype(np.float32), faces.astype(np.uint32)
+
+
+def test_simplify_mesh_keeps_the_surface():
+    vertices, faces = _sphere()
+    simplified_vertices, simplified_faces = simplify_mesh(vertices, faces, 1280)
+
+    assert len(simplified_faces) <= 1280
+    assert simplified_faces.dtype == np.uint32
+    radii = np.linalg.norm(simplified_vertices, axis=1)
+    assert np.abs(radii - 1).max() < 0.01
+    assert trimesh.Trimesh(simplified_vertices, simplified_faces).is_watertight
+
+
+def test_simplify_mesh_keeps_flat_outlines():
+    vertices, faces = _grid(20)
+    simplified_vertices, simplified_faces = simplify_mesh(vertices, faces, 8)
+
+    assert len(simplified_faces) <= 8
+    np.testing.assert_allclose(simplified_vertices.min(axis=0), [0, 0, 0])
+    np.testing.assert_allclose(simplified_vertices.max(axis=0), [19, 19, 0])
+    area = trimesh.Trimesh(simplified_vertices, simplified_faces, process=False).area
+    assert np.isclose(area, 19 * 19)
+
+
+def test_simplify_levels_of_a_large_grid_stays_fast():
+    vertices, faces = _grid(225)
+    vertices[:, 2] = np.random.default_rng(1).normal(0, 0.05, len(vertices))
+    assert len(faces) > 100_000
+
+    start = time.perf_counter()
+    levels = simplify_levels(vertices, faces, 3, 0.25)
+    elapsed = time.perf_counter() - start
+
+    counts = [len(level[1]) for level in levels]
+    assert counts[0] < len(faces) * 0.3
+    assert counts[0] > counts[1] > counts[2]
+    # The edge and quadric work is array-bound; this took about 1.5s.
+    assert elapsed < 4.0
+
+
+def test_small_meshes_become_boxes_then_disappear():
+    vertices, faces = _sphere()
+    levels = simplify_levels(vertices * 0.1, faces, 3, 0.25, min_size=0.5)
+
+    assert len(levels[0][1]) == 12
+    assert levels[1:] == [None, None]
+
+
+def test_levels_are_written_as_lod_alternates():
+    model = _model([_speckle_sphere()], [_quad_mesh()])
+    options = ExportOptions(lod_levels=2)
+    gltf = create_gltf(model, include_metadata=False, options=options)
+
+    assert MSFT_LOD in gltf.extensionsUsed
+    sphere = gltf.nodes[gltf.scenes[0].nodes[0]]
+    lod_ids = sphere.extensions[MSFT_LOD]["ids"]
+    assert len(lod_ids) == 2
+    assert not set(lod_ids) & set(gltf.scenes[0].nodes)
+    assert sphere.extras[SCREEN_COVERAGE] == [0.5, 0.125, 0.03125]
+
+    triangles = [
+        gltf.accessors[gltf.meshes[mesh].primitives[0].indices].count // 3
+        for mesh in [sphere.mesh] + [gltf.nodes[i].mesh for i in lod_ids]
+    ]
+    assert triangles[0] == 1280
+    assert triangles[1] <= 320 and triangles[2] <= 80
+
+    # A quad cannot be simplified, so its levels draw the quad itself.
+    quad = gltf.nodes[gltf.scenes[0].nodes[1]]
+    assert [gltf.nodes[i].mesh for i in quad.extensions[MSFT_LOD]["ids"]] == [
+        quad.mesh,
+        quad.mesh,
+    ]
+
+
+def test_gpu_instanced_nodes_get_instanced_levels():
+    definition = Base()
+    definition.displayValue = [_speckle_sphere()]
+    root = Base()
+    root.elements = [_instance(definition, _translation(i, 0, 0)) for i in range(10)]
+    gltf = create_gltf_from_instances(
+        root,
+        include_metadata=False,
+        gpu_instancing_threshold=8,
+        options=ExportOptions(lod_levels=1),
+    )
+
+    node = gltf.nodes[gltf.scenes[0].nodes[0]]
+    (lod_id,) = node.extensions[MSFT_LOD]["ids"]
+    assert "EXT_mesh_gpu_instancing" in gltf.nodes[lod_id].extensions
+    assert gltf.nodes[lod_id].mesh != node.mesh
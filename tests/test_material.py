@@ -0,0 +1,31 @@
+"""Unit tests for render material conversion."""
+
+from pygltflib import GLTF2
+from specklepy.objects.other import RenderMaterial
+
+from src.gltf.material import MaterialRegistry
+
+
+def test_registry_converts_each_material_once():
+    gltf = GLTF2()
+    registry = MaterialRegistry(gltf)
+    red = RenderMaterial(name="red", diffuse=-65536)
+    red.id = "red-hash"
+    blue = RenderMaterial(name="blue", diffuse=-16776961, opacity=0.5)
+
+    indices = [registry.get_or_add(m) for m in (red, blue, red, blue, None)]
+
+    assert indices == [0, 1, 0, 1, None]
+    assert len(gltf.materials) == 2
+    assert gltf.materials[1].alphaMode == "BLEND"
+
+
+def test_registry_merges_identical_materials_with_different_ids():
+    gltf = GLTF2()
+    registry = MaterialRegistry(gltf)
+    first = RenderMaterial(name="glass", diffuse=-1, opacity=0.3)
+    second = RenderMaterial(name="glass", diffuse=-1, opacity=0.3)
+    first.id, second.id = "a", "b"
+
+    assert registry.get_or_add(first) == registry.get_or_add(second) == 0
+    assert len(gltf.materials) == 1
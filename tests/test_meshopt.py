@@ -0,0 +1,104 @@
+"""Unit tests for the EXT_meshopt_compression codecs and export."""
+
+import base64
+
+import numpy as np
+from pygltflib import GLTF2, BufferFormat
+
+from src.gltf.create import create_gltf
+from src.gltf.meshopt import (
+    decode_buffer_view,
+    decode_index_sequence,
+    decode_vertex_buffer,
+    encode_index_sequence,
+    encode_vertex_buffer,
+)
+from src.gltf.options import ExportOptions
+from src.utils.store import GlbWriter
+from tests.test_create import _model, _quad_mesh
+from tests.test_quantize import _building_mesh
+
+
+def test_vertex_codec_round_trip():
+    rng = np.random.default_rng(7)
+    # Cover a partial block, several full blocks and incompressible bytes.
+    for count, stride in [(1, 4), (17, 12), (1000, 12), (700, 8), (64, 256)]:
+        positions = np.cumsum(rng.integers(-3, 4, (count, stride // 4)), axis=0)
+        data = positions.astype(np.float32).view(np.uint8).reshape(count, stride)
+        encoded = encode_vertex_buffer(data)
+        assert encoded[0] == 0xA0
+        assert np.array_equal(decode_vertex_buffer(encoded, count, stride), data)
+
+    noise = rng.integers(0, 256, (300, 12), dtype=np.uint8)
+    decoded = decode_vertex_buffer(encode_vertex_buffer(noise), 300, 12)
+    assert np.array_equal(decoded, noise)
+
+
+def test_vertex_codec_compresses_smooth_data():
+    grid = np.stack(np.meshgrid(np.arange(100), np.arange(100)), -1).reshape(-1, 2)
+    data = grid.astype(np.uint16).view(np.uint8).reshape(-1, 4)
+    assert len(encode_vertex_buffer(data)) < data.nbytes / 3
+
+
+def test_index_sequence_round_trip():
+    indices = np.array([0, 1, 2, 2, 1, 3, 70000, 5, 2**31 + 5, 0], dtype=np.uint32)
+    encoded = encode_index_sequence(indices)
+    assert encoded[0] == 0xD1 and encoded[-4:] == bytes(4)
+    assert np.array_equal(decode_index_sequence(encoded, len(indices)), indices)
+
+
+def _decoded_views(gltf, blob: bytes):
+    views = []
+    for index, view in enumerate(gltf.bufferViews):
+        decoded = decode_buffer_view(gltf, index, blob)
+        if decoded is None:
+            start = view.byteOffset or 0
+            decoded = blob[start : start + view.byteLength]
+        views.append(bytes(decoded))
+    return views
+
+
+def test_compressed_export_decodes_to_uncompressed_data():
+    model = _model([_quad_mesh()], [_quad_mesh(offset=2.0)])
+    expected = create_gltf(model, include_metadata=False)
+    options = ExportOptions(meshopt_compression=True)
+    compressed = create_gltf(model, include_metadata=False, options=options)
+
+    assert "EXT_meshopt_compression" in compressed.extensionsRequired
+    fallback = compressed.buffers[1]
+    assert fallback.uri is None
+    assert fallback.extensions["EXT_meshopt_compression"]["fallback"] is True
+    assert fallback.byteLength == expected.buffers[0].byteLength
+    modes = {
+        view.extensions["EXT_meshopt_compression"]["mode"]
+        for view in compressed.bufferViews
+    }
+    assert modes == {"ATTRIBUTES", "INDICES"}
+
+    expected.convert_buffers(BufferFormat.BINARYBLOB)
+    # pygltflib cannot convert documents with a data-less fallback buffer.
+    blob = base64.b64decode(compressed.buffers[0].uri.split(",", 1)[1])
+    assert _decoded_views(compressed, blob) == _decoded_views(
+        expected, expected.binary_blob()
+    )
+
+
+def test_compressed_glb_with_quantization(tmp_path):
+    model = _model([_building_mesh(np.random.default_rng(8))], [_quad_mesh()])
+    options = ExportOptions(quantize=True, meshopt_compression=True)
+    expected = create_gltf(model, False, options=ExportOptions(quantize=True))
+
+    writer = GlbWriter(tmp_path / "model.glb")
+    streamed = create_gltf(model, False, buffer_data=writer, options=options)
+    loaded = GLTF2().load_binary(writer.finalize(streamed))
+
+    # The quad's uint8 indices cannot use the index codec and are stored as is.
+    stored_raw = [
+        view for view in loaded.bufferViews if view.buffer == 0 and not view.extensions
+    ]
+    assert len(stored_raw) == 1 and stored_raw[0].byteOffset % 4 == 0
+
+    expected.convert_buffers(BufferFormat.BINARYBLOB)
+    assert _decoded_views(loaded, loaded.binary_blob()) == _decoded_views(
+        expected, expected.binary_blob()
+    )
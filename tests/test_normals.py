@@ -0,0 +1,173 @@
+"""Unit tests for crease-angle vertex normals and their encodings."""
+
+import numpy as np
+import trimesh
+from pygltflib import GLTF2
+
+from src.gltf.create import create_gltf, create_gltf_merged
+from src.gltf.meshopt import decode_meshopt_data, decode_octahedral, encode_octahedral
+from src.gltf import normals as normals_module
+from src.gltf.normals import crease_normals
+from src.gltf.options import ExportOptions
+from src.utils.store import GlbWriter
+from tests.test_create import _model, _quad_mesh, _read_accessor
+from tests.test_lod import _sphere, _speckle_sphere
+
+
+def _box():
+    box = trimesh.creation.box()
+    return box.vertices.astype(np.float32), box.faces.astype(np.uint32)
+
+
+def test_box_edges_stay_sharp():
+    vertices, faces, normals = crease_normals(*_box(), crease_angle=30)
+
+    # Each corner is split into one vertex per side it touches.
+    assert len(vertices) == 24
+    p0, p1, p2 = (vertices[faces[:, k]] for k in range(3))
+    face_normals = np.cross(p1 - p0, p2 - p0)
+    face_normals /= np.linalg.norm(face_normals, axis=1)[:, None]
+    for corner in range(3):
+        assert np.allclose(normals[faces[:, corner]], face_normals, atol=1e-6)
+
+
+def test_smooth_surfaces_are_not_split():
+    vertices, faces = _sphere()
+    smooth_vertices, smooth_faces, normals = crease_normals(vertices, faces, 30)
+
+    assert len(smooth_vertices) == len(vertices)
+    assert len(smooth_faces) == len(faces)
+    radial = smooth_vertices / np.linalg.norm(smooth_vertices, axis=1)[:, None]
+    assert np.abs(normals - radial).max() < 0.01
+
+    # Past 90 degrees even the corners of a box are smoothed, pointing outwards.
+    box_vertices, _, box_normals = crease_normals(*_box(), crease_angle=180)
+    assert len(box_vertices) == 8
+    assert (np.sign(box_normals) == np.sign(box_vertices)).all()
+
+
+def test_octahedral_filter_round_trip():
+    rng = np.random.default_rng(3)
+    normals = rng.normal(size=(2000, 3))
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+
+    encoded = encode_octahedral(normals)
+    assert (encoded[:, 2] == 127).all() and (encoded[:, 3] == 0).all()
+    decoded = decode_octahedral(encoded)[:, :3] / 127
+    decoded /= np.linalg.norm(decoded, axis=1)[:, None]
+    angles = np.degrees(np.arccos(np.clip((decoded * normals).sum(axis=1), -1, 1)))
+    assert angles.max() < 1.5
+
+
+def test_export_writes_normals():
+    model = _model([_quad_mesh()], [_speckle_sphere()])
+    gltf = create_gltf(model, False, options=ExportOptions(normals=True))
+
+    for mesh in gltf.meshes:
+        attributes = mesh.primitives[0].attributes
+        assert attributes.NORMAL is not None
+        assert (
+            gltf.accessors[attributes.NORMAL].count
+            == gltf.accessors[attributes.POSITION].count
+        )
+    # Speckle +Z is glTF +Y.
+    quad_normals = _read_accessor(gltf, gltf.meshes[0].primitives[0].attributes.NORMAL)
+    assert np.allclose(quad_normals, [0, 1, 0])
+
+
+def test_compact_normals_with_quantized_positions():
+    model = _model([_speckle_sphere(radius=3.0)])
+    options = ExportOptions(normals=True, compact_normals=True, quantize=True)
+    gltf = create_gltf(model, False, options=options)
+
+    assert "KHR_mesh_quantization" in gltf.extensionsRequired
+    attributes = gltf.meshes[0].primitives[0].attributes
+    accessor = gltf.accessors[attributes.NORMAL]
+    assert accessor.componentType == 5120 and accessor.normalized
+    assert gltf.bufferViews[accessor.bufferView].byteStride == 4
+
+    # The stored normals, transformed like the dequantized positions, still
+    # point away from the centre of the sphere.
+    positions = _read_accessor(gltf, attributes.POSITION).astype(np.float64)
+    normals = _read_accessor(gltf, attributes.NORMAL) / 127
+    matrix = np.array(gltf.nodes[0].matrix).reshape(4, 4).T
+    world = positions / 32767 @ matrix[:3, :3].T + matrix[:3, 3]
+    world_normals = normals @ np.linalg.inv(matrix[:3, :3])
+    world_normals /= np.linalg.norm(world_normals, axis=1)[:, None]
+    radial = world / np.linalg.norm(world, axis=1)[:, None]
+    assert (world_normals * radial).sum(axis=1).min() > 0.98
+
+
+def test_compressed_compact_normals_use_the_octahedral_filter(tmp_path):
+    model = _model([_speckle_sphere()])
+    options = ExportOptions(normals=True, compact_normals=True)
+    expected = create_gltf(model, False, options=options)
+    expected_normals = _read_accessor(
+        expected, expected.meshes[0].primitives[0].attributes.NORMAL
+    )
+
+    writer = GlbWriter(tmp_path / "model.glb")
+    options = ExportOptions(
+        normals=True, compact_normals=True, meshopt_compression=True
+    )
+    loaded = GLTF2().load_binary(
+        writer.finalize(create_gltf(model, False, buffer_data=writer, options=options))
+    )
+    accessor = loaded.accessors[loaded.meshes[0].primitives[0].attributes.NORMAL]
+    extension = loaded.bufferViews[accessor.bufferView].extensions[
+        "EXT_meshopt_compression"
+    ]
+    assert extension["filter"] == "OCTAHEDRAL"
+
+    start = extension["byteOffset"]
+    encoded = loaded.binary_blob()[start : start + extension["byteLength"]]
+    decoded = np.frombuffer(decode_meshopt_data(extension, encoded), dtype=np.int8)
+    normals = decoded.reshape(-1, 4)[:, :3].astype(np.float64)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    expected_normals = (
+        expected_normals / np.linalg.norm(expected_normals, axis=1)[:, None]
+    )
+    assert (normals * expected_normals).sum(axis=1).min() > 0.999
+
+
+def test_merged_normals_match_feature_ids():
+    model = _model([_quad_mesh()], [_speckle_sphere()])
+    options = ExportOptions(normals=True)
+    gltf = create_gltf_merged(model, False, options=options)
+
+    attributes = gltf.meshes[0].primitives[0].attributes
+    assert (
+        gltf.accessors[attributes.NORMAL].count
+        == gltf.accessors[attributes._FEATURE_ID_0].count
+        == gltf.accessors[attributes.POSITION].count
+    )
+
+
+def _fan(triangles: int):
+    """A cone of triangles around one apex, e.g. the centre of a fan."""
+    angles = np.linspace(0, 2 * np.pi, triangles, endpoint=False)
+    rim = np.column_stack([np.cos(angles), np.sin(angles), np.zeros(triangles)])
+    vertices = np.vstack([[0, 0, 0.1], rim]).astype(np.float32)
+    rim_index = np.arange(1, triangles + 1)
+    faces = np.column_stack(
+        [np.zeros(triangles), rim_index, np.roll(rim_index, -1)]
+    ).astype(np.uint32)
+    return vertices, faces
+
+
+def test_high_valence_vertices_are_compared_in_bounded_chunks(monkeypatch):
+    vertices, faces = _fan(3000)
+    expected = crease_normals(vertices, faces, 30)
+
+    monkeypatch.setattr(normals_module, "PAIR_CHUNK", 1 << 16)
+    pair_counts = np.full(3000, 3000)
+    chunks = list(normals_module._corner_chunks(pair_counts))
+    assert len(chunks) > 1
+    assert all(pair_counts[a:b].sum() <= 1 << 16 for a, b in chunks)
+
+    chunked = crease_normals(vertices, faces, 30)
+    assert len(chunked[0]) == len(vertices)
+    for array, expected_array in zip(chunked, expected):
+        assert np.array_equal(array, expected_array)
+    # The apex of the shallow cone points straight up.
+    assert np.allclose(chunked[2][0], [0, 0, 1], atol=1e-6)
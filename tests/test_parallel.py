@@ -0,0 +1,85 @@
+"""Unit tests for the process-pool mesh conversion."""
+
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+
+from src.gltf import parallel
+from src.gltf.create import create_gltf, create_gltf_from_instances, create_gltf_merged
+from src.gltf.options import ExportOptions
+from tests.test_create import _model, _quad_mesh
+
+
+def _polygon_mesh(rng, sides: int) -> SpeckleMesh:
+    angles = np.sort(rng.uniform(0, 2 * np.pi, sides))
+    radii = rng.uniform(0.5, 1.5, sides)
+    vertices = np.column_stack(
+        [radii * np.cos(angles), radii * np.sin(angles), rng.uniform(0, 1, sides)]
+    )
+    return SpeckleMesh(
+        vertices=vertices.ravel().tolist(), faces=[sides, *range(sides)], units="m"
+    )
+
+
+def _varied_model():
+    rng = np.random.default_rng(11)
+    meshes = [_polygon_mesh(rng, int(rng.integers(3, 12))) for _ in range(40)]
+    # Repeat some geometry so the cache and prefetch deduplication are exercised.
+    return _model(*[[mesh, _quad_mesh(float(i % 3))] for i, mesh in enumerate(meshes)])
+
+
+def test_parallel_export_is_byte_identical(monkeypatch):
+    monkeypatch.setattr(parallel, "BATCH_MAX_MESHES", 7)
+    model = _varied_model()
+
+    for builder in (create_gltf, create_gltf_from_instances, create_gltf_merged):
+        serial = builder(model, include_metadata=True)
+        threaded = builder(
+            model, include_metadata=True, options=ExportOptions(workers=2)
+        )
+        assert threaded.to_json() == serial.to_json()
+
+
+def test_prefetcher_hands_out_each_mesh_once():
+    meshes = [_quad_mesh(), _quad_mesh(offset=1.0)]
+    prefetcher = parallel.MeshPrefetcher(
+        meshes, workers=2, weld_tolerance=lambda _: None
+    )
+    try:
+        vertices, faces, before = prefetcher.get(meshes[1])
+        assert vertices.shape == (4, 3) and faces.shape == (2, 3)
+        assert before == (4, 2)
+        assert prefetcher.get(meshes[1]) is None
+        assert prefetcher.get(_quad_mesh()) is None
+    finally:
+        prefetcher.close()
+
+
+def test_prefetcher_sends_batches_through_shared_memory(monkeypatch):
+    monkeypatch.setattr(parallel, "BATCH_MAX_MESHES", 2)
+    blocks, pack_batch = [], parallel._pack_batch
+
+    def recording_pack_batch(meshes):
+        assert all(isinstance(array, np.ndarray) for mesh in meshes for array in mesh)
+        block = pack_batch(meshes)
+        blocks.append(block.name)
+        return block
+
+    monkeypatch.setattr(parallel, "_pack_batch", recording_pack_batch)
+    meshes = [_quad_mesh(float(i)) for i in range(10)]
+    prefetcher = parallel.MeshPrefetcher(
+        meshes, workers=2, weld_tolerance=lambda _: None, window=2
+    )
+    try:
+        vertices, _, _ = prefetcher.get(meshes[3])
+        assert np.allclose(vertices[:, 1], 3.0)
+    finally:
+        prefetcher.close()
+
+    # Every input block is freed, whether its batch was consumed or not.
+    assert len(blocks) >= 3
+    for name in blocks:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
@@ -0,0 +1,78 @@
+"""Unit tests for KHR_mesh_quantization output."""
+
+import numpy as np
+from specklepy.objects import Base
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+
+from src.gltf.create import create_gltf, create_gltf_from_instances
+from src.gltf.options import ExportOptions
+from src.gltf.quantize import narrow_indices, quantize_positions
+from tests.test_create import _instance, _model, _read_accessor, _translation
+
+
+def _building_mesh(rng, units="m") -> SpeckleMesh:
+    vertices = rng.uniform([1000, 2000, 0], [1040, 2025, 60], size=(300, 3))
+    faces = np.column_stack([np.full(100, 3), np.arange(300).reshape(100, 3)])
+    return SpeckleMesh(
+        vertices=vertices.ravel().tolist(), faces=faces.ravel().tolist(), units=units
+    )
+
+
+def test_quantize_positions_respects_precision():
+    rng = np.random.default_rng(3)
+    vertices = rng.uniform(-50, 50, size=(1000, 3)).astype(np.float32)
+    quantized, matrix = quantize_positions(vertices, precision=0.001)
+
+    restored = quantized[:, :3] / 32767 @ matrix[:3, :3].T + matrix[:3, 3]
+    assert np.abs(restored - vertices).max() <= 0.001
+    assert quantize_positions(vertices, precision=0.0001) is None
+
+
+def test_narrow_indices_picks_smallest_type():
+    faces = np.array([[0, 1, 2]], dtype=np.uint32)
+    assert narrow_indices(faces, 255)[1] == 5121
+    assert narrow_indices(faces, 256)[1] == 5123
+    assert narrow_indices(faces, 70000)[1] == 5125
+
+
+def test_quantized_export_round_trips_within_a_millimetre():
+    mesh = _building_mesh(np.random.default_rng(4))
+    options = ExportOptions(quantize=True, quantization_precision=0.001)
+    gltf = create_gltf(_model([mesh]), include_metadata=False, options=options)
+
+    assert "KHR_mesh_quantization" in gltf.extensionsRequired
+    primitive = gltf.meshes[0].primitives[0]
+    positions = _read_accessor(gltf, primitive.attributes.POSITION)
+    assert positions.dtype == np.int16
+    assert gltf.accessors[primitive.indices].componentType == 5123
+    assert all(view.byteOffset % 4 == 0 for view in gltf.bufferViews)
+
+    matrix = np.array(gltf.nodes[0].matrix).reshape(4, 4).T
+    restored = positions / 32767 @ matrix[:3, :3].T + matrix[:3, 3]
+    source = np.array(mesh.vertices).reshape(-1, 3)
+    expected = np.column_stack([source[:, 0], source[:, 2], -source[:, 1]])
+    assert np.abs(restored - expected).max() <= 0.001 + 1e-3 * 1e-3
+
+
+def test_precision_is_scaled_by_mesh_units():
+    mesh = _building_mesh(np.random.default_rng(5), units="mm")
+    options = ExportOptions(quantize=True, quantization_precision=0.00001)
+    gltf = create_gltf(_model([mesh]), include_metadata=False, options=options)
+
+    # 1/100 mm is 0.01 model units, far coarser than the 60 mm box needs.
+    position = gltf.accessors[gltf.meshes[0].primitives[0].attributes.POSITION]
+    assert position.componentType == 5122
+
+
+def test_quantized_instances_compose_dequantization_last():
+    definition = Base()
+    definition.displayValue = [_building_mesh(np.random.default_rng(6))]
+    root = Base()
+    root.elements = [_instance(definition, _translation(5, 0, 0))]
+    options = ExportOptions(quantize=True)
+    gltf = create_gltf_from_instances(root, include_metadata=False, options=options)
+
+    node_matrix = np.array(gltf.nodes[0].matrix).reshape(4, 4).T
+    centre = node_matrix[:3, 3]
+    # The occurrence offset is applied on top of the box centre.
+    assert np.isclose(centre[0], 1020 + 5, atol=1)
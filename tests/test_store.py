@@ -0,0 +1,156 @@
+"""Unit tests for writing export results to disk."""
+
+import io
+import struct
+import tracemalloc
+import zipfile
+
+import numpy as np
+from pygltflib import GLTF2, BufferFormat
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+
+from src.gltf.create import create_gltf
+from src.gltf.options import ExportOptions
+from src.inputs import ExportFormat
+from src.utils.store import (
+    CACHE_DIR_ENV,
+    GlbWriter,
+    GltfWriter,
+    archive_files,
+    incremental_export_path,
+    write_gltf_to_tmp,
+)
+from tests.test_create import _model, _quad_mesh
+
+
+def test_glb_writer_matches_in_memory_export(tmp_path):
+    model = _model([_quad_mesh()], [_quad_mesh(offset=2.0)])
+    expected = create_gltf(model, include_metadata=False)
+
+    writer = GlbWriter(tmp_path / "model.glb")
+    streamed = create_gltf(model, include_metadata=False, buffer_data=writer)
+    path = writer.finalize(streamed)
+
+    raw = path.read_bytes()
+    magic, version, length = struct.unpack_from("<4sII", raw)
+    assert (magic, version, length) == (b"glTF", 2, len(raw))
+    json_length, _ = struct.unpack_from("<I4s", raw, 12)
+    bin_offset = 20 + json_length
+    bin_length, chunk_type = struct.unpack_from("<I4s", raw, bin_offset)
+    assert chunk_type == b"BIN\x00"
+    assert bin_offset % 4 == 0 and bin_length % 4 == 0
+
+    loaded = GLTF2().load_binary(path)
+    expected.convert_buffers(BufferFormat.BINARYBLOB)
+    assert loaded.binary_blob()[: loaded.buffers[0].byteLength] == (
+        expected.binary_blob()
+    )
+    assert len(loaded.meshes) == len(expected.meshes)
+
+
+def _grid_mesh(size: int, offset: float) -> SpeckleMesh:
+    xs, ys = np.meshgrid(np.arange(size), np.arange(size))
+    vertices = np.column_stack([xs.ravel() + offset, ys.ravel(), np.zeros(xs.size)])
+    corners = np.arange(size * size).reshape(size, size)
+    quads = np.column_stack(
+        [
+            np.full((size - 1) ** 2, 4),
+            corners[:-1, :-1].ravel(),
+            corners[:-1, 1:].ravel(),
+            corners[1:, 1:].ravel(),
+            corners[1:, :-1].ravel(),
+        ]
+    )
+    return SpeckleMesh(vertices=vertices.ravel().tolist(), faces=quads.ravel().tolist())
+
+
+def _peak_export_memory(model, path) -> int:
+    tracemalloc.start()
+    try:
+        writer = GlbWriter(path)
+        create_gltf(model, include_metadata=False, buffer_data=writer)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streamed_export_memory_does_not_grow_with_model(tmp_path):
+    small = _model(*[[_grid_mesh(100, 1000 * k)] for k in range(1)])
+    large = _model(*[[_grid_mesh(100, 1000 * k)] for k in range(8)])
+
+    small_peak = _peak_export_memory(small, tmp_path / "small.glb")
+    large_peak = _peak_export_memory(large, tmp_path / "large.glb")
+    # Eight times the geometry may only cost the bookkeeping of seven more nodes.
+    assert large_peak < small_peak * 1.25
+
+
+def test_gltf_writer_keeps_geometry_beside_the_json(tmp_path):
+    model = _model([_grid_mesh(40, 0)], [_quad_mesh(offset=2.0)])
+    expected = create_gltf(model, include_metadata=False)
+
+    writer = GltfWriter(tmp_path / "model.gltf")
+    streamed = create_gltf(model, include_metadata=False, buffer_data=writer)
+    path = writer.finalize(streamed)
+
+    assert b"base64" not in path.read_bytes()
+    loaded = GLTF2().load(path)
+    assert loaded.buffers[0].uri == "model.bin"
+    assert (tmp_path / "model.bin").stat().st_size == loaded.buffers[0].byteLength
+
+    expected.convert_buffers(BufferFormat.BINARYBLOB)
+    loaded.convert_buffers(BufferFormat.BINARYBLOB)
+    assert loaded.binary_blob() == expected.binary_blob()
+
+
+def test_gltf_export_is_archived_with_its_buffers(tmp_path):
+    model = _model([_grid_mesh(40, 0)], [_grid_mesh(40, 100)])
+    directory = tmp_path / "model"
+    directory.mkdir()
+    writer = GltfWriter(directory / "model.gltf")
+    options = ExportOptions(meshopt_compression=True, max_buffer_length=40000)
+    gltf = create_gltf(model, False, buffer_data=writer, options=options)
+
+    archive = write_gltf_to_tmp(gltf, "model", ExportFormat.GLTF, writer)
+    with zipfile.ZipFile(archive) as zipped:
+        names = set(zipped.namelist())
+        loaded = GLTF2.from_json(zipped.read("model.gltf").decode("utf-8"))
+    assert names == {
+        "model.gltf",
+        "model.bin",
+        *(p.name for p in writer.external_buffers),
+    }
+    assert writer.external_buffers
+    # The compressed first buffer replaced the uncompressed one in place.
+    assert loaded.buffers[0].byteLength == (directory / "model.bin").stat().st_size
+    assert "EXT_meshopt_compression" in loaded.extensionsRequired
+
+
+def test_split_glb_is_archived_with_its_buffers(tmp_path):
+    model = _model([_grid_mesh(40, 0)], [_grid_mesh(40, 100)])
+    writer = GlbWriter(tmp_path / "model.glb")
+    options = ExportOptions(max_buffer_length=40000)
+    path = writer.finalize(create_gltf(model, False, writer, options))
+
+    archive = archive_files(path, writer.external_buffers)
+    assert writer.external_buffers
+    with zipfile.ZipFile(archive) as zipped:
+        assert zipped.namelist() == [
+            path.name,
+            *(p.name for p in writer.external_buffers),
+        ]
+        loaded = GLTF2().load_binary_from_file_object(
+            io.BytesIO(zipped.read(path.name))
+        )
+        for buffer in loaded.buffers[1:]:
+            assert zipped.getinfo(buffer.uri).file_size == buffer.byteLength
+
+
+def test_incremental_exports_are_kept_in_the_configured_directory(
+    tmp_path, monkeypatch
+):
+    monkeypatch.delenv(CACHE_DIR_ENV, raising=False)
+    assert incremental_export_path("project", "a/b").name == "project_a_b.glb"
+
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    path = incremental_export_path("project", "a/b")
+    assert path == tmp_path / "exports" / "project_a_b.glb"
@@ -0,0 +1,97 @@
+"""Unit tests for metadata stored as EXT_structural_metadata property tables."""
+
+import numpy as np
+from pygltflib import BufferFormat
+from specklepy.objects import Base
+
+from src.gltf.create import create_gltf, create_gltf_merged
+from src.gltf.options import ExportOptions
+from src.gltf.structural import STRUCTURAL_METADATA
+from tests.test_create import _quad_mesh
+
+
+def _tagged_model() -> Base:
+    root = Base()
+    root.elements = []
+    for index in range(4):
+        element = Base()
+        element.category = "Walls" if index % 2 else "Floors"
+        element.level = index
+        element.height = 2.5 * index
+        element.structural = index % 2 == 0
+        if index:
+            element.mark = f"W-{index}"
+        element.displayValue = [_quad_mesh(offset=float(index))]
+        root.elements.append(element)
+    return root
+
+
+def _read_table(gltf):
+    gltf.convert_buffers(BufferFormat.BINARYBLOB)
+    blob = gltf.binary_blob()
+    extension = gltf.extensions[STRUCTURAL_METADATA]
+    table = extension["propertyTables"][0]
+    classes = extension["schema"]["classes"][table["class"]]["properties"]
+
+    def view(index):
+        view = gltf.bufferViews[index]
+        assert view.byteOffset % 8 == 0
+        return blob[view.byteOffset : view.byteOffset + view.byteLength]
+
+    columns = {}
+    for name, definition in classes.items():
+        values = view(table["properties"][name]["values"])
+        if definition["type"] == "SCALAR":
+            dtype = {"INT32": np.int32, "FLOAT64": np.float64}
+            column = np.frombuffer(values, dtype[definition["componentType"]])
+            columns[name] = column.tolist()
+        elif definition["type"] == "BOOLEAN":
+            bits = np.unpackbits(np.frombuffer(values, np.uint8), bitorder="little")
+            columns[name] = bits[: table["count"]].astype(bool).tolist()
+        elif definition["type"] == "ENUM":
+            enum = extension["schema"]["enums"][definition["enumType"]]
+            names = {value["value"]: value["name"] for value in enum["values"]}
+            dtype = np.dtype(enum["valueType"].lower())
+            columns[name] = [names[value] for value in np.frombuffer(values, dtype)]
+        else:
+            offsets = np.frombuffer(
+                view(table["properties"][name]["stringOffsets"]), np.uint32
+            )
+            columns[name] = [
+                values[start:end].decode("utf-8")
+                for start, end in zip(offsets[:-1], offsets[1:])
+            ]
+    return table, classes, columns
+
+
+def test_structural_metadata_stores_typed_columns():
+    options = ExportOptions(structural_metadata=True)
+    gltf = create_gltf(_tagged_model(), include_metadata=True, options=options)
+
+    assert [node.extras for node in gltf.nodes] == [
+        {"speckle_feature_id": index} for index in range(4)
+    ]
+    table, classes, columns = _read_table(gltf)
+    assert table["count"] == 4
+    assert columns["level"] == [0, 1, 2, 3]
+    assert columns["height"] == [0.0, 2.5, 5.0, 7.5]
+    assert columns["structural"] == [True, False, True, False]
+    assert columns["mark"] == ["", "W-1", "W-2", "W-3"]
+    assert classes["mark"]["noData"] == ""
+    # Repeated strings are stored once, as enum values.
+    assert classes["category"]["type"] == "ENUM"
+    assert columns["category"] == ["Floors", "Walls", "Floors", "Walls"]
+
+
+def test_merged_features_reference_the_property_table():
+    options = ExportOptions(structural_metadata=True)
+    gltf = create_gltf_merged(_tagged_model(), include_metadata=True, options=options)
+
+    node = gltf.nodes[gltf.scenes[0].nodes[0]]
+    assert "speckle_metadata" not in node.extras
+    for primitive in gltf.meshes[node.mesh].primitives:
+        feature_ids = primitive.extensions["EXT_mesh_features"]["featureIds"]
+        assert feature_ids[0]["propertyTable"] == 0
+
+    _, _, columns = _read_table(gltf)
+    assert columns["level"] == [0, 1, 2, 3]
@@ -0,0 +1,123 @@
+"""Unit tests for the 3D Tiles tileset output."""
+
+import json
+import tracemalloc
+
+import numpy as np
+from pygltflib import GLTF2
+
+from benchmarks.synthetic import SyntheticModelConfig, generate_model
+from src.gltf.options import ExportOptions
+from src.gltf.tiles import TileElement, bounding_box, build_octree, create_tileset
+from src.utils.store import archive_directory
+from tests.test_create import _model
+from tests.test_store import _grid_mesh
+
+MODEL = SyntheticModelConfig(objects=64, vertices_per_mesh=48, materials=2)
+
+
+def _element(x: float, y: float, z: float, size: float = 1.0) -> TileElement:
+    low = np.array([x, y, z])
+    return TileElement([], np.stack([low, low + size]))
+
+
+def _tiles(tile_json):
+    yield tile_json
+    for child in tile_json.get("children", []):
+        yield from _tiles(child)
+
+
+def test_octree_splits_until_tiles_are_small_enough():
+    elements = [_element(x, 0, z) for x in range(4) for z in range(4)]
+    root = build_octree(elements, max_elements=4)
+
+    assert not root.elements
+    assert len(root.children) == 4
+    assert all(len(child.elements) == 4 for child in root.children)
+    np.testing.assert_allclose(root.bounds, [[0, 0, 0], [4, 1, 4]])
+    assert sorted(id(e) for e in root.descendants()) == sorted(map(id, elements))
+
+
+def test_identical_positions_stay_in_one_tile():
+    root = build_octree([_element(1, 1, 1) for _ in range(10)], max_elements=2)
+    assert not root.children and len(root.elements) == 10
+
+
+def test_bounding_box_is_z_up():
+    # glTF y (up) becomes tileset z; glTF z becomes tileset -y.
+    box = bounding_box(np.array([[0, 0, -4], [2, 6, 0]]))
+    assert box == [1, 2, 3, 1, 0, 0, 0, 2, 0, 0, 0, 3]
+
+
+def test_tileset_references_a_glb_per_tile(tmp_path):
+    path = create_tileset(
+        generate_model(MODEL),
+        include_metadata=True,
+        directory=tmp_path,
+        options=ExportOptions(tile_max_elements=8),
+    )
+    tileset = json.loads(path.read_text())
+    tiles = list(_tiles(tileset["root"]))
+
+    assert tileset["asset"]["version"] == "1.1"
+    assert tileset["root"]["refine"] == "REPLACE"
+    leaves = [tile for tile in tiles if "children" not in tile]
+    # Without levels of detail only the leaves have content.
+    assert all(("content" in tile) == ("children" not in tile) for tile in tiles)
+    assert all(tile["geometricError"] == 0 for tile in leaves)
+
+    nodes = 0
+    for tile in leaves:
+        gltf = GLTF2.load(tmp_path / tile["content"]["uri"])
+        assert len(gltf.nodes) <= 8
+        assert "speckle_metadata" in gltf.nodes[0].extras
+        nodes += len(gltf.nodes)
+    assert nodes == MODEL.objects
+
+    archive = archive_directory(tmp_path)
+    assert archive.suffix == ".zip" and archive.stat().st_size > 0
+
+
+def test_parent_tiles_hold_simplified_content(tmp_path):
+    path = create_tileset(
+        generate_model(MODEL),
+        include_metadata=False,
+        directory=tmp_path,
+        options=ExportOptions(tile_max_elements=8, lod_levels=2),
+    )
+    root = json.loads(path.read_text())["root"]
+
+    def triangles(tile):
+        gltf = GLTF2.load(tmp_path / tile["content"]["uri"])
+        return sum(
+            gltf.accessors[primitive.indices].count // 3
+            for mesh in gltf.meshes
+            for primitive in mesh.primitives
+        )
+
+    assert "content" in root
+    assert root["geometricError"] > 0
+    leaves = [tile for tile in _tiles(root) if "children" not in tile]
+    assert triangles(root) < sum(triangles(tile) for tile in leaves)
+    for tile in _tiles(root):
+        for child in tile.get("children", []):
+            assert child["geometricError"] <= tile["geometricError"]
+
+
+def _peak_tileset_memory(model, directory) -> int:
+    tracemalloc.start()
+    try:
+        create_tileset(model, False, directory, ExportOptions(tile_max_elements=1))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_tileset_memory_does_not_grow_with_model(tmp_path):
+    small = _model(*[[_grid_mesh(100, 1000 * k)] for k in range(1)])
+    large = _model(*[[_grid_mesh(100, 1000 * k)] for k in range(24)])
+
+    small_peak = _peak_tileset_memory(small, tmp_path / "small")
+    large_peak = _peak_tileset_memory(large, tmp_path / "large")
+    # Decoded meshes wait on disk, so only one tile's mesh is held at a time.
+    assert large_peak < small_peak * 1.25
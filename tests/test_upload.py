@@ -0,0 +1,170 @@
+"""Unit tests for result uploads, against a local stand-in for the blob endpoint."""
+
+import gzip
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from speckle_automate import AutomationContext, AutomationRunData
+
+from src.inputs import UploadCompression
+from src.utils.upload import ResultUploader, context_store
+
+
+class _BlobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _read_body(self):
+        """Read the body, noting when each part of it arrived."""
+        chunks, arrivals = [], []
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                arrivals.append((time.perf_counter(), sum(map(len, chunks))))
+        else:
+            chunks.append(self.rfile.read(int(self.headers["Content-Length"])))
+            arrivals.append((time.perf_counter(), len(chunks[0])))
+        return b"".join(chunks), arrivals
+
+    def do_POST(self):
+        body, arrivals = self._read_body()
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            status = server.failures.pop(0) if server.failures else 200
+
+        if status == 200:
+            boundary = self.headers["Content-Type"].split("boundary=")[1].encode()
+            start = body.index(b"\r\n\r\n") + 4
+            end = body.rindex(b"\r\n--" + boundary + b"--")
+            name = re.search(rb'filename="([^"]+)"', body[:start]).group(1).decode()
+            with server.lock:
+                server.blobs[name] = body[start:end]
+                server.arrivals[name] = arrivals
+            response = {
+                "uploadResults": [
+                    {"blobId": f"blob-{name}", "fileName": name, "uploadStatus": 1}
+                ]
+            }
+        else:
+            response = {"error": "unavailable"}
+
+        payload = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def blob_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BlobHandler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    # Statuses to answer the next requests with instead of storing the file.
+    server.failures = []
+    server.blobs = {}
+    server.arrivals = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _uploader(server, **kwargs):
+    run_data = AutomationRunData(
+        project_id="project",
+        speckle_server_url=server.url,
+        automation_id="automation",
+        automation_run_id="run",
+        function_run_id="function run",
+        triggers=[],
+    )
+    automate_context = AutomationContext(run_data, None, None, "token")
+    return ResultUploader(context_store(automate_context), backoff_s=0, **kwargs)
+
+
+def _result(tmp_path, name="model.glb", size=20000):
+    path = tmp_path / name
+    path.write_bytes(bytes(range(256)) * (size // 256 + 1))
+    return path
+
+
+def test_files_upload_byte_for_byte(blob_server, tmp_path):
+    paths = [_result(tmp_path, f"result_{i}.bin", 1000 * (i + 1)) for i in range(6)]
+
+    with _uploader(blob_server) as uploader:
+        for path in paths:
+            uploader.upload(path)
+        assert uploader.wait() == 6
+
+    for path in paths:
+        assert blob_server.blobs[path.name] == path.read_bytes()
+
+
+def test_uploads_overlap_with_the_run(blob_server, tmp_path):
+    path = _result(tmp_path, size=1 << 20)
+
+    with _uploader(blob_server) as uploader:
+        uploader.upload(path)
+        # The function carries on, e.g. writing its report.
+        time.sleep(0.5)
+        waiting = time.perf_counter()
+        uploader.wait()
+
+    assert blob_server.blobs["model.glb"] == path.read_bytes()
+    assert blob_server.arrivals["model.glb"][-1][0] < waiting
+
+
+def test_transient_failures_are_retried(blob_server, tmp_path):
+    path = _result(tmp_path)
+    blob_server.failures = [503, 429]
+
+    with _uploader(blob_server, compression=UploadCompression.GZIP) as uploader:
+        uploader.upload(path)
+
+    assert blob_server.requests == 3
+    assert gzip.decompress(blob_server.blobs["model.glb.gz"]) == path.read_bytes()
+
+
+def test_missing_endpoint_is_reported_and_other_errors_raised(blob_server, tmp_path):
+    path = _result(tmp_path)
+
+    blob_server.failures = [404]
+    with _uploader(blob_server) as uploader:
+        uploader.upload(path)
+    assert blob_server.blobs == {}
+
+    blob_server.failures = [503, 503]
+    with pytest.raises(httpx.HTTPStatusError):
+        with _uploader(blob_server, retries=1) as uploader:
+            uploader.upload(path)
+
+    blob_server.failures = [400]
+    with pytest.raises(httpx.HTTPStatusError):
+        with _uploader(blob_server) as uploader:
+            uploader.upload(path)
+    assert blob_server.requests == 4
+
+
+def test_upload_failures_do_not_hide_the_run_error(blob_server, tmp_path):
+    blob_server.failures = [400]
+    with pytest.raises(RuntimeError, match="conversion failed"):
+        with _uploader(blob_server) as uploader:
+            uploader.upload(_result(tmp_path))
+            raise RuntimeError("conversion failed")
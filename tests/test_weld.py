@@ -0,0 +1,73 @@
+"""Unit tests for the mesh cleanup stage."""
+
+import numpy as np
+from specklepy.objects.geometry import Mesh as SpeckleMesh
+
+from src.gltf.create import create_gltf, create_gltf_from_instances
+from src.gltf.options import ExportOptions
+from src.gltf.weld import clean_mesh, remove_degenerate_faces
+from tests.test_create import _model, _quad_mesh, _read_accessor
+
+
+def _unwelded_grid(size: int = 4):
+    """A grid of quads where every quad has its own four vertices."""
+    vertices, faces = [], []
+    for x in range(size):
+        for y in range(size):
+            base = len(vertices)
+            vertices += [[x, y, 0], [x + 1, y, 0], [x + 1, y + 1, 0], [x, y + 1, 0]]
+            faces += [[base, base + 1, base + 2], [base, base + 2, base + 3]]
+    return np.array(vertices, dtype=np.float32), np.array(faces, dtype=np.uint32)
+
+
+def test_clean_mesh_welds_shared_corners():
+    vertices, faces = _unwelded_grid()
+    jitter = np.random.default_rng(0).uniform(0, 1e-7, vertices.shape)
+    welded, remapped = clean_mesh(vertices + 0.25 + jitter, faces, tolerance=1e-4)
+
+    assert len(welded) == 25
+    assert remapped.dtype == np.uint32 and len(remapped) == 32
+    # Every triangle keeps its shape after remapping.
+    original = (vertices + 0.25)[faces]
+    assert np.allclose(welded[remapped], original, atol=1e-6)
+
+
+def test_clean_mesh_drops_unused_vertices():
+    vertices = np.arange(30, dtype=np.float32).reshape(10, 3)
+    faces = np.array([[7, 3, 5]], dtype=np.uint32)
+    welded, remapped = clean_mesh(vertices, faces, tolerance=1e-3)
+    assert welded.tolist() == vertices[[7, 3, 5]].tolist()
+    assert remapped.tolist() == [[0, 1, 2]]
+
+
+def test_remove_degenerate_faces_keeps_back_faces():
+    faces = np.array([[0, 1, 2], [1, 2, 0], [0, 0, 3], [2, 1, 0], [3, 4, 5]])
+    assert remove_degenerate_faces(faces).tolist() == [[0, 1, 2], [2, 1, 0], [3, 4, 5]]
+
+
+def test_export_writes_welded_mesh():
+    vertices, faces = _unwelded_grid(2)
+    mesh = SpeckleMesh(
+        vertices=vertices.ravel().tolist(),
+        faces=np.column_stack([np.full(len(faces), 3), faces]).ravel().tolist(),
+        units="mm",
+    )
+    gltf = create_gltf(_model([mesh]), include_metadata=False)
+    positions = _read_accessor(gltf, gltf.meshes[0].primitives[0].attributes.POSITION)
+    assert len(positions) == 9
+
+    options = ExportOptions(weld_tolerance=None)
+    gltf = create_gltf(_model([mesh]), include_metadata=False, options=options)
+    positions = _read_accessor(gltf, gltf.meshes[0].primitives[0].attributes.POSITION)
+    assert len(positions) == 16
+
+
+def test_export_skips_fully_degenerate_meshes():
+    degenerate = SpeckleMesh(vertices=[0, 0, 0, 0, 0, 0, 1, 0, 0], faces=[3, 0, 1, 2])
+    model = _model([degenerate], [_quad_mesh(), degenerate])
+    options = ExportOptions(lod_levels=2)
+
+    for create in (create_gltf, create_gltf_from_instances):
+        gltf = create(model, False, options=options)
+        assert len(gltf.meshes) == 1
+        assert len(gltf.scenes[0].nodes) == 1